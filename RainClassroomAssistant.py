@@ -1,19 +1,53 @@
+import multiprocessing
 import sys
 
-from PyQt5 import QtWidgets
 
-from Scripts.Logger import setup_logging
-from UI.MainWindow import MainWindow_Ui
+def run_gui():
+    from PyQt5 import QtWidgets
+
+    from Scripts.ImageProcessing import get_image_pool
+    from Scripts.Logger import setup_logging
+    from Scripts.PPTManager import shutdown_shared_resources
+    from UI.MainWindow import MainWindow_Ui
 
-if __name__ == "__main__":
     # 初始化
     setup_logging()
     app = QtWidgets.QApplication(sys.argv)
     main = QtWidgets.QMainWindow()
     ui = MainWindow_Ui()
     ui.setupUi(main)
+    # 图片处理进程池为进程内共享，启动时按配置设置一次进程数
+    get_image_pool(ui.config.get("image_process_workers"))
     main.show()
     # 启动监听
     ui.active()
     # 主窗体循环
-    app.exec_()
+    code = app.exec_()
+    # 关闭共享的下载线程、事件循环和图片处理进程
+    shutdown_shared_resources()
+    return code
+
+
+def get_option(name):
+    # 读取形如 --name value 的命令行参数
+    args = sys.argv[1:]
+    if name in args and args.index(name) + 1 < len(args):
+        return args[args.index(name) + 1]
+    return None
+
+
+if __name__ == "__main__":
+    # 打包为exe后图片处理进程池的子进程需要
+    multiprocessing.freeze_support()
+    accounts_path = get_option("--accounts")
+    if accounts_path:
+        # 多账号无界面运行
+        from Scripts.Headless import run_accounts
+
+        sys.exit(run_accounts(accounts_path))
+    if "--headless" in sys.argv[1:]:
+        # 无界面运行，不导入PyQt
+        from Scripts.Headless import run_headless
+
+        sys.exit(run_headless())
+    sys.exit(run_gui())
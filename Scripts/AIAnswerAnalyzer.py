@@ -1,7 +1,9 @@
 import json
 import os
+import threading
 import time
 import base64
+import copy
 from typing import Dict, List, Optional
 
 import requests
@@ -23,6 +25,9 @@ class AIAnswerAnalyzer:
         self.cache_dir = "ai_answers_cache"
         self.add_message = add_message_callback
         self.ensure_cache_dir()
+        # 同一演示文稿同时只分析一次，后到的调用等待后直接读取缓存
+        self._presentation_locks = {}
+        self._presentation_locks_lock = threading.Lock()
         
         # OpenAI配置
         self.api_key = config.get('openai_api_key', '')
@@ -177,6 +182,23 @@ class AIAnswerAnalyzer:
 
         return cached_answers
         
+    def _load_partial_ai_answers(self, lesson_name: str, presentation_title: str,
+                                 slides_info: List[dict]) -> Dict:
+        """读取与当前题目签名一致的缓存中已有的AI答案（可能只覆盖部分题目页）"""
+        cache_file = self.get_cache_file_path(lesson_name, presentation_title)
+        try:
+            with open(cache_file, 'r', encoding='utf-8') as f:
+                cache_data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if not isinstance(cache_data, dict) or "metadata" not in cache_data:
+            return {}
+        cached_signature = cache_data.get("metadata", {}).get("problem_signature")
+        if cached_signature != self._problem_signature(slides_info):
+            return {}
+        answers = cache_data.get("answers", {})
+        return dict(answers) if isinstance(answers, dict) else {}
+
     def save_cached_answers(self, lesson_name: str, presentation_title: str, answers: Dict, 
                           slides_info: List[dict] = None, analysis_status: str = "completed"):
         """
@@ -519,10 +541,60 @@ class AIAnswerAnalyzer:
             self._log(f"分析幻灯片失败 {image_path}: {e}")
             return None
             
-    def analyze_presentation(self, lesson_name: str, presentation_title: str, 
+    def _presentation_lock(self, lesson_name: str, presentation_title: str) -> threading.Lock:
+        key = self.get_cache_file_path(lesson_name, presentation_title)
+        with self._presentation_locks_lock:
+            lock = self._presentation_locks.get(key)
+            if lock is None:
+                lock = self._presentation_locks[key] = threading.Lock()
+            return lock
+
+    def analyze_problem_slide(self, lesson_name: str, presentation_title: str,
+                              slides_data: List[dict], slide: dict, image_path: str) -> Optional[Dict]:
+        """
+        单独分析一张题目页，结果合并到演示文稿的缓存中
+
+        题目页图片下载完成即可调用，不必等待整套PPT下载和PDF生成
+
+        Returns:
+            该演示文稿当前的全部答案（含人工答案），分析失败时为None
+        """
+        problem_slides = [item for item in slides_data if "problem" in item.keys()]
+        slide_index = str(slide['index'])
+        with self._presentation_lock(lesson_name, presentation_title):
+            answers = self._load_partial_ai_answers(lesson_name, presentation_title, problem_slides)
+            if slide_index not in answers:
+                self._log(f"正在分析幻灯片 {slide_index}...")
+                ai_answers = self.analyze_slide_with_openai(image_path, slide['index'])
+                # 添加延迟避免API限制
+                time.sleep(self.delay_between_requests)
+                if ai_answers is None:
+                    self._log(f"幻灯片 {slide_index} 分析失败")
+                    return None
+                self._log(f"幻灯片 {slide_index} 分析完成，答案: {ai_answers}")
+                answers[slide_index] = ai_answers
+                covered = all(str(item['index']) in answers for item in problem_slides)
+                self.save_cached_answers(
+                    lesson_name,
+                    presentation_title,
+                    answers,
+                    problem_slides,
+                    "completed" if covered else "partial",
+                )
+            return self.load_cached_answers(lesson_name, presentation_title)
+
+    def analyze_presentation(self, lesson_name: str, presentation_title: str,
+                             slides_data: List[dict], img_cache_path: str,
+                             callback=None):
+        """同步分析整个演示文稿，多个课程同时请求时只调用一次AI接口"""
+        with self._presentation_lock(lesson_name, presentation_title):
+            return self._analyze_presentation(
+                lesson_name, presentation_title, slides_data, img_cache_path, callback
+            )
+
+    def _analyze_presentation(self, lesson_name: str, presentation_title: str, 
                            slides_data: List[dict], img_cache_path: str, 
                            callback=None):
-        """同步分析整个演示文稿"""
         try:
             self._log(f"开始AI分析: {presentation_title}")
             
@@ -541,12 +613,14 @@ class AIAnswerAnalyzer:
                     callback(lesson_name, presentation_title, cached_answers)
                 return cached_answers
             
-            # 如果没有缓存，则进行AI分析
-            answers_cache = {}
+            # 如果没有完整缓存，则进行AI分析；已逐页分析过的题目页不再重复请求
+            answers_cache = self._load_partial_ai_answers(lesson_name, presentation_title, problem_slides)
             failed_slides = []
             
             for slide in problem_slides:
                 slide_index = slide['index']
+                if str(slide_index) in answers_cache:
+                    continue
                 image_path = os.path.join(img_cache_path, f"{slide_index}.jpg")
                 
                 if os.path.exists(image_path):
@@ -633,3 +707,35 @@ class AIAnswerAnalyzer:
                     self._log(f"应用AI缓存答案 - 幻灯片 {slide_index}: {ai_answers}")
                     
         return problems
+
+
+_analyzers: Dict[str, AIAnswerAnalyzer] = {}
+_analyzers_lock = threading.Lock()
+
+
+def get_ai_analyzer(config: dict, add_message_callback=None) -> AIAnswerAnalyzer:
+    """
+    获取共享的AI答案分析器
+
+    AI相关配置相同的课程（包括不同账号）共用同一个OpenAI客户端和分析锁，配置修改后自动创建新实例；
+    每次调用返回浅拷贝，日志输出到调用方自己的回调
+    """
+    key = json.dumps(
+        [
+            config.get('enable_ai_analysis', False),
+            config.get('openai_api_key', ''),
+            config.get('openai_api_base', ''),
+            config.get('openai_model', ''),
+            config.get('ai_analysis_settings', {}),
+        ],
+        sort_keys=True,
+        default=str,
+    )
+    with _analyzers_lock:
+        shared = _analyzers.get(key)
+        if shared is None:
+            shared = AIAnswerAnalyzer(config)
+            _analyzers[key] = shared
+    analyzer = copy.copy(shared)
+    analyzer.add_message = add_message_callback
+    return analyzer
@@ -0,0 +1,106 @@
+"""
+多账号监听模块
+在同一进程中为多个账号各运行一个监听器，共用连接池、课程运行时、答题调度器、
+演示文稿下载和AI分析器
+"""
+
+import json
+import threading
+from copy import deepcopy
+from typing import Any, Callable, Dict, List, Optional
+
+from .Cancellation import CancellationToken
+from .EventSink import ConsoleEventSink, EventSink
+from .Monitor import monitor
+from .Utils import get_initial_data, merge_nested_dict
+
+
+def load_accounts(accounts_path: str, base_config: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    """
+    读取账号列表文件
+
+    文件为JSON数组，每项包含sessionid、region，可选name和config（覆盖base_config的配置项）：
+    [{"name": "室友A", "sessionid": "...", "region": "1", "config": {"auto_danmu": false}}]
+
+    Returns:
+        [{"name": 名称, "config": 该账号的完整配置}]
+    """
+    with open(accounts_path, "r", encoding="utf-8") as f:
+        entries = json.load(f)
+    if not isinstance(entries, list):
+        raise ValueError("账号列表文件应为JSON数组")
+
+    accounts = []
+    for i, entry in enumerate(entries):
+        if not entry.get("sessionid"):
+            raise ValueError(f"第{i + 1}个账号缺少sessionid")
+        config = deepcopy(base_config) if base_config else get_initial_data()
+        config = merge_nested_dict(config, entry.get("config", {}))
+        config["sessionid"] = entry["sessionid"]
+        config["region"] = str(entry.get("region", config.get("region", "1")))
+        accounts.append({"name": entry.get("name") or f"账号{i + 1}", "config": config})
+    return accounts
+
+
+class AccountSupervisor:
+    """
+    多账号监听管理
+
+    - 每个账号一个监听线程和一个EventSink，停止令牌派生自同一个根令牌
+    - 接口客户端、WebSocket事件循环、答题调度器都是进程内单例，账号之间天然共用
+    - 同一节课的演示文稿下载和AI分析按lessonid/演示文稿去重，只执行一次
+    """
+
+    def __init__(self,
+                 accounts: List[Dict[str, Any]],
+                 sink_factory: Callable[[str, Dict[str, Any]], EventSink] = None,
+                 stop_token: Optional[CancellationToken] = None):
+        """
+        Args:
+            accounts: load_accounts的返回值
+            sink_factory: 根据(名称, 配置)创建EventSink，默认为ConsoleEventSink
+            stop_token: 根停止令牌
+        """
+        self.accounts = accounts
+        self.sink_factory = sink_factory or (lambda name, config: ConsoleEventSink(config, name=name))
+        self.stop_token = stop_token or CancellationToken()
+        self.sinks: Dict[str, EventSink] = {}
+        self._threads: List[threading.Thread] = []
+
+    def start(self):
+        for account in self.accounts:
+            name = account["name"]
+            sink = self.sink_factory(name, account["config"])
+            self.sinks[name] = sink
+            thread = threading.Thread(
+                target=self._run_account,
+                args=(name, sink, self.stop_token.child()),
+                name=f"Monitor-{name}",
+                daemon=True,
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def _run_account(self, name, sink, stop_token):
+        try:
+            sink.add_message("启动成功", 0)
+            monitor(sink, stop_token)
+        except Exception as e:
+            sink.add_message(f"监听异常退出: {e}", 0)
+        finally:
+            sink.add_message("停止成功", 0)
+
+    def stop(self):
+        self.stop_token.cancel()
+
+    def wait(self, timeout: Optional[float] = None):
+        """等待所有账号的监听器退出"""
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def alive(self) -> List[str]:
+        return [
+            thread.name[len("Monitor-"):]
+            for thread in self._threads
+            if thread.is_alive()
+        ]
@@ -0,0 +1,197 @@
+"""
+自适应轮询模块
+根据历史上课时间调整获取课程列表的间隔：预计上课前后密集轮询，其余时间逐步退避
+"""
+
+import json
+import os
+import random
+import threading
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+from .Utils import get_config_dir
+
+MINUTES_PER_WEEK = 7 * 24 * 60
+
+# 多个账号的监听器共用同一记录文件，写入时加锁并与文件中已有记录合并
+_file_lock = threading.Lock()
+
+
+def default_history_path() -> str:
+    return os.path.join(get_config_dir(), "lesson_schedule.json")
+
+
+def minute_of_week(moment: datetime) -> int:
+    return moment.weekday() * 24 * 60 + moment.hour * 60 + moment.minute
+
+
+class AdaptivePoller:
+    """
+    自适应轮询器
+
+    - 按classroomId记录每节课被发现的时间（星期几+时刻），保存在本地JSON文件中
+    - 处于任一历史上课时间的前window_before到后window_after分钟内时，间隔为dense_interval
+    - 有课程正在监听时使用base_interval，与原先30秒轮询一致
+    - 其余时间间隔按2倍递增至max_interval，且不会越过下一个上课窗口，并加入随机抖动
+    - 没有任何历史记录时保持base_interval
+    """
+
+    def __init__(self,
+                 history_path: Optional[str] = None,
+                 base_interval: float = 30,
+                 dense_interval=(3, 5),
+                 max_interval: float = 600,
+                 window_before: int = 5,
+                 window_after: int = 15,
+                 jitter: float = 0.2,
+                 max_starts: int = 30,
+                 clock: Callable[[], datetime] = datetime.now):
+        """
+        初始化轮询器
+
+        Args:
+            history_path: 历史记录文件路径，默认保存在配置文件夹
+            base_interval: 默认轮询间隔（秒）
+            dense_interval: 上课窗口内的轮询间隔范围（秒）
+            max_interval: 退避的最大间隔（秒）
+            window_before: 预计上课前多少分钟开始密集轮询
+            window_after: 预计上课后多少分钟内保持密集轮询
+            jitter: 退避间隔的随机抖动比例
+            max_starts: 每个课堂最多保留的上课时间条数
+            clock: 返回当前本地时间的函数
+        """
+        self.history_path = history_path or default_history_path()
+        self.base_interval = base_interval
+        self.dense_interval = dense_interval
+        self.max_interval = max_interval
+        self.window_before = window_before
+        self.window_after = window_after
+        self.jitter = jitter
+        self.max_starts = max_starts
+        self.clock = clock
+        self._starts: Dict[str, List[int]] = {}
+        self._seen_lessons: Set[str] = set()
+        self._idle_polls = 0
+        self._lock = threading.Lock()
+        self._load()
+
+    def _read_file(self) -> Dict[str, List[int]]:
+        try:
+            with open(self.history_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return {
+                str(classroomid): [int(minute) for minute in minutes]
+                for classroomid, minutes in data.get("classrooms", {}).items()
+            }
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError, AttributeError, TypeError) as e:
+            print(f"读取上课时间记录失败: {e}")
+            return {}
+
+    def _load(self):
+        with _file_lock:
+            self._starts = self._read_file()
+
+    def _save(self):
+        with _file_lock:
+            # 合并其他监听器在此期间写入的记录，本监听器的新记录排在最后
+            merged = self._read_file()
+            for classroomid, minutes in self._starts.items():
+                starts = merged.setdefault(classroomid, [])
+                starts.extend(minute for minute in minutes if minute not in starts)
+                del starts[:-self.max_starts]
+            self._starts = merged
+            tmp_path = self.history_path + ".tmp"
+            try:
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump({"version": 1, "classrooms": self._starts}, f)
+                os.replace(tmp_path, self.history_path)
+            except OSError as e:
+                print(f"保存上课时间记录失败: {e}")
+
+    def observe(self, lesson_list: Iterable[dict]) -> bool:
+        """
+        记录本次轮询发现的课程
+
+        Returns:
+            是否发现了新的课程
+        """
+        now = minute_of_week(self.clock())
+        found_new = False
+        changed = False
+        with self._lock:
+            for lesson in lesson_list:
+                lessonid = str(lesson.get("lessonId"))
+                if lessonid in self._seen_lessons:
+                    continue
+                self._seen_lessons.add(lessonid)
+                found_new = True
+                classroomid = str(lesson.get("classroomId"))
+                starts = self._starts.setdefault(classroomid, [])
+                # 启动时课程可能已经开始，与已有记录相近的时间不再重复记录
+                if any(self._distance(now, start) <= self.window_after for start in starts):
+                    continue
+                starts.append(now)
+                del starts[:-self.max_starts]
+                changed = True
+            if found_new:
+                self._idle_polls = 0
+            if changed:
+                self._save()
+        return found_new
+
+    @staticmethod
+    def _offset(now: int, start: int) -> int:
+        # 当前时刻相对上课时间的分钟数，负数表示尚未开始，按周循环
+        return (now - start + MINUTES_PER_WEEK // 2) % MINUTES_PER_WEEK - MINUTES_PER_WEEK // 2
+
+    @classmethod
+    def _distance(cls, now: int, start: int) -> int:
+        return abs(cls._offset(now, start))
+
+    def _all_starts(self) -> List[int]:
+        return [start for starts in self._starts.values() for start in starts]
+
+    def in_window(self, moment: Optional[datetime] = None) -> bool:
+        """当前是否处于某个历史上课时间附近"""
+        now = minute_of_week(moment or self.clock())
+        with self._lock:
+            return any(
+                -self.window_before <= self._offset(now, start) <= self.window_after
+                for start in self._all_starts()
+            )
+
+    def seconds_until_window(self, moment: Optional[datetime] = None) -> Optional[float]:
+        """距离下一个上课窗口开始的秒数，没有历史记录时返回None"""
+        moment = moment or self.clock()
+        now = minute_of_week(moment) + moment.second / 60
+        with self._lock:
+            starts = self._all_starts()
+        if not starts:
+            return None
+        return min(
+            (start - self.window_before - now) % MINUTES_PER_WEEK for start in starts
+        ) * 60
+
+    def next_interval(self, active: bool = False) -> float:
+        """
+        计算下一次轮询前的等待秒数
+
+        Args:
+            active: 当前是否有课程正在监听
+        """
+        moment = self.clock()
+        if self.in_window(moment):
+            self._idle_polls = 0
+            return random.uniform(*self.dense_interval)
+        until_window = self.seconds_until_window(moment)
+        if active or until_window is None:
+            self._idle_polls = 0
+            return self.base_interval
+        interval = min(self.base_interval * 2 ** self._idle_polls, self.max_interval)
+        self._idle_polls += 1
+        interval *= random.uniform(1 - self.jitter, 1 + self.jitter)
+        # 不越过下一个上课窗口
+        return max(min(interval, until_window), self.dense_interval[0])
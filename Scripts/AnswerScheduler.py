@@ -0,0 +1,143 @@
+"""
+答题调度模块
+所有课程共用一个按截止时间排序的调度器，到期后在小线程池中提交答案，
+替代每道题一个线程并用time.sleep(1)轮询等待的实现
+"""
+
+import heapq
+import itertools
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, List, Optional, Tuple
+
+from .Logger import logger
+
+
+class ScheduledJob:
+    """调度任务，result()等待执行结果，任务被取消时抛出CancelledError"""
+
+    def __init__(self, deadline: float, fn: Callable, args: Tuple, owner: Any):
+        self.deadline = deadline
+        self.fn = fn
+        self.args = args
+        self.owner = owner
+        self.future: Future = Future()
+
+    @property
+    def cancelled(self) -> bool:
+        return self.future.cancelled()
+
+    def result(self, timeout: Optional[float] = None):
+        return self.future.result(timeout)
+
+
+class AnswerScheduler:
+    """
+    答题调度器
+
+    - 任务按time.monotonic()截止时间放入最小堆，调度线程只在最近的截止时间醒来
+    - 到期任务交给固定大小的线程池执行，线程数不随题目数量增长
+    - 可按课程取消尚未执行的任务（下课时调用）
+    """
+
+    def __init__(self, workers: int = 4):
+        self.workers = workers
+        self._heap: List[Tuple[float, int, ScheduledJob]] = []
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def schedule(self, delay: float, fn: Callable, *args, owner: Any = None) -> ScheduledJob:
+        """
+        在delay秒后执行fn(*args)
+
+        Args:
+            delay: 延迟秒数，小于等于0时立即执行
+            fn: 要执行的函数
+            owner: 任务所属对象，用于cancel_owner批量取消
+
+        Returns:
+            ScheduledJob
+        """
+        job = ScheduledJob(time.monotonic() + max(delay, 0), fn, args, owner)
+        with self._condition:
+            self._ensure_started()
+            heapq.heappush(self._heap, (job.deadline, next(self._counter), job))
+            self._condition.notify()
+        return job
+
+    def cancel(self, job: ScheduledJob) -> bool:
+        """取消尚未开始执行的任务"""
+        with self._condition:
+            return job.future.cancel()
+
+    def cancel_owner(self, owner: Any) -> int:
+        """取消某个对象的全部待执行任务，返回取消的数量"""
+        cancelled = 0
+        with self._condition:
+            for _, _, job in self._heap:
+                if job.owner is owner and job.future.cancel():
+                    cancelled += 1
+            # 已取消的任务直接移出堆，避免调度线程为它们醒来
+            self._heap = [item for item in self._heap if not item[2].cancelled]
+            heapq.heapify(self._heap)
+            self._condition.notify()
+        return cancelled
+
+    def pending(self) -> int:
+        with self._condition:
+            return sum(1 for _, _, job in self._heap if not job.cancelled)
+
+    def _ensure_started(self):
+        if self._thread is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.workers,
+                thread_name_prefix="AnswerWorker",
+            )
+            self._thread = threading.Thread(
+                target=self._dispatch,
+                name="AnswerScheduler",
+                daemon=True,
+            )
+            self._thread.start()
+
+    def _dispatch(self):
+        while True:
+            with self._condition:
+                while not self._heap:
+                    self._condition.wait()
+                deadline, _, job = self._heap[0]
+                remaining = deadline - time.monotonic()
+                if remaining > 0:
+                    self._condition.wait(remaining)
+                    continue
+                heapq.heappop(self._heap)
+                # 在锁内标记为运行中，之后cancel不再生效
+                if not job.future.set_running_or_notify_cancel():
+                    continue
+            self._executor.submit(self._run, job)
+
+    @staticmethod
+    def _run(job: ScheduledJob):
+        try:
+            result = job.fn(*job.args)
+        except BaseException as exc:
+            job.future.set_exception(exc)
+            logger.error("答题任务执行失败: {}", exc)
+        else:
+            job.future.set_result(result)
+
+
+_scheduler: Optional[AnswerScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_answer_scheduler() -> AnswerScheduler:
+    """获取进程内共享的答题调度器"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = AnswerScheduler()
+        return _scheduler
@@ -0,0 +1,140 @@
+"""
+雨课堂接口客户端模块
+每个区域host共用一个连接池，统一请求头、重试和超时设置
+"""
+
+import json
+import threading
+from typing import Any, Dict, List, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from .Utils import dict_result, get_host
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:97.0) Gecko/20100101 Firefox/97.0"
+
+
+def session_headers(sessionid: str) -> Dict[str, str]:
+    """根据sessionid构造基础请求头"""
+    return {
+        "Cookie": "sessionid=%s" % sessionid,
+        "User-Agent": USER_AGENT,
+    }
+
+
+class YuketangClient:
+    """雨课堂REST接口客户端，复用keep-alive连接"""
+
+    def __init__(self,
+                 host: str,
+                 timeout: Tuple[float, float] = (5, 15),
+                 max_retries: int = 3,
+                 pool_maxsize: int = 16):
+        """
+        初始化接口客户端
+
+        Args:
+            host: 区域host，由get_host获得
+            timeout: (连接超时, 读取超时)，单位秒
+            max_retries: 连接失败及GET请求5xx的最大重试次数
+            pool_maxsize: 连接池大小
+        """
+        self.host = host
+        self.timeout = timeout
+        self.session = requests.Session()
+        # 与原先proxies={"http": None, "https": None}一致，不使用系统代理
+        self.session.trust_env = False
+        # POST请求（签到、答题、弹幕）只在连接未建立时重试，避免重复提交
+        retry = Retry(
+            total=max_retries,
+            connect=max_retries,
+            read=max_retries,
+            status=max_retries,
+            backoff_factor=0.3,
+            status_forcelist=(500, 502, 503, 504),
+            allowed_methods=frozenset({"GET"}),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=pool_maxsize,
+            max_retries=retry,
+        )
+        self.session.mount("https://", adapter)
+
+    def url(self, path: str) -> str:
+        return f"https://{self.host}{path}"
+
+    def get(self, path: str, headers: Dict[str, str], **kwargs) -> requests.Response:
+        kwargs.setdefault("timeout", self.timeout)
+        return self.session.get(self.url(path), headers=headers, **kwargs)
+
+    def post(self, path: str, headers: Dict[str, str], payload: Dict[str, Any], **kwargs) -> requests.Response:
+        kwargs.setdefault("timeout", self.timeout)
+        return self.session.post(
+            self.url(path), headers=headers, data=json.dumps(payload), **kwargs
+        )
+
+    # 用户与课程列表
+
+    def get_user_info(self, sessionid: str) -> Tuple[int, Any]:
+        r = self.get("/api/v3/user/basic-info", session_headers(sessionid))
+        rtn = dict_result(r.text)
+        return (rtn["code"], rtn["data"])
+
+    def get_on_lesson(self, sessionid: str) -> List[Dict[str, Any]]:
+        r = self.get("/api/v3/classroom/on-lesson", session_headers(sessionid))
+        rtn = dict_result(r.text)
+        return rtn["data"]["onLessonClassrooms"]
+
+    def get_on_lesson_old(self, sessionid: str) -> List[Dict[str, Any]]:
+        r = self.get("/v/course_meta/on_lesson_courses", session_headers(sessionid))
+        rtn = dict_result(r.text)
+        return rtn["on_lessons"]
+
+    def fetch_user_info(self, uid, classroomid, headers: Dict[str, str]) -> Dict[str, Any]:
+        r = self.get(
+            f"/v/course_meta/fetch_user_info_new?query_user_id={uid}&classroom_id={classroomid}",
+            headers,
+        )
+        return dict_result(r.text)["data"]
+
+    # 课堂
+
+    def checkin(self, lessonid, headers: Dict[str, str]) -> requests.Response:
+        payload = {"source": 5, "lessonId": lessonid}
+        return self.post("/api/v3/lesson/checkin", headers, payload)
+
+    def get_lesson_info(self, headers: Dict[str, str]) -> Dict[str, Any]:
+        r = self.get("/api/v3/lesson/basic-info", headers)
+        return dict_result(r.text)["data"]
+
+    def fetch_presentation(self, presentationid, headers: Dict[str, str]) -> Dict[str, Any]:
+        r = self.get(
+            f"/api/v3/lesson/presentation/fetch?presentation_id={presentationid}",
+            headers,
+        )
+        return dict_result(r.text)["data"]
+
+    def answer_problem(self, payload: Dict[str, Any], headers: Dict[str, str]) -> requests.Response:
+        return self.post("/api/v3/lesson/problem/answer", headers, payload)
+
+    def send_danmu(self, payload: Dict[str, Any], headers: Dict[str, str]) -> requests.Response:
+        return self.post("/api/v3/lesson/danmu/send", headers, payload)
+
+
+_clients: Dict[str, YuketangClient] = {}
+_clients_lock = threading.Lock()
+
+
+def get_api_client(region) -> YuketangClient:
+    """获取区域对应的共享客户端，同一host在进程内只建立一个连接池"""
+    host = get_host(region)
+    with _clients_lock:
+        client = _clients.get(host)
+        if client is None:
+            client = YuketangClient(host)
+            _clients[host] = client
+        return client
@@ -6,13 +6,25 @@
 import asyncio
 import aiohttp
 import aiofiles
+import hashlib
 import os
-import threading
-import weakref
 from typing import List, Dict, Optional, Callable, Any
-from PIL import Image
 import time
 
+try:
+    from .BlobStore import get_blob_store
+    from .DownloadLoop import download_session
+    from .HostLimiter import MAX_CONCURRENCY, RETRYABLE_STATUS, get_host_limiter
+    from .ImageProcessing import get_image_pool, normalize_image
+    from .SlideManifest import get_slide_manifest, is_valid_slide_image, slide_identifier
+except ImportError:
+    # 作为独立模块导入时（Scripts目录在sys.path中）
+    from BlobStore import get_blob_store
+    from DownloadLoop import download_session
+    from HostLimiter import MAX_CONCURRENCY, RETRYABLE_STATUS, get_host_limiter
+    from ImageProcessing import get_image_pool, normalize_image
+    from SlideManifest import get_slide_manifest, is_valid_slide_image, slide_identifier
+
 try:
     from loguru import logger
 except ImportError:
@@ -26,49 +38,64 @@ except ImportError:
     logger = _FallbackLogger()
 
 
+# 流式下载的分块大小
+CHUNK_SIZE = 64 * 1024
+# 判断图片格式需要的文件头长度
+HEADER_SIZE = 12
+
+# 常见图片格式的文件头
+IMAGE_SIGNATURES = (
+    b"\xff\xd8\xff",          # JPEG
+    b"\x89PNG\r\n\x1a\n",     # PNG
+    b"GIF87a",
+    b"GIF89a",
+    b"BM",                    # BMP
+)
+
+
+def sniff_image(header: bytes) -> bool:
+    """根据文件头判断是否为图片"""
+    if header.startswith(IMAGE_SIGNATURES):
+        return True
+    # WEBP: RIFF....WEBP
+    return header[:4] == b"RIFF" and header[8:12] == b"WEBP"
+
+
 class AsyncImageDownloader:
     """异步图片下载器"""
     
     def __init__(self, 
-                 max_concurrent: int = 8,
+                 max_concurrent: Optional[int] = None,
                  timeout: int = 30,
                  max_retries: int = 3,
                  progress_callback: Optional[Callable] = None,
-                 skip_existing: bool = True):
+                 skip_existing: bool = True,
+                 blob_store=None):
         """
         初始化异步下载器
         
         Args:
-            max_concurrent: 最大并发数
+            max_concurrent: 最大并发数，为空时只受各主机的自适应并发限制
             timeout: 请求超时时间
             max_retries: 最大重试次数
             progress_callback: 进度回调函数
             skip_existing: 是否跳过已存在的有效文件
+            blob_store: 图片内容存储，默认使用进程内共享的存储
         """
         self.max_concurrent = max_concurrent
         self.timeout = timeout
         self.max_retries = max_retries
         self.progress_callback = progress_callback
         self.skip_existing = skip_existing
-        self._semaphores = weakref.WeakKeyDictionary()
-        self._semaphore_lock = threading.Lock()
-        self._semaphore = None  # 兼容旧测试/调试输出；实际使用按事件循环缓存
+        # 返回幻灯片下载优先级的回调，为空时题目页优先
+        self.priority_callback: Optional[Callable] = None
+        self._blob_store = blob_store
         
     @property
-    def semaphore(self):
-        """获取或创建Semaphore实例，确保在正确的事件循环中创建"""
-        try:
-            loop = asyncio.get_running_loop()
-        except RuntimeError:
-            loop = asyncio.get_event_loop()
-
-        with self._semaphore_lock:
-            semaphore = self._semaphores.get(loop)
-            if semaphore is None or loop.is_closed():
-                semaphore = asyncio.Semaphore(self.max_concurrent)
-                self._semaphores[loop] = semaphore
-                self._semaphore = semaphore
-            return semaphore
+    def blob_store(self):
+        if self._blob_store is None:
+            self._blob_store = get_blob_store()
+        return self._blob_store
 
     async def download_image(self, 
                            session: aiohttp.ClientSession,
@@ -85,104 +112,170 @@ class AsyncImageDownloader:
         Returns:
             下载结果字典
         """
-        async with self.semaphore:
-            url = slide.get("cover", "")
-            if not url:
-                return {"success": False, "slide": slide, "error": "URL为空"}
-                
-            index = slide["index"]
-            final_image_name = os.path.join(img_path, f"{index}.jpg")
-            temp_image_name = os.path.join(img_path, f"{index}_temp")
+        url = slide.get("cover", "")
+        if not url:
+            return {"success": False, "slide": slide, "error": "URL为空"}
             
-            # 检查是否跳过已存在的有效文件
-            if self.skip_existing and self._is_valid_image(final_image_name):
+        index = slide["index"]
+        final_image_name = os.path.join(img_path, f"{index}.jpg")
+        temp_image_name = os.path.join(img_path, f"{index}_temp")
+        
+        # 检查是否跳过已存在的有效文件（可能需要解码校验，在线程池中执行）
+        loop = asyncio.get_event_loop()
+        if self.skip_existing and await loop.run_in_executor(
+            None, self._is_valid_image, final_image_name
+        ):
+            if self.progress_callback:
+                await self._safe_callback(slide, True, "文件已存在，跳过下载")
+            return {"success": True, "slide": slide, "path": final_image_name, "skipped": True}
+
+        # 相同封面已在其他演示文稿中下载过时，直接链接存储中的图片
+        if await loop.run_in_executor(None, self._reuse_stored_image, url, img_path, slide):
+            if self.progress_callback:
+                await self._safe_callback(slide, True, "复用已存储的图片")
+            return {"success": True, "slide": slide, "path": final_image_name, "reused": True}
+        
+        for attempt in range(self.max_retries):
+            try:
+                # 下载图片，并发数由该主机的自适应限制控制
+                sha256, size = await self._fetch(session, url, temp_image_name)
+                if size < 10:
+                    raise ValueError("文件内容过小")
+                
+                # 处理图片格式，已是RGB JPEG时直接改名，哈希仍然有效
+                unchanged = await self._process_image(temp_image_name, final_image_name)
+                # 加入内容存储并记录到清单，之后检查缓存时只需stat
+                await loop.run_in_executor(
+                    None, self._store_image, url, img_path, slide, sha256 if unchanged else None
+                )
+                
+                # 清理临时文件
+                if os.path.exists(temp_image_name):
+                    os.remove(temp_image_name)
+                
+                # 通知进度
                 if self.progress_callback:
-                    await self._safe_callback(slide, True, "文件已存在，跳过下载")
-                return {"success": True, "slide": slide, "path": final_image_name, "skipped": True}
-            
-            for attempt in range(self.max_retries):
-                try:
-                    # 下载图片
-                    async with session.get(url, timeout=self.timeout) as response:
-                        if response.status != 200:
-                            logger.error(f"HTTP {response.status} 错误: {url}")
-                            raise aiohttp.ClientError(f"HTTP {response.status}")
-                            
-                        # 检查内容类型
-                        content_type = response.headers.get('content-type', '')
-                        if not content_type.startswith('image/'):
-                            raise ValueError(f"不是图片格式: {content_type}")
-                            
-                        content = await response.read()
-                        if len(content) < 10:
-                            raise ValueError("文件内容过小")
-                    
-                    # 保存临时文件
-                    async with aiofiles.open(temp_image_name, 'wb') as f:
-                        await f.write(content)
-                    
-                    # 处理图片格式
-                    await self._process_image(temp_image_name, final_image_name)
-                    
-                    # 清理临时文件
-                    if os.path.exists(temp_image_name):
-                        os.remove(temp_image_name)
+                    await self._safe_callback(slide, True, None)
+                
+                return {"success": True, "slide": slide, "path": final_image_name}
+                
+            except Exception as e:
+                if attempt == self.max_retries - 1:
+                    logger.error(f"下载失败: {url} ({str(e)})")
+                    # 最后一次尝试失败，清理文件
+                    for cleanup_file in [temp_image_name, final_image_name]:
+                        if os.path.exists(cleanup_file):
+                            os.remove(cleanup_file)
+                    get_slide_manifest(img_path).discard(f"{index}.jpg")
                     
-                    # 通知进度
                     if self.progress_callback:
-                        await self._safe_callback(slide, True, None)
-                    
-                    return {"success": True, "slide": slide, "path": final_image_name}
-                    
-                except Exception as e:
-                    if attempt == self.max_retries - 1:
-                        logger.error(f"下载失败: {url} ({str(e)})")
-                        # 最后一次尝试失败，清理文件
-                        for cleanup_file in [temp_image_name, final_image_name]:
-                            if os.path.exists(cleanup_file):
-                                os.remove(cleanup_file)
-                        
-                        if self.progress_callback:
-                            await self._safe_callback(slide, False, str(e))
-                        
-                        return {"success": False, "slide": slide, "error": str(e)}
+                        await self._safe_callback(slide, False, str(e))
                     
-                    # 等待后重试
-                    await asyncio.sleep(0.5 * (attempt + 1))
+                    return {"success": False, "slide": slide, "error": str(e)}
+                
+                # 等待后重试
+                await asyncio.sleep(0.5 * (attempt + 1))
     
-    async def _process_image(self, temp_path: str, final_path: str):
+    def _reuse_stored_image(self, url: str, img_path: str, slide: Dict[str, Any]) -> bool:
+        name = f"{slide['index']}.jpg"
+        sha256 = self.blob_store.materialize(url, os.path.join(img_path, name))
+        if sha256 is None:
+            return False
+        # 存储中的图片以内容哈希命名，不需要重新读取文件计算
+        get_slide_manifest(img_path).record(name, url, sha256, slide_id=slide_identifier(slide))
+        return True
+
+    def _store_image(self, url: str, img_path: str, slide: Dict[str, Any], sha256: Optional[str] = None):
+        name = f"{slide['index']}.jpg"
+        sha256 = self.blob_store.put(os.path.join(img_path, name), url, sha256)
+        get_slide_manifest(img_path).record(name, url, sha256, slide_id=slide_identifier(slide))
+
+    async def _fetch(self, session: aiohttp.ClientSession, url: str, path: str):
         """
-        处理图片格式转换（在线程池中执行，避免阻塞事件循环）
+        占用主机的一个并发名额下载到path，并把延迟和错误反馈给并发限制
+
+        Returns:
+            (sha256, 字节数)
         """
-        loop = asyncio.get_event_loop()
-        await loop.run_in_executor(None, self._sync_process_image, temp_path, final_path)
+        limiter = get_host_limiter(url)
+        async with limiter.slot():
+            started = time.monotonic()
+            try:
+                async with session.get(url, timeout=self.timeout) as response:
+                    latency = time.monotonic() - started
+                    if response.status != 200:
+                        if response.status in RETRYABLE_STATUS:
+                            # 限流或服务端繁忙，减小并发
+                            limiter.record_failure()
+                        logger.error(f"HTTP {response.status} 错误: {url}")
+                        raise aiohttp.ClientError(f"HTTP {response.status}")
+
+                    # 检查内容类型
+                    content_type = response.headers.get('content-type', '')
+                    if not content_type.startswith('image/'):
+                        raise ValueError(f"不是图片格式: {content_type}")
+
+                    # 边下载边写入临时文件并计算哈希，不在内存中缓存整张图片
+                    sha256, size = await self._stream_to_file(response, path)
+            except (asyncio.TimeoutError, aiohttp.ClientConnectionError):
+                limiter.record_failure()
+                raise
+            limiter.record_success(latency)
+            return sha256, size
+
+    async def _stream_to_file(self, response, path: str):
+        """
+        分块写入响应内容
+
+        Returns:
+            (sha256, 字节数)
+        """
+        sha256 = hashlib.sha256()
+        size = 0
+        # 收到至少HEADER_SIZE字节后才检查文件头，之前的分块先缓存
+        header = b""
+        async with aiofiles.open(path, 'wb') as f:
+            async for chunk in response.content.iter_chunked(CHUNK_SIZE):
+                if header is not None:
+                    header += chunk
+                    if len(header) < HEADER_SIZE:
+                        continue
+                    if not sniff_image(header[:HEADER_SIZE]):
+                        raise ValueError("文件头不是图片格式")
+                    chunk, header = header, None
+                sha256.update(chunk)
+                size += len(chunk)
+                await f.write(chunk)
+            if header:
+                # 响应不足HEADER_SIZE字节时按已收到的内容检查
+                if not sniff_image(header):
+                    raise ValueError("文件头不是图片格式")
+                sha256.update(header)
+                size += len(header)
+                await f.write(header)
+        return sha256.hexdigest(), size
+
+    async def _process_image(self, temp_path: str, final_path: str) -> bool:
+        """
+        处理图片格式转换（在图片处理进程池中执行，不占用主进程的GIL）
+
+        Returns:
+            文件内容是否未经改动（直接改名）
+        """
+        return await get_image_pool().run_async(normalize_image, temp_path, final_path)
     
-    def _sync_process_image(self, temp_path: str, final_path: str):
+    def _sync_process_image(self, temp_path: str, final_path: str) -> bool:
         """
-        同步处理图片格式转换
+        同步处理图片格式转换，已是RGB JPEG的图片直接改名，不再重新编码
+
+        Returns:
+            文件内容是否未经改动
         """
-        with Image.open(temp_path) as img:
-            # 验证图片完整性
-            img.verify()
-            
-        # 重新打开进行格式转换
-        with Image.open(temp_path) as img:
-            # 处理透明度
-            if img.mode in ('RGBA', 'LA', 'P'):
-                background = Image.new('RGB', img.size, (255, 255, 255))
-                if img.mode == 'P':
-                    img = img.convert('RGBA')
-                background.paste(img, mask=img.split()[-1] if img.mode == 'RGBA' else None)
-                img = background
-            elif img.mode != 'RGB':
-                img = img.convert('RGB')
-            
-            # 保存为JPEG
-            img.save(final_path, 'JPEG', quality=95)
+        return normalize_image(temp_path, final_path)
     
     def _is_valid_image(self, image_path: str) -> bool:
         """
-        检查图片文件是否有效
+        检查图片文件是否有效，清单中记录的文件未变化时不再解码校验
         
         Args:
             image_path: 图片文件路径
@@ -190,20 +283,20 @@ class AsyncImageDownloader:
         Returns:
             bool: 图片是否有效
         """
-        try:
-            if not os.path.exists(image_path):
-                return False
-            
-            # 检查文件大小
-            if os.path.getsize(image_path) < 10:
-                return False
-            
-            # 验证图片完整性
-            with Image.open(image_path) as img:
-                img.verify()
-                return True
-        except Exception:
-            return False
+        return is_valid_slide_image(image_path)
+
+    def _check_existing(self, slides: List[Dict[str, Any]], img_path: str) -> List[bool]:
+        """逐张检查已存在的图片并保存清单，涉及磁盘读写，在线程池中执行"""
+        valid = [
+            self._is_valid_image(os.path.join(img_path, f"{slide['index']}.jpg"))
+            for slide in slides
+        ]
+        get_slide_manifest(img_path).save()
+        return valid
+
+    def _save_caches(self, img_path: str):
+        get_slide_manifest(img_path).save()
+        self.blob_store.save()
     
     async def _safe_callback(self, slide: Dict, success: bool, error: Optional[str]):
         """
@@ -217,32 +310,56 @@ class AsyncImageDownloader:
         except Exception as e:
             print(f"进度回调函数执行失败: {e}")
     
+    def _slide_priority(self, slide: Dict[str, Any]) -> int:
+        """下载优先级，数值越小越先下载：默认题目页优先"""
+        if self.priority_callback:
+            try:
+                return self.priority_callback(slide)
+            except Exception as e:
+                print(f"计算下载优先级失败: {e}")
+        return 1 if "problem" in slide else 2
+
+    def _notify_slide_ready(self, on_slide_ready: Optional[Callable], slide: Dict[str, Any], path: str):
+        if on_slide_ready is None:
+            return
+        try:
+            on_slide_ready(slide, path)
+        except Exception as e:
+            print(f"幻灯片就绪回调执行失败: {e}")
+
     async def download_slides(self, 
                             slides: List[Dict[str, Any]], 
-                            img_path: str) -> Dict[str, Any]:
+                            img_path: str,
+                            on_slide_ready: Optional[Callable] = None) -> Dict[str, Any]:
         """
-        批量下载幻灯片图片
+        批量下载幻灯片图片，按优先级（题目页优先）从队列中取出下载
         
         Args:
             slides: 幻灯片列表
             img_path: 图片保存路径
+            on_slide_ready: 每张图片可用时调用on_slide_ready(slide, 图片路径)，
+                            不必等待整套幻灯片下载完成
             
         Returns:
             下载结果统计
         """
         start_time = time.time()
+        loop = asyncio.get_event_loop()
         
         # 如果启用了跳过已存在文件，先过滤掉已存在的有效文件
         if self.skip_existing:
             slides_to_download = []
             skipped_count = 0
             
-            for slide in slides:
+            ordered = sorted(slides, key=self._slide_priority)
+            existing = await loop.run_in_executor(None, self._check_existing, ordered, img_path)
+            for slide, valid in zip(ordered, existing):
                 image_path = os.path.join(img_path, f"{slide['index']}.jpg")
-                if self._is_valid_image(image_path):
+                if valid:
                     skipped_count += 1
                     if self.progress_callback:
                         await self._safe_callback(slide, True, "文件已存在，跳过下载")
+                    self._notify_slide_ready(on_slide_ready, slide, image_path)
                 else:
                     slides_to_download.append(slide)
             
@@ -262,19 +379,34 @@ class AsyncImageDownloader:
                 "duration": 0
             }
         
-        # 创建HTTP会话
-        connector = aiohttp.TCPConnector(limit=self.max_concurrent)
-        timeout = aiohttp.ClientTimeout(total=self.timeout)
-        
-        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
-            # 创建下载任务
-            tasks = [
-                self.download_image(session, slide, img_path)
-                for slide in slides_to_download
-            ]
-            
-            # 并发执行所有下载任务
-            results = await asyncio.gather(*tasks, return_exceptions=True)
+        # 按优先级排队，位置序号保证同优先级按原顺序且不比较幻灯片字典
+        queue = asyncio.PriorityQueue()
+        for position, slide in enumerate(slides_to_download):
+            queue.put_nowait((self._slide_priority(slide), position, slide))
+        results = []
+
+        async def worker(session):
+            while True:
+                try:
+                    _, _, slide = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                try:
+                    result = await self.download_image(session, slide, img_path)
+                except Exception as e:
+                    results.append(e)
+                    continue
+                results.append(result)
+                if result.get("success"):
+                    self._notify_slide_ready(on_slide_ready, slide, result.get("path"))
+
+        # 在共享下载事件循环中复用长连接会话
+        limit = self.max_concurrent or MAX_CONCURRENCY
+        async with download_session(limit=limit, timeout=self.timeout) as session:
+            # 实际并发还受各主机的自适应限制约束
+            workers = min(limit, len(slides_to_download))
+            await asyncio.gather(*[worker(session) for _ in range(workers)])
+        await loop.run_in_executor(None, self._save_caches, img_path)
         
         # 统计结果
         successful = []
@@ -308,7 +440,7 @@ class AsyncPPTDownloadManager:
     """异步PPT下载管理器"""
     
     def __init__(self, 
-                 max_concurrent: int = 8,
+                 max_concurrent: Optional[int] = None,
                  max_retries: int = 5,
                  progress_callback: Optional[Callable] = None,
                  skip_existing: bool = True):
@@ -316,7 +448,7 @@ class AsyncPPTDownloadManager:
         初始化异步PPT下载管理器
         
         Args:
-            max_concurrent: 最大并发数
+            max_concurrent: 最大并发数，为空时只受各主机的自适应并发限制
             max_retries: 最大重试次数
             progress_callback: 进度回调函数
             skip_existing: 是否跳过已存在的文件
@@ -344,6 +476,15 @@ class AsyncPPTDownloadManager:
         self.presentation_id = presentation_id
         self.data_refresh_callback = callback
     
+    def set_priority_callback(self, callback: Optional[Callable]):
+        """
+        设置幻灯片下载优先级回调
+
+        Args:
+            callback: callback(slide) -> int，数值越小越先下载
+        """
+        self.downloader.priority_callback = callback
+
     async def refresh_slides_data(self) -> Optional[List[Dict[str, Any]]]:
         """
         刷新幻灯片数据
@@ -369,13 +510,15 @@ class AsyncPPTDownloadManager:
             print(f"数据刷新异常：{str(e)}")
             return None
     
-    async def download_presentation(self, data: Dict[str, Any], lessonname: str = "未知课程") -> Dict[str, Any]:
+    async def download_presentation(self, data: Dict[str, Any], lessonname: str = "未知课程",
+                                    on_slide_ready: Optional[Callable] = None) -> Dict[str, Any]:
         """
         下载整个演示文稿
         
         Args:
             data: 演示文稿数据，包含title、slides等信息
             lessonname: 课程名称
+            on_slide_ready: 每张图片可用时调用on_slide_ready(slide, 图片路径)
             
         Returns:
             下载结果
@@ -399,10 +542,16 @@ class AsyncPPTDownloadManager:
         
         # 如果启用跳过已存在文件，先检查已存在的文件数量
         if self.skip_existing:
-            existing_count = sum(1 for slide in slides 
-                               if self.validate_image(os.path.join(img_path, f"{slide['index']}.jpg")))
+            missing = await asyncio.get_event_loop().run_in_executor(
+                None, self.get_missing_images, slides, img_path
+            )
+            existing_count = len(slides) - len(missing)
             if existing_count == len(slides):
                 print(f"所有 {len(slides)} 个文件都已存在且有效，跳过下载")
+                for slide in sorted(slides, key=self.downloader._slide_priority):
+                    self.downloader._notify_slide_ready(
+                        on_slide_ready, slide, os.path.join(img_path, f"{slide['index']}.jpg")
+                    )
                 return {
                     "total": len(slides),
                     "successful": len(slides),
@@ -411,18 +560,20 @@ class AsyncPPTDownloadManager:
                 }
         
         # 执行下载
-        result = await self.download_with_retry(slides, img_path)
+        result = await self.download_with_retry(slides, img_path, on_slide_ready)
         return result
 
     async def download_with_retry(self, 
                                 slides: List[Dict[str, Any]], 
-                                img_path: str) -> Dict[str, Any]:
+                                img_path: str,
+                                on_slide_ready: Optional[Callable] = None) -> Dict[str, Any]:
         """
         带重试机制的下载，支持数据刷新重试
         
         Args:
             slides: 幻灯片列表
             img_path: 图片保存路径
+            on_slide_ready: 每张图片可用时调用on_slide_ready(slide, 图片路径)
             
         Returns:
             最终下载结果
@@ -437,7 +588,7 @@ class AsyncPPTDownloadManager:
                 
             print(f"第 {attempt + 1} 次下载尝试，剩余 {len(remaining_slides)} 张图片")
             
-            result = await self.downloader.download_slides(remaining_slides, img_path)
+            result = await self.downloader.download_slides(remaining_slides, img_path, on_slide_ready)
             
             # 收集成功的下载
             all_successful.extend(result["success_list"])
@@ -499,18 +650,7 @@ class AsyncPPTDownloadManager:
         """
         验证图片文件的有效性
         """
-        try:
-            if not os.path.exists(image_path):
-                return False
-            
-            if os.path.getsize(image_path) < 10:
-                return False
-            
-            with Image.open(image_path) as img:
-                img.verify()
-                return True
-        except Exception:
-            return False
+        return is_valid_slide_image(image_path)
     
     def get_missing_images(self, slides: List[Dict[str, Any]], img_path: str) -> List[Dict[str, Any]]:
         """
@@ -521,4 +661,5 @@ class AsyncPPTDownloadManager:
             image_path = os.path.join(img_path, f"{slide['index']}.jpg")
             if not self.validate_image(image_path):
                 missing.append(slide)
+        get_slide_manifest(img_path).save()
         return missing
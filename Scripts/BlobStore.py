@@ -0,0 +1,160 @@
+"""
+幻灯片图片内容寻址存储模块
+图片按内容哈希保存在blobs目录中，并记录封面URL到哈希的映射；
+各演示文稿目录中的图片通过硬链接（不支持时复制）引用同一份内容，
+同一套课件在不同班级、改名或更新后重复出现时无需再次下载
+"""
+
+import json
+import os
+import shutil
+import threading
+from typing import Dict, Optional
+
+try:
+    from .SlideManifest import file_sha256
+except ImportError:
+    # 作为独立模块导入时（Scripts目录在sys.path中）
+    from SlideManifest import file_sha256
+
+DEFAULT_BLOB_ROOT = os.path.join("downloads", "rainclasscache", "blobs")
+URL_INDEX_NAME = "url_index.json"
+
+
+class BlobStore:
+    """
+    内容寻址的图片存储
+
+    - blobs/<哈希前两位>/<sha256>.jpg 保存图片内容，只写入一次
+    - url_index.json 记录封面URL -> sha256
+    """
+
+    def __init__(self, root: str = DEFAULT_BLOB_ROOT):
+        self.root = root
+        self.index_path = os.path.join(root, URL_INDEX_NAME)
+        self._urls: Dict[str, str] = {}
+        self._dirty = False
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if isinstance(data, dict):
+            self._urls = {str(url): str(digest) for url, digest in data.items()}
+
+    def blob_path(self, sha256: str) -> str:
+        return os.path.join(self.root, sha256[:2], sha256 + ".jpg")
+
+    def lookup(self, url: str) -> Optional[str]:
+        """根据封面URL查找已存储的图片，返回blob路径"""
+        if not url:
+            return None
+        with self._lock:
+            digest = self._urls.get(url)
+        if not digest:
+            return None
+        path = self.blob_path(digest)
+        try:
+            if os.path.getsize(path) >= 10:
+                return path
+        except OSError:
+            pass
+        # blob已被删除，清除失效的映射
+        with self._lock:
+            if self._urls.get(url) == digest:
+                del self._urls[url]
+                self._dirty = True
+        return None
+
+    @staticmethod
+    def _link(source: str, dest: str):
+        """原子地让dest指向source的内容，优先硬链接，失败时复制"""
+        temp_path = dest + ".link"
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        try:
+            os.link(source, temp_path)
+        except OSError:
+            shutil.copyfile(source, temp_path)
+        os.replace(temp_path, dest)
+
+    def materialize(self, url: str, dest: str) -> Optional[str]:
+        """
+        若封面URL已有存储的图片，将其链接到dest
+
+        Returns:
+            命中时返回图片的内容哈希，未命中时为None
+        """
+        path = self.lookup(url)
+        if path is None:
+            return None
+        try:
+            self._link(path, dest)
+        except OSError as e:
+            print(f"从图片存储复用失败: {dest}, 错误: {e}")
+            return None
+        return os.path.splitext(os.path.basename(path))[0]
+
+    def put(self, path: str, url: Optional[str] = None, sha256: Optional[str] = None) -> Optional[str]:
+        """
+        把已校验的图片加入存储，并让path改为引用存储中的内容
+
+        Args:
+            path: 演示文稿目录中的图片路径
+            url: 封面URL
+            sha256: 已计算的内容哈希，为空时重新计算
+
+        Returns:
+            内容哈希，失败时为None
+        """
+        try:
+            digest = sha256 or file_sha256(path)
+            blob = self.blob_path(digest)
+            if os.path.exists(blob):
+                # 内容已存在（不同URL的相同图片），让path共用这份内容
+                if not os.path.samefile(blob, path):
+                    self._link(blob, path)
+            else:
+                os.makedirs(os.path.dirname(blob), exist_ok=True)
+                self._link(path, blob)
+        except OSError as e:
+            print(f"写入图片存储失败: {path}, 错误: {e}")
+            return None
+        if url:
+            with self._lock:
+                if self._urls.get(url) != digest:
+                    self._urls[url] = digest
+                    self._dirty = True
+        return digest
+
+    def save(self):
+        """有变化时原子写入URL索引，写入期间持有锁，多个课程同时保存时不会互相覆盖临时文件"""
+        with self._lock:
+            if not self._dirty:
+                return
+            temp_path = self.index_path + ".tmp"
+            try:
+                os.makedirs(self.root, exist_ok=True)
+                with open(temp_path, "w", encoding="utf-8") as f:
+                    json.dump(self._urls, f, ensure_ascii=False)
+                os.replace(temp_path, self.index_path)
+                self._dirty = False
+            except OSError as e:
+                print(f"保存图片存储索引失败: {e}")
+
+
+_blob_store: Optional[BlobStore] = None
+_blob_store_lock = threading.Lock()
+
+
+def get_blob_store() -> BlobStore:
+    """获取进程内共享的图片存储"""
+    global _blob_store
+    with _blob_store_lock:
+        if _blob_store is None:
+            _blob_store = BlobStore()
+        return _blob_store
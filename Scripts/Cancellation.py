@@ -0,0 +1,108 @@
+"""
+取消令牌模块
+监听器、课程、下载和答题计时共用的停止信号，替代按秒轮询is_active的实现
+"""
+
+import asyncio
+import threading
+from typing import Callable, List, Optional
+
+from .Logger import logger
+
+
+class CancellationToken:
+    """
+    取消令牌
+
+    - 基于threading.Event，wait(timeout)在取消时立即返回
+    - 可注册取消回调（关闭连接、取消待提交答案等），取消时按注册顺序执行一次
+    - child()生成子令牌，父令牌取消时子令牌一并取消，子令牌取消不影响父令牌
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._callbacks: List[Callable[[], None]] = []
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self):
+        """发出取消信号，重复调用无副作用"""
+        with self._lock:
+            if self._event.is_set():
+                return
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as exc:
+                logger.error("取消回调执行失败: {}", exc)
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """等待至多timeout秒，已取消时返回True"""
+        return self._event.wait(timeout)
+
+    def add_callback(self, callback: Callable[[], None]) -> Callable[[], None]:
+        """注册取消回调，已取消时立即执行；返回值用于remove_callback"""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return callback
+        callback()
+        return callback
+
+    def remove_callback(self, callback: Callable[[], None]):
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+    def child(self) -> "CancellationToken":
+        """生成随本令牌一起取消的子令牌"""
+        token = CancellationToken()
+        callback = self.add_callback(token.cancel)
+        # 子令牌先被取消时从父令牌移除回调，避免长期运行时回调列表不断增长
+        token.add_callback(lambda: self.remove_callback(callback))
+        return token
+
+    async def sleep(self, delay: float) -> bool:
+        """
+        在事件循环中等待delay秒，取消时立即返回
+
+        Returns:
+            等待期间是否被取消
+        """
+        if self.cancelled:
+            return True
+        loop = asyncio.get_running_loop()
+        waiter = loop.create_future()
+
+        def wake():
+            loop.call_soon_threadsafe(
+                lambda: waiter.done() or waiter.set_result(None)
+            )
+
+        callback = self.add_callback(wake)
+        try:
+            await asyncio.wait({waiter}, timeout=delay)
+        finally:
+            self.remove_callback(callback)
+            waiter.cancel()
+        return self.cancelled
+
+    async def run(self, coro):
+        """
+        在事件循环中执行协程，令牌取消时取消该协程
+
+        Raises:
+            asyncio.CancelledError: 执行期间令牌被取消
+        """
+        task = asyncio.ensure_future(coro)
+        loop = asyncio.get_running_loop()
+        callback = self.add_callback(lambda: loop.call_soon_threadsafe(task.cancel))
+        try:
+            return await task
+        finally:
+            self.remove_callback(callback)
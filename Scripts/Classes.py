@@ -1,16 +1,23 @@
 import json
+import os
 import random
 import threading
 import time
 import traceback
 import asyncio
-from concurrent.futures import ThreadPoolExecutor
-
-import requests
-import websocket
+from concurrent.futures import CancelledError
 
+from .AnswerScheduler import get_answer_scheduler
+from .ApiClient import get_api_client, session_headers
+from .Cancellation import CancellationToken
+from .DownloadLoop import get_ai_executor, get_download_loop, get_task_executor
+from .EventSink import as_event_sink
+from .LessonRuntime import get_lesson_runtime
 from .PPTManager import PPTManager
-from .AIAnswerAnalyzer import AIAnswerAnalyzer
+from .PresentationCache import get_presentation_cache
+from .ProblemStore import ProblemStore, problem_identifiers
+from .SharedWork import get_shared_downloads
+from .AIAnswerAnalyzer import get_ai_analyzer
 from .AsyncDownloader import AsyncPPTDownloadManager
 from .Logger import logger
 from .Utils import (
@@ -23,29 +30,30 @@ from .Utils import (
 
 
 class Lesson:
-    def __init__(self, lessonid, lessonname, classroomid, main_ui):
+    def __init__(self, lessonid, lessonname, classroomid, main_ui, user_info=None, stop_token=None):
         self.classroomid = classroomid
         self.lessonid = lessonid
         self.lessonname = lessonname
-        self.sessionid = main_ui.config["sessionid"]
-        self.headers = {
-            "Cookie": "sessionid=%s" % self.sessionid,
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:97.0) Gecko/20100101 Firefox/97.0",
-        }
+        # main_ui可以是MainWindow_Ui，也可以是任意EventSink（无界面运行）
+        self.event_sink = as_event_sink(main_ui)
+        self.sessionid = self.event_sink.config["sessionid"]
+        self.headers = session_headers(self.sessionid)
         self.receive_danmu = {}
         self.sent_danmu_dict = {}
         self.danmu_dict = {}
-        self.problems_ls = []
-        self.problems_dict = {}
+        self._problem_store = ProblemStore()
         self.problem_display_indexes = {}
         self.unlocked_problem = []
         self.classmates_ls = []
-        self.add_message = main_ui.add_message_signal.emit
-        self.add_course = main_ui.add_course_signal.emit
-        self.del_course = main_ui.del_course_signal.emit
-        self.config = main_ui.config
+        self.add_message = self.event_sink.add_message
+        self.add_course = self.event_sink.add_course
+        self.del_course = self.event_sink.del_course
+        self.config = self.event_sink.config
         self.region = self.config["region"]
-        code, rtn = get_user_info(self.sessionid, self.config["region"])
+        # 允许调用方传入已缓存的用户信息，避免每个课程都请求一次
+        if user_info is None:
+            user_info = get_user_info(self.sessionid, self.config["region"])
+        code, rtn = user_info
         
         # 检查返回的数据类型和API响应状态
         if code != 0 or not isinstance(rtn, dict):
@@ -62,7 +70,6 @@ class Lesson:
             
         self.user_uid = rtn["id"]
         self.user_uname = rtn["name"]
-        self.main_ui = main_ui
         # self.pptmanager_dict = {}
         
         # AI答案分析器延迟初始化
@@ -70,7 +77,11 @@ class Lesson:
         
         # 异步下载管理器
         self._async_download_manager = None
-        self._executor = ThreadPoolExecutor(max_workers=4)
+        # 为None时后台任务使用进程内共享的线程池
+        self._executor = None
+        # 停止令牌：下课或监听器停止时取消，连接、下载和待提交答案随之停止
+        self._stop_token = None
+        self._bind_stop_token(stop_token or CancellationToken())
 
     def _ensure_download_tracking(self):
         if not hasattr(self, 'downloaded_presentations'):
@@ -82,18 +93,52 @@ class Lesson:
     def ai_analyzer(self):
         """延迟初始化AI答案分析器"""
         if self._ai_analyzer is None:
-            self._ai_analyzer = AIAnswerAnalyzer(self.config, self.add_message)
+            # 相同AI配置的课程（包括不同账号）共用一个分析器
+            self._ai_analyzer = get_ai_analyzer(self.config, self.add_message)
         return self._ai_analyzer
     
+    @property
+    def problem_store(self):
+        """按演示文稿分组、按题目标识索引的题目存储"""
+        if getattr(self, "_problem_store", None) is None:
+            self._problem_store = ProblemStore()
+        return self._problem_store
+
+    def _update_problems(self, presentationid):
+        # 同一演示文稿的题目整体替换，避免重复推送时列表无限增长
+        self.problem_store.replace_presentation(
+            presentationid, self.get_problems(presentationid)
+        )
+
+    @property
+    def api(self):
+        """当前区域共享的接口客户端"""
+        return get_api_client(self.config["region"])
+
+    @property
+    def executor(self):
+        """后台任务线程池，所有课程共用，不随课程创建"""
+        if getattr(self, "_executor", None) is None:
+            return get_task_executor()
+        return self._executor
+
+    @property
+    def ai_executor(self):
+        """AI分析线程池，所有课程共用，与后台任务线程池分开"""
+        if getattr(self, "_ai_executor", None) is None:
+            return get_ai_executor()
+        return self._ai_executor
+
     @property
     def async_download_manager(self):
         """获取异步下载管理器实例"""
         if self._async_download_manager is None:
+            # 不设固定并发数，由各主机的自适应并发限制控制
             self._async_download_manager = AsyncPPTDownloadManager(
-                max_concurrent=8,
                 max_retries=5,
                 progress_callback=self._async_progress_callback
             )
+            self._async_download_manager.set_priority_callback(self._slide_priority)
         return self._async_download_manager
     
     def _async_progress_callback(self, slide, success, error=None):
@@ -113,7 +158,7 @@ class Lesson:
             # 设置数据刷新回调，用于重试时获取最新数据
             presentation_id = getattr(self, '_current_presentation_id', None)
             if presentation_id:
-                ppt_manager.set_data_refresh_callback(presentation_id, self._get_ppt)
+                ppt_manager.set_data_refresh_callback(presentation_id, self._refresh_ppt)
             
             pdfname, usetime = ppt_manager.start()
             if pdfname is None or usetime is None:
@@ -131,6 +176,71 @@ class Lesson:
             self.add_message("下载ppt失败 : " + data["title"] + ".pdf", 0)
             self.add_message(traceback.format_exc(), 0)
             
+    def _slide_priority(self, slide):
+        """幻灯片下载优先级：已解锁的题目页 > 其他题目页 > 普通页"""
+        if "problem" not in slide:
+            return 2
+        unlocked = {str(problemid) for problemid in getattr(self, "unlocked_problem", [])}
+        if unlocked.intersection(self._problem_identifiers(slide)):
+            return 0
+        return 1
+
+    def _ai_slide_handler(self, data):
+        """
+        返回逐页AI分析回调：题目页图片一下载完成就交给AI分析，
+        不等整套PPT下载和PDF生成；未启用AI分析时返回None
+
+        同一演示文稿的AI请求本来就依次执行，题目页先排队，
+        由AI分析线程池中的一个线程逐个分析，不为每页占用一个线程
+        """
+        if not self.config.get('enable_ai_analysis', False):
+            return None
+        presentation_title = data["title"]
+        slides_data = data["slides"]
+        pending = []
+        running = [False]
+        lock = threading.Lock()
+
+        def drain():
+            while True:
+                with lock:
+                    if not pending or self.stop_token.cancelled:
+                        pending.clear()
+                        running[0] = False
+                        return
+                    slide, image_path = pending.pop(0)
+                self._analyze_problem_slide(presentation_title, slides_data, slide, image_path)
+
+        def on_slide_ready(slide, image_path):
+            if "problem" not in slide:
+                return
+            # 回调在下载事件循环中执行，AI请求放到AI分析线程池
+            with lock:
+                pending.append((slide, image_path))
+                if running[0]:
+                    return
+                running[0] = True
+            try:
+                self.ai_executor.submit(drain)
+            except RuntimeError:
+                # 程序退出时线程池已关闭
+                with lock:
+                    pending.clear()
+                    running[0] = False
+
+        return on_slide_ready
+
+    def _analyze_problem_slide(self, presentation_title, slides_data, slide, image_path):
+        try:
+            answers = self.ai_analyzer.analyze_problem_slide(
+                self.lessonname, presentation_title, slides_data, slide, image_path
+            )
+        except Exception as e:
+            self.add_message(f"AI分析题目页失败: {str(e)}", 0)
+            return
+        if answers:
+            self._index_ai_answers(presentation_title, slides_data, answers)
+
     def _start_ai_analysis(self, data, ppt_manager):
         """启动AI分析"""
         try:
@@ -146,6 +256,7 @@ class Lesson:
             
             # 定义分析完成回调
             def analysis_callback(lesson_name, title, answers_cache):
+                self._index_ai_answers(title, slides_data, answers_cache)
                 if answers_cache:
                     self.add_message(f"AI分析完成: {title}，共分析 {len(answers_cache)} 个问题", 0)
                 else:
@@ -165,6 +276,70 @@ class Lesson:
         except Exception as e:
             self.add_message(f"启动AI分析失败: {str(e)}", 0)
 
+    def _ensure_ai_answer_index(self):
+        if getattr(self, "_ai_answer_index", None) is None:
+            self._ai_answer_index = {}
+        return self._ai_answer_index
+
+    def _index_ai_answers(self, presentation_title, slides_data, answers_cache):
+        """建立题目标识/页码到AI缓存答案的索引，答题时直接查表"""
+        ai_answer_index = self._ensure_ai_answer_index()
+        cache_file = self.ai_analyzer.get_cache_file_path(
+            self.lessonname, presentation_title
+        )
+        mtime = self._get_mtime(cache_file)
+        answers_cache = answers_cache or {}
+        for slide in slides_data:
+            if "problem" not in slide:
+                continue
+            slide_index = str(slide.get("index", ""))
+            entry = {
+                "title": presentation_title,
+                "slide_index": slide_index,
+                "answer": answers_cache.get(slide_index),
+                "cache_file": cache_file,
+                "mtime": mtime,
+            }
+            for identifier in self._problem_identifiers(slide):
+                ai_answer_index[identifier] = entry
+            ai_answer_index[("index", slide_index)] = entry
+
+    @staticmethod
+    def _get_mtime(path):
+        try:
+            return os.stat(path).st_mtime
+        except OSError:
+            return None
+
+    def _lookup_ai_answer(self, problemid, problem=None):
+        """按题目标识查找AI缓存答案，找不到时按页码查找"""
+        ai_answer_index = getattr(self, "_ai_answer_index", None)
+        if not ai_answer_index:
+            return None, None
+
+        entry = ai_answer_index.get(str(problemid))
+        if entry is None and problem:
+            for identifier in problem_identifiers(problem):
+                entry = ai_answer_index.get(identifier)
+                if entry is not None:
+                    break
+            if entry is None and problem.get("index") is not None:
+                entry = ai_answer_index.get(("index", str(problem["index"])))
+        if entry is None:
+            return None, None
+
+        # 缓存文件被人工修改过时才重新读取
+        mtime = self._get_mtime(entry["cache_file"])
+        if mtime is not None and mtime != entry["mtime"]:
+            cached_answers = self.ai_analyzer.load_cached_answers(
+                self.lessonname, entry["title"]
+            ) or {}
+            for other in ai_answer_index.values():
+                if other["cache_file"] == entry["cache_file"]:
+                    other["answer"] = cached_answers.get(other["slide_index"])
+                    other["mtime"] = mtime
+        return entry["answer"], entry
+
     def _record_problem_display_indexes(self, events):
         """记录课堂事件流中的题目显示页码。"""
         if not hasattr(self, "problem_display_indexes"):
@@ -246,6 +421,8 @@ class Lesson:
     def download_ppt(self, presentationid, force_refresh=False):
         """使用协程异步下载PPT"""
         self._ensure_download_tracking()
+        if self.stop_token.cancelled:
+            return
         if not force_refresh and (
             presentationid in self.downloaded_presentations
             or presentationid in self.downloading_presentations
@@ -257,30 +434,59 @@ class Lesson:
             self.downloading_presentations.discard(presentationid)
 
         self.downloading_presentations.add(presentationid)
-        
+
+        # 多个账号参加同一节课时，同一演示文稿只由一个课程下载，其余课程等待结果
+        shared_key = self._shared_download_key(presentationid)
+        work, is_owner = get_shared_downloads().start(shared_key, force=force_refresh)
+        if not is_owner:
+            work.add_done_callback(
+                lambda future: self.executor.submit(
+                    lambda: self._use_shared_download(presentationid, future.result())
+                )
+            )
+            return
+
         def run_async_download():
+            success = False
             try:
-                # 在线程池中运行异步任务
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-                try:
-                    ppt_data = self._get_ppt(presentationid)
-                    loop.run_until_complete(
-                        self._async_download(
-                            ppt_data,
-                            presentationid,
-                            force_refresh=force_refresh,
-                        )
+                ppt_data = self._get_ppt(presentationid)
+                # 在共享的下载事件循环中执行，复用长连接会话
+                success = get_download_loop().run(
+                    self._async_download(
+                        ppt_data,
+                        presentationid,
+                        force_refresh=force_refresh,
                     )
-                finally:
-                    loop.close()
+                )
             except Exception as e:
                 self.add_message(f"异步下载失败: {str(e)}", 0)
             finally:
                 self.downloading_presentations.discard(presentationid)
+                get_shared_downloads().finish(shared_key, work, bool(success))
         
         # 在线程池中执行异步下载
-        self._executor.submit(run_async_download)
+        self.executor.submit(run_async_download)
+
+    def _shared_download_key(self, presentationid):
+        # 同一节课的lessonid对所有账号相同
+        return (self.config.get("region"), getattr(self, "lessonid", None), presentationid)
+
+    def _use_shared_download(self, presentationid, success):
+        """其他课程完成下载后，直接使用已生成的图片和PDF"""
+        try:
+            if not success or self.stop_token.cancelled:
+                return
+            data = self._normalize_slides_with_problem_display_indexes(
+                self._get_ppt(presentationid)
+            )
+            ppt_manager = PPTManager(data, self.lessonname)
+            self.downloaded_presentations.add(presentationid)
+            self.add_message(f"已复用其他账号下载的演示文稿: {data['title']}", 0)
+            self._start_ai_analysis(data, ppt_manager)
+        except Exception as e:
+            self.add_message(f"复用已下载演示文稿失败: {str(e)}", 0)
+        finally:
+            self.downloading_presentations.discard(presentationid)
     
     async def _async_download(self, data, presentation_id=None, force_refresh=False):
         """异步下载方法"""
@@ -291,19 +497,38 @@ class Lesson:
             if presentation_id is None:
                 presentation_id = getattr(self, '_current_presentation_id', None)
 
+            # 协程运行在共享的下载事件循环中，磁盘和CPU密集的步骤放到线程池执行
+            loop = asyncio.get_running_loop()
             data = self._normalize_slides_with_problem_display_indexes(data)
             ppt_manager = PPTManager(data, self.lessonname)
+            ppt_manager.presentation_id = presentation_id
             if force_refresh:
-                ppt_manager.delete_cache()
+                # 只清理新增/变化/已移除的幻灯片，未变化的图片继续使用
+                diff = await loop.run_in_executor(None, ppt_manager.refresh_cache)
+                self.add_message(
+                    f"演示文稿已更新: {presentation_title}，"
+                    f"{len(diff['changed'])} 页需重新获取，移除 {len(diff['removed'])} 页",
+                    0,
+                )
 
             download_manager = self.async_download_manager
             if presentation_id:
-                download_manager.set_data_refresh_callback(presentation_id, self._get_ppt)
+                download_manager.set_data_refresh_callback(presentation_id, self._refresh_ppt)
 
-            # 使用异步下载管理器，传入课程名称
-            download_result = await download_manager.download_presentation(data, self.lessonname)
+            # 使用异步下载管理器，传入课程名称；停止监听时取消未完成的下载
+            try:
+                download_result = await self.stop_token.run(
+                    download_manager.download_presentation(
+                        data, self.lessonname, on_slide_ready=self._ai_slide_handler(data)
+                    )
+                )
+            except asyncio.CancelledError:
+                if not self.stop_token.cancelled:
+                    raise
+                self.add_message(f"监听已停止，取消下载: {presentation_title}", 0)
+                return
 
-            missing_images = ppt_manager.get_missing_images()
+            missing_images = await loop.run_in_executor(None, ppt_manager.get_missing_images)
             if download_result.get("failed", 0) > 0 or missing_images:
                 self.add_message(
                     f"图片下载未完成: {presentation_title}，将保留为待重试",
@@ -323,7 +548,7 @@ class Lesson:
                 self.add_message(f"开始生成PDF: {presentation_title}", 0)
                 
                 # 直接调用generate_ppt方法生成PDF（跳过下载步骤，因为图片已经下载完成）
-                pdf_name = ppt_manager.generate_ppt()
+                pdf_name = await loop.run_in_executor(None, ppt_manager.generate_ppt)
                 
                 if pdf_name:
                     self.add_message(f"PDF生成成功: {pdf_name}", 0)
@@ -332,7 +557,8 @@ class Lesson:
                         self.downloaded_presentations.add(presentation_id)
                     
                     # 启动AI分析
-                    self._start_ai_analysis(data, ppt_manager)
+                    await loop.run_in_executor(None, self._start_ai_analysis, data, ppt_manager)
+                    return True
                 else:
                     self.add_message(f"PDF生成失败: {presentation_title}", 0)
                     
@@ -342,14 +568,24 @@ class Lesson:
         except Exception as e:
             self.add_message(f"异步下载过程中出错: {str(e)}", 0)
 
+    def _presentation_key(self, presentationid):
+        # 题目的作答状态因用户而异，缓存键包含sessionid
+        return (getattr(self, "sessionid", None), self.config.get("region"), presentationid)
+
     def _get_ppt(self, presentationid):
-        # 获取课程各页ppt
-        r = requests.get(
-            url=f"https://{get_host(self.config['region'])}/api/v3/lesson/presentation/fetch?presentation_id={presentationid}",
-            headers=self.headers,
-            proxies={"http": None, "https": None},
+        # 获取课程各页ppt，有效期内同一演示文稿只请求一次，并发请求合并
+        return get_presentation_cache().get(
+            self._presentation_key(presentationid),
+            lambda: self.api.fetch_presentation(presentationid, self.headers),
         )
-        return dict_result(r.text)["data"]
+
+    def _refresh_ppt(self, presentationid):
+        # 跳过缓存重新获取，用于图片地址为空时刷新数据
+        self._invalidate_ppt(presentationid)
+        return self._get_ppt(presentationid)
+
+    def _invalidate_ppt(self, presentationid):
+        get_presentation_cache().invalidate(self._presentation_key(presentationid))
 
     def print_problems(self, data):
         answers = {}
@@ -387,54 +623,34 @@ class Lesson:
         return problems
 
     def answer_questions(self, problemid, problemtype, answer, limit):
-        # 回答问题
-        print(f"problemtype: {problemtype}")
-        print(f"answer: {answer}")
-        enter_function_time = time.time()
-        
+        """同步接口：安排答题并等待提交结果"""
+        job = self.schedule_answer(problemid, problemtype, answer, limit)
+        if job is None:
+            return False
+        try:
+            return job.result()
+        except CancelledError:
+            return False
+
+    def schedule_answer(self, problemid, problemtype, answer, limit):
+        """
+        计算等待时间并把答题提交交给共享调度器
+
+        Returns:
+            ScheduledJob，没有可提交的答案时返回None
+        """
         # 如果answer为空或转bool为false，尝试使用AI缓存答案覆盖
         if not answer and self.config.get('enable_ai_analysis', False):
             try:
-                # 从problems_ls中找到对应的问题，获取其slide index
-                current_problem = None
-                for problem in self.problems_ls:
-                    if problem.get("problemId") == problemid:
-                        current_problem = problem
-                        break
-                
-                if current_problem and current_problem.get("index"):
-                    slide_index = current_problem["index"]
-                    
-                    # 需要获取presentation_title，从当前问题所属的presentation获取
-                    # 遍历所有已下载的presentation来找到包含此问题的presentation
-                    for presentationid in getattr(self, 'downloaded_presentations', set()):
-                        try:
-                            ppt_data = self._get_ppt(presentationid)
-                            presentation_title = ppt_data["title"].replace("/", "_").strip()
-                            
-                            # 检查这个presentation是否包含当前问题
-                            slides = [slide for slide in ppt_data["slides"] if "problem" in slide.keys()]
-                            slide_indices = [slide["index"] for slide in slides]
-                            
-                            if slide_index in slide_indices:
-                                # 找到了包含此问题的presentation，尝试获取AI缓存答案
-                                cached_answers = self.ai_analyzer.load_cached_answers(
-                                    self.lessonname,
-                                    presentation_title
-                                )
-                                
-                                if cached_answers and str(slide_index) in cached_answers:
-                                    ai_answer = cached_answers[str(slide_index)]
-                                    if ai_answer:  # 确保AI答案不为空
-                                        answer = ai_answer
-                                        self.add_message(f"使用AI缓存答案 - 问题ID {problemid}, 幻灯片 {slide_index}: {ai_answer}", 0)
-                                        break
-                        except Exception as e:
-                            continue  # 如果某个presentation获取失败，继续尝试下一个
-                            
+                # 从题目索引和AI答案索引中直接查找，不再请求网络或读取文件
+                current_problem = self.problem_store.find(problemid)
+                ai_answer, entry = self._lookup_ai_answer(problemid, current_problem)
+                if ai_answer:  # 确保AI答案不为空
+                    answer = ai_answer
+                    self.add_message(f"使用AI缓存答案 - 问题ID {problemid}, 幻灯片 {entry['slide_index']}: {ai_answer}", 0)
             except Exception as e:
                 self.add_message(f"获取AI缓存答案失败: {str(e)}", 0)
-        
+
         if answer and problemtype != 3:
             wait_time = calculate_waittime(
                 limit,
@@ -449,10 +665,6 @@ class Lesson:
                 )
                 # threading.Thread(target=say_something,args=(meg,)).start()
                 self.add_message(meg, 3)
-                while 1:
-                    time.sleep(1)
-                    if time.time() - enter_function_time >= wait_time:
-                        break
             else:
                 meg = "%s检测到问题，剩余时间小于15秒，将立即自动回答，答案为%s" % (
                     self.lessonname,
@@ -460,46 +672,14 @@ class Lesson:
                 )
                 self.add_message(meg, 3)
                 # threading.Thread(target=say_something,args=(meg,)).start()
-            submit_answer = self._format_answer_for_submit(problemtype, answer)
-            data = {
-                "problemId": problemid,
-                "problemType": problemtype,
-                "dt": int(time.time()),
-                "result": submit_answer,
-            }
-            self.add_message(f"[DEBUG] 答题提交payload: {data}", 0)
-            r = requests.post(
-                url=f"https://{get_host(self.config['region'])}/api/v3/lesson/problem/answer",
-                headers=self.headers,
-                data=json.dumps(data),
-                proxies={"http": None, "https": None},
+            return get_answer_scheduler().schedule(
+                wait_time,
+                self._submit_answer,
+                problemid,
+                problemtype,
+                answer,
+                owner=self,
             )
-            self.add_message(
-                f"[DEBUG] 答题提交响应: status={getattr(r, 'status_code', 'unknown')}, body={r.text[:500]}",
-                0,
-            )
-            try:
-                return_dict = dict_result(r.text)
-            except ValueError as e:
-                meg = "%s自动回答失败，响应解析错误：%s" % (
-                    self.lessonname,
-                    e,
-                )
-                self.add_message(meg, 4)
-                return False
-            if return_dict["code"] == 0:
-                meg = "%s自动回答成功" % self.lessonname
-                self.add_message(meg, 4)
-                # threading.Thread(target=say_something,args=(meg,)).start()
-                return True
-            else:
-                meg = "%s自动回答失败，原因：%s" % (
-                    self.lessonname,
-                    return_dict["msg"].replace("_", " "),
-                )
-                self.add_message(meg, 4)
-                # threading.Thread(target=say_something,args=(meg,)).start()
-                return False
         else:
             if limit == -1:
                 meg = "%s的问题没有找到答案，该题不限时，请尽快前往雨课堂回答" % (
@@ -512,8 +692,52 @@ class Lesson:
                 )
             # threading.Thread(target=say_something,args=(meg,)).start()
             self.add_message(meg, 4)
+            return None
+
+    def _submit_answer(self, problemid, problemtype, answer):
+        submit_answer = self._format_answer_for_submit(problemtype, answer)
+        data = {
+            "problemId": problemid,
+            "problemType": problemtype,
+            "dt": int(time.time()),
+            "result": submit_answer,
+        }
+        self.add_message(f"[DEBUG] 答题提交payload: {data}", 0)
+        r = self.api.answer_problem(data, self.headers)
+        self.add_message(
+            f"[DEBUG] 答题提交响应: status={getattr(r, 'status_code', 'unknown')}, body={r.text[:500]}",
+            0,
+        )
+        try:
+            return_dict = dict_result(r.text)
+        except ValueError as e:
+            meg = "%s自动回答失败，响应解析错误：%s" % (
+                self.lessonname,
+                e,
+            )
+            self.add_message(meg, 4)
+            return False
+        if return_dict["code"] == 0:
+            meg = "%s自动回答成功" % self.lessonname
+            self.add_message(meg, 4)
+            # threading.Thread(target=say_something,args=(meg,)).start()
+            return True
+        else:
+            meg = "%s自动回答失败，原因：%s" % (
+                self.lessonname,
+                return_dict["msg"].replace("_", " "),
+            )
+            self.add_message(meg, 4)
+            # threading.Thread(target=say_something,args=(meg,)).start()
             return False
 
+    def cancel_pending_answers(self):
+        """取消本课程尚未提交的答案"""
+        cancelled = get_answer_scheduler().cancel_owner(self)
+        if cancelled:
+            self.add_message("%s已取消%s个待提交的答案" % (self.lessonname, cancelled), 4)
+        return cancelled
+
     def _format_answer_for_submit(self, problemtype, answer):
         if problemtype == 4 and isinstance(answer, list):
             return {str(index): value for index, value in enumerate(answer)}
@@ -536,21 +760,14 @@ class Lesson:
         wsapp.send(json.dumps(self.handshark))
 
     def checkin_class(self):
-        url = f"https://{get_host(self.config['region'])}/api/v3/lesson/checkin"
-        payload = {"source": 5, "lessonId": self.lessonid}
+        api = self.api
         logger.info(
-            "开始课程签到: lessonid={}, lessonname={}, url={}, payload={}",
+            "开始课程签到: lessonid={}, lessonname={}, url={}",
             self.lessonid,
             self.lessonname,
-            url,
-            payload,
-        )
-        r = requests.post(
-            url=url,
-            headers=self.headers,
-            data=json.dumps(payload),
-            proxies={"http": None, "https": None},
+            api.url("/api/v3/lesson/checkin"),
         )
+        r = api.checkin(self.lessonid, self.headers)
         set_auth = r.headers.get("Set-Auth", None)
         times = 1
         while not set_auth and times <= 3:
@@ -616,9 +833,7 @@ class Lesson:
             
             for presentationid in presentations:
                 # print(presentationid)
-                self.problems_ls.extend(self.get_problems(presentationid))
-                for problem in self.problems_ls:
-                    self.problems_dict[problem["index"]] = problem["answers"]
+                self._update_problems(presentationid)
                 
                 # 检查是否已经下载过此presentation
                 if (
@@ -648,14 +863,15 @@ class Lesson:
             meg = "%s下课了" % self.lessonname
             # threading.Thread(target=say_something,args=(meg,)).start()
             self.add_message(meg, 7)
+            self.cancel_pending_answers()
             wsapp.close()
         elif op == "presentationupdated":
             # 安全地获取presentation字段
             presentation_id = data.get("presentation")
             if presentation_id is not None:
-                self.problems_ls.extend(self.get_problems(presentation_id))
-                for problem in self.problems_ls:
-                    self.problems_dict[problem["index"]] = problem["answers"]
+                # 演示文稿已更新，丢弃缓存中的旧数据
+                self._invalidate_ppt(presentation_id)
+                self._update_problems(presentation_id)
                 
                 self._ensure_download_tracking()
                 
@@ -666,9 +882,7 @@ class Lesson:
             # 安全地获取presentation字段
             presentation_id = data.get("presentation")
             if presentation_id is not None:
-                self.problems_ls.extend(self.get_problems(presentation_id))
-                for problem in self.problems_ls:
-                    self.problems_dict[problem["index"]] = problem["answers"]
+                self._update_problems(presentation_id)
                 
                 self._ensure_download_tracking()
                 
@@ -779,37 +993,28 @@ class Lesson:
                     )
 
     def start_answer(self, problemid, limit):
-        for promble in self.problems_ls:
-            problem_identifiers = (
-                promble.get("problemId"),
-                promble.get("id"),
-                promble.get("sid"),
-                promble.get("slideId"),
-                *(promble.get("slideIds", []) or []),
+        promble = self.problem_store.find(problemid)
+        if promble is not None:
+            if promble["result"] is not None:
+                # 如果该题已经作答过，直接跳出函数以忽略该题
+                # 该情况理论上只会出现在启动监听时
+                return
+            blanks = promble.get("blanks", [])
+            answers = []
+            print(f"blanks: {blanks}")
+            # if blanks:
+            #     for i in blanks:
+            #         if i["answers"]:  # 检查answers列表不为空
+            #             answers.append(random.choice(i["answers"]))
+            #         else:
+            #             # 如果answers为空，记录警告并跳过该空白
+            #             self.add_message(f"{self.lessonname}检测到空白题答案列表为空，跳过该空白", 4)
+            # else:
+            answers = promble.get("answers", [])
+            print(f"answers: {answers}")
+            self.schedule_answer(
+                promble["problemId"], promble["problemType"], answers, limit
             )
-            if str(problemid) in [str(identifier) for identifier in problem_identifiers if identifier]:
-                if promble["result"] is not None:
-                    # 如果该题已经作答过，直接跳出函数以忽略该题
-                    # 该情况理论上只会出现在启动监听时
-                    return
-                blanks = promble.get("blanks", [])
-                answers = []
-                print(f"blanks: {blanks}")
-                # if blanks:
-                #     for i in blanks:
-                #         if i["answers"]:  # 检查answers列表不为空
-                #             answers.append(random.choice(i["answers"]))
-                #         else:
-                #             # 如果answers为空，记录警告并跳过该空白
-                #             self.add_message(f"{self.lessonname}检测到空白题答案列表为空，跳过该空白", 4)
-                # else:
-                answers = promble.get("answers", [])
-                print(f"answers: {answers}")
-                threading.Thread(
-                    target=self.answer_questions,
-                    args=(promble["problemId"], promble["problemType"], answers, limit),
-                ).start()
-                break
         else:
             if limit == -1:
                 meg = "%s的问题没有找到答案，该题不限时，请尽快前往雨课堂回答" % (
@@ -833,17 +1038,24 @@ class Lesson:
         }
         wsapp.send(json.dumps(query_problem))
 
-    def start_lesson(self, delay, callback):
+    def _prepare_lesson(self):
+        # 签到并获取课程信息，返回课程在监听列表中的行号，测试课程返回None
+        self.auth = self.checkin_class()
+        rtn = self.get_lesson_info()
+        teacher = rtn["teacher"]["name"]
+        title = rtn["title"]
+        timestamp = rtn["startTime"] // 1000
+        time_str = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(timestamp))
+        index = self.event_sink.next_course_index()
+        self.add_course([self.lessonname, title, teacher, time_str], index)
+        return index, timestamp
+
+    async def run_lesson(self, delay, callback):
+        """在课程运行时的事件循环中签到并监听课程"""
+        runtime = get_lesson_runtime()
         index = None
         try:
-            self.auth = self.checkin_class()
-            rtn = self.get_lesson_info()
-            teacher = rtn["teacher"]["name"]
-            title = rtn["title"]
-            timestamp = rtn["startTime"] // 1000
-            time_str = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(timestamp))
-            index = self.main_ui.tableWidget.rowCount()
-            self.add_course([self.lessonname, title, teacher, time_str], index)
+            index, timestamp = await runtime.run_handler(self._prepare_lesson)
             if self.lessonname.find("清华实践") != -1:
                 meg = "%s测试课程，不进行监听" % self.lessonname
                 self.add_message(meg, 7)
@@ -855,22 +1067,23 @@ class Lesson:
             ):
                 meg = f"检测到课程{self.lessonname}正在上课，将于{delay}秒后加入监听列表"
                 self.add_message(meg, 7)
-                time.sleep(delay)
+                await self.stop_token.sleep(delay)
             else:
                 meg = f"检测到课程{self.lessonname}正在上课，已加入监听列表"
                 self.add_message(meg, 7)
-            self.wsapp = websocket.WebSocketApp(
-                url=f"wss://{get_host(self.config['region'])}/wsapp/",
-                header=self.headers,
-                on_open=self.on_open,
-                on_message=self.on_message,
-            )
-            self.wsapp.run_forever()
+            if not self.stop_token.cancelled:
+                await runtime.run_websocket(
+                    url=f"wss://{get_host(self.config['region'])}/wsapp/",
+                    headers=self.headers,
+                    on_open=self.on_open,
+                    on_message=self.on_message,
+                    on_connect=self._set_wsapp,
+                )
             meg = "%s监听结束" % self.lessonname
             self.add_message(meg, 7)
         except Exception as exc:
             logger.exception(
-                "课程监听线程异常: lessonid={}, lessonname={}, exc={}",
+                "课程监听异常: lessonid={}, lessonname={}, exc={}",
                 self.lessonid,
                 self.lessonname,
                 exc,
@@ -880,12 +1093,45 @@ class Lesson:
         finally:
             if index is not None:
                 self.del_course(index)
+            # 课程结束后取消自己的令牌：释放挂在监听器令牌上的回调，停止本课程遗留的下载和答题任务
+            self.stop_token.cancel()
         # threading.Thread(target=say_something,args=(meg,)).start()
         return callback(self)
 
+    def _set_wsapp(self, wsapp):
+        self.wsapp = wsapp
+        if self.stop_token.cancelled:
+            wsapp.close()
+
+    def start_lesson(self, delay, callback):
+        """同步接口：提交到课程运行时并等待监听结束"""
+        return get_lesson_runtime().submit(self.run_lesson(delay, callback)).result()
+
+    @property
+    def stop_token(self):
+        """课程的停止令牌，由监听器令牌派生，监听器停止时一并取消"""
+        if getattr(self, "_stop_token", None) is None:
+            self._bind_stop_token(CancellationToken())
+        return self._stop_token
+
+    def _bind_stop_token(self, token):
+        self._stop_token = token
+        token.add_callback(self._on_stop)
+
+    def _on_stop(self):
+        # 取消回调，在调用cancel的线程中执行，只做不阻塞的操作
+        self.cancel_pending_answers()
+        wsapp = getattr(self, "wsapp", None)
+        if wsapp is not None:
+            wsapp.close()
+
+    def stop(self):
+        """停止监听，连接尚未建立时在建立后立即关闭"""
+        self.stop_token.cancel()
+
     def send_danmu(self, content):
         self.add_message(f"[DEBUG] 开始发送弹幕: '{content}'", 0)
-        url = f"https://{get_host(self.config['region'])}/api/v3/lesson/danmu/send"
+        url = self.api.url("/api/v3/lesson/danmu/send")
         data = {
             "extra": "",
             "fromStart": "50",
@@ -901,12 +1147,7 @@ class Lesson:
         self.add_message(f"[DEBUG] 请求数据: {json.dumps(data, ensure_ascii=False)}", 0)
         
         try:
-            r = requests.post(
-                url=url,
-                headers=self.headers,
-                data=json.dumps(data),
-                proxies={"http": None, "https": None},
-            )
+            r = self.api.send_danmu(data, self.headers)
             self.add_message(f"[DEBUG] HTTP响应状态码: {r.status_code}", 0)
             self.add_message(f"[DEBUG] HTTP响应内容: {r.text}", 0)
             
@@ -929,11 +1170,7 @@ class Lesson:
             raise
 
     def get_lesson_info(self):
-        url = f"https://{get_host(self.config['region'])}/api/v3/lesson/basic-info"
-        r = requests.get(
-            url=url, headers=self.headers, proxies={"http": None, "https": None}
-        )
-        return dict_result(r.text)["data"]
+        return self.api.get_lesson_info(self.headers)
 
     def __eq__(self, other):
         return self.lessonid == other.lessonid
@@ -944,11 +1181,6 @@ class User:
         self.uid = uid
 
     def get_userinfo(self, classroomid, headers, region):
-        r = requests.get(
-            f"https://{get_host(region)}/v/course_meta/fetch_user_info_new?query_user_id={self.uid}&classroom_id={classroomid}",
-            headers=headers,
-            proxies={"http": None, "https": None},
-        )
-        data = dict_result(r.text)["data"]
+        data = get_api_client(region).fetch_user_info(self.uid, classroomid, headers)
         self.sno = data["school_number"]
         self.name = data["name"]
@@ -0,0 +1,192 @@
+"""
+下载事件循环模块
+进程内共用一个后台事件循环和一个长连接aiohttp会话下载幻灯片图片，
+替代每个演示文稿、每轮重试都新建事件循环和连接的实现；
+下载、PDF生成等同步后台任务也由所有课程共用一个线程池执行；
+AI分析请求耗时很长，使用单独的小线程池，不占用后台任务线程
+"""
+
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Optional
+
+import aiohttp
+
+# 后台任务线程数上限，线程按需创建，空闲线程在所有课程间复用
+TASK_WORKERS = 16
+# AI分析线程数上限，同一演示文稿的题目页由一个线程依次分析
+AI_WORKERS = 4
+
+
+class DownloadLoop:
+    """
+    下载事件循环
+
+    - 后台线程运行事件循环，submit()可在任意线程中提交协程并返回Future
+    - 会话和连接池在事件循环内长期复用，对CDN的TLS握手每个进程只需一次
+    """
+
+    def __init__(self, connector_limit: int = 64, timeout: float = 30):
+        self.connector_limit = connector_limit
+        self.timeout = timeout
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._lock = threading.Lock()
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        """获取下载事件循环，首次访问时启动后台线程"""
+        with self._lock:
+            if self._loop is None or self._loop.is_closed():
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(
+                    target=self._run_loop,
+                    args=(self._loop,),
+                    name="DownloadLoop",
+                    daemon=True,
+                )
+                self._thread.start()
+            return self._loop
+
+    def _run_loop(self, loop: asyncio.AbstractEventLoop):
+        asyncio.set_event_loop(loop)
+        loop.run_forever()
+
+    def is_current(self) -> bool:
+        """当前是否运行在下载事件循环中"""
+        try:
+            return asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            return False
+
+    def submit(self, coro):
+        """线程安全地提交协程，返回concurrent.futures.Future"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro, timeout: Optional[float] = None):
+        """提交协程并阻塞等待结果，不能在下载事件循环中调用"""
+        if self.is_current():
+            raise RuntimeError("不能在下载事件循环中同步等待")
+        return self.submit(coro).result(timeout)
+
+    async def get_session(self) -> aiohttp.ClientSession:
+        """获取长连接会话，只能在下载事件循环中调用"""
+        if self._session is None or self._session.closed:
+            # 连接数上限只起保护作用，实际并发由各主机的HostLimiter控制
+            connector = aiohttp.TCPConnector(
+                limit=self.connector_limit,
+                ttl_dns_cache=300,
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+        return self._session
+
+    async def _close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        # run_in_executor(None, ...)使用的默认线程池随事件循环一起关闭
+        await asyncio.get_running_loop().shutdown_default_executor()
+
+    def close(self):
+        """关闭会话并停止事件循环"""
+        with self._lock:
+            loop = self._loop
+            self._loop = None
+        if loop is None or loop.is_closed():
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(self._close(), loop).result(5)
+        except Exception as e:
+            print(f"关闭下载会话失败: {e}")
+        loop.call_soon_threadsafe(loop.stop)
+
+
+_download_loop: Optional[DownloadLoop] = None
+_download_loop_lock = threading.Lock()
+
+
+def get_download_loop() -> DownloadLoop:
+    """获取进程内共享的下载事件循环"""
+    global _download_loop
+    with _download_loop_lock:
+        if _download_loop is None:
+            _download_loop = DownloadLoop()
+        return _download_loop
+
+
+_task_executor: Optional[ThreadPoolExecutor] = None
+_task_executor_lock = threading.Lock()
+
+
+def get_task_executor() -> ThreadPoolExecutor:
+    """获取进程内共享的后台任务线程池"""
+    global _task_executor
+    with _task_executor_lock:
+        if _task_executor is None:
+            _task_executor = ThreadPoolExecutor(
+                max_workers=TASK_WORKERS,
+                thread_name_prefix="DownloadTask",
+            )
+        return _task_executor
+
+
+_ai_executor: Optional[ThreadPoolExecutor] = None
+_ai_executor_lock = threading.Lock()
+
+
+def get_ai_executor() -> ThreadPoolExecutor:
+    """获取进程内共享的AI分析线程池"""
+    global _ai_executor
+    with _ai_executor_lock:
+        if _ai_executor is None:
+            _ai_executor = ThreadPoolExecutor(
+                max_workers=AI_WORKERS,
+                thread_name_prefix="AIAnalysis",
+            )
+        return _ai_executor
+
+
+def shutdown_download_loop(wait: bool = False):
+    """
+    关闭共享的下载事件循环、后台任务线程池和AI分析线程池，尚未开始的任务被取消；
+    之后再次使用时重新创建
+    """
+    global _download_loop, _task_executor, _ai_executor
+    with _download_loop_lock:
+        download_loop, _download_loop = _download_loop, None
+    if download_loop is not None:
+        download_loop.close()
+    with _task_executor_lock:
+        executor, _task_executor = _task_executor, None
+    if executor is not None:
+        executor.shutdown(wait=wait, cancel_futures=True)
+    with _ai_executor_lock:
+        executor, _ai_executor = _ai_executor, None
+    if executor is not None:
+        executor.shutdown(wait=wait, cancel_futures=True)
+
+
+@asynccontextmanager
+async def download_session(limit: int = 8, timeout: float = 30):
+    """
+    获取下载用的aiohttp会话
+
+    在共享下载事件循环中复用长连接会话（退出时不关闭），
+    在其他事件循环中（如测试中的asyncio.run）临时创建会话
+    """
+    shared = get_download_loop()
+    if shared.is_current():
+        yield await shared.get_session()
+        return
+    connector = aiohttp.TCPConnector(limit=limit)
+    async with aiohttp.ClientSession(
+        connector=connector,
+        timeout=aiohttp.ClientTimeout(total=timeout),
+    ) as session:
+        yield session
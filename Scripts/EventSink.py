@@ -0,0 +1,114 @@
+"""
+事件输出模块
+监听器和课程通过EventSink输出消息、增删监听列表，不直接依赖Qt信号
+"""
+
+import threading
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List
+
+from .Logger import logger
+from .Utils import send_email_notification_if_needed
+
+
+class EventSink(ABC):
+    """事件输出接口，子类缺少任一方法时在创建时即报错"""
+
+    @property
+    @abstractmethod
+    def config(self) -> Dict[str, Any]:
+        ...
+
+    @abstractmethod
+    def add_message(self, message: str, type: int = 0):
+        ...
+
+    @abstractmethod
+    def add_course(self, row: List[Any], index: int):
+        ...
+
+    @abstractmethod
+    def del_course(self, index: int):
+        ...
+
+    @abstractmethod
+    def next_course_index(self) -> int:
+        """新课程在监听列表中的行号"""
+
+
+class QtEventSink(EventSink):
+    """
+    转发到MainWindow_Ui的信号
+
+    只通过属性访问main_ui，本模块不导入PyQt
+    """
+
+    def __init__(self, main_ui):
+        self.main_ui = main_ui
+
+    @property
+    def config(self):
+        # 配置可能在界面中被重新加载，每次都从main_ui读取
+        return self.main_ui.config
+
+    def add_message(self, message, type=0):
+        self.main_ui.add_message_signal.emit(message, type)
+
+    def add_course(self, row, index):
+        self.main_ui.add_course_signal.emit(row, index)
+
+    def del_course(self, index):
+        self.main_ui.del_course_signal.emit(index)
+
+    def next_course_index(self):
+        return self.main_ui.tableWidget.rowCount()
+
+
+class ConsoleEventSink(EventSink):
+    """无界面运行时使用：消息写入日志，监听列表保存在内存中"""
+
+    def __init__(self, config, name=None):
+        """
+        Args:
+            config: 配置字典
+            name: 账号名称，多账号运行时作为日志前缀
+        """
+        self._config = config
+        self.prefix = f"[{name}] " if name else ""
+        self.courses: Dict[int, List[Any]] = {}
+        self._next_index = 0
+        self._lock = threading.Lock()
+
+    @property
+    def config(self):
+        return self._config
+
+    def add_message(self, message, type=0):
+        logger.info(self.prefix + message)
+        if type == 4:
+            send_email_notification_if_needed(self.prefix + message, type, self._config)
+
+    def add_course(self, row, index):
+        with self._lock:
+            self.courses[index] = row
+        logger.info("{}加入监听列表: {}", self.prefix, " | ".join(str(value) for value in row))
+
+    def del_course(self, index):
+        with self._lock:
+            row = self.courses.pop(index, None)
+        if row:
+            logger.info("{}移出监听列表: {}", self.prefix, row[0])
+
+    def next_course_index(self):
+        # 行号只用于配对add_course/del_course，单调递增即可
+        with self._lock:
+            index = self._next_index
+            self._next_index += 1
+            return index
+
+
+def as_event_sink(target) -> EventSink:
+    """EventSink原样返回，其余对象（MainWindow_Ui）包装为QtEventSink"""
+    if isinstance(target, EventSink):
+        return target
+    return QtEventSink(target)
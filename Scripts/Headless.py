@@ -0,0 +1,122 @@
+"""
+无界面运行模块
+不导入PyQt，直接以ConsoleEventSink驱动监听器，用于服务器/pm2部署
+"""
+
+import json
+import os
+import signal
+import threading
+
+from .AccountSupervisor import AccountSupervisor, load_accounts
+from .Cancellation import CancellationToken
+from .EventSink import ConsoleEventSink
+from .ImageProcessing import get_image_pool
+from .Logger import logger, setup_logging
+from .Monitor import monitor
+from .PPTManager import shutdown_shared_resources
+from .Utils import get_config_path, get_initial_data, get_user_info
+
+
+def load_headless_config(config_path=None):
+    """
+    读取配置文件
+
+    与界面版不同，配置文件不存在时不会自动创建，需先在界面版中登录生成
+    """
+    config_path = config_path or get_config_path()
+    if not os.path.exists(config_path):
+        raise FileNotFoundError(f"没有找到配置文件: {config_path}")
+    with open(config_path, "r", encoding="utf-8") as f:
+        return get_initial_data(json.load(f))
+
+
+def install_signal_handlers(stop_token):
+    # SIGINT/SIGTERM（pm2 stop）时取消令牌，监听器在毫秒级内退出
+    if threading.current_thread() is not threading.main_thread():
+        return
+
+    def handle_signal(signum, frame):
+        logger.info("收到停止信号: {}", signum)
+        stop_token.cancel()
+
+    signal.signal(signal.SIGINT, handle_signal)
+    if hasattr(signal, "SIGTERM"):
+        signal.signal(signal.SIGTERM, handle_signal)
+
+
+def run_headless(config_path=None, stop_token=None):
+    """
+    无界面运行监听器，阻塞直到收到停止信号
+
+    Returns:
+        进程退出码
+    """
+    setup_logging()
+    try:
+        config = load_headless_config(config_path)
+    except (OSError, ValueError) as e:
+        logger.error("读取配置文件失败: {}", e)
+        return 1
+
+    code, user_info = get_user_info(config["sessionid"], config["region"])
+    if code != 0 or not isinstance(user_info, dict):
+        logger.error("登录已失效，请先在界面版中重新登录: {}", user_info)
+        return 1
+    logger.info("登录成功，当前登录用户：{}", user_info.get("name"))
+
+    # 图片处理进程池为进程内共享，启动时按配置设置一次进程数
+    get_image_pool(config.get("image_process_workers"))
+    sink = ConsoleEventSink(config)
+    stop_token = stop_token or CancellationToken()
+    install_signal_handlers(stop_token)
+    sink.add_message("启动成功", 0)
+    monitor(sink, stop_token)
+    shutdown_shared_resources()
+    sink.add_message("停止成功", 0)
+    return 0
+
+
+def run_accounts(accounts_path, config_path=None, stop_token=None):
+    """
+    无界面运行多个账号，config.json作为各账号的公共配置
+
+    Returns:
+        进程退出码
+    """
+    setup_logging()
+    try:
+        try:
+            base_config = load_headless_config(config_path)
+        except FileNotFoundError:
+            # 没有公共配置时各账号使用默认配置
+            base_config = None
+        accounts = load_accounts(accounts_path, base_config)
+    except (OSError, ValueError) as e:
+        logger.error("读取账号列表失败: {}", e)
+        return 1
+
+    for account in accounts:
+        config = account["config"]
+        try:
+            code, user_info = get_user_info(config["sessionid"], config["region"])
+        except Exception as e:
+            code, user_info = -1, e
+        if code != 0 or not isinstance(user_info, dict):
+            logger.warning("[{}] 登录已失效: {}", account["name"], user_info)
+        else:
+            logger.info("[{}] 当前登录用户：{}", account["name"], user_info.get("name"))
+
+    # 图片处理进程池为所有账号共用，按公共配置设置一次进程数，各账号的同名配置项不生效
+    get_image_pool((base_config or get_initial_data()).get("image_process_workers"))
+    supervisor = AccountSupervisor(accounts, stop_token=stop_token)
+    install_signal_handlers(supervisor.stop_token)
+    supervisor.start()
+    # 主线程等待停止信号（信号处理函数只能在主线程中执行），
+    # 分段等待以便Windows下Ctrl+C也能及时响应；所有监听器都退出时同样结束
+    while not supervisor.stop_token.wait(1) and supervisor.alive():
+        pass
+    supervisor.stop()
+    supervisor.wait(5)
+    shutdown_shared_resources()
+    return 0
@@ -0,0 +1,172 @@
+"""
+按主机自适应并发模块
+每个下载主机一个AIMD并发限制：请求顺利且延迟正常时逐步增加并发，
+遇到429/5xx/超时立即减半；限制和近期延迟在进程内跨演示文稿保留
+"""
+
+import asyncio
+import threading
+import time
+from collections import deque
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+# 并发限制的范围和初始值
+MIN_CONCURRENCY = 1
+MAX_CONCURRENCY = 32
+INITIAL_CONCURRENCY = 8
+
+# 延迟超过基准的倍数时视为拥塞，不再增加并发
+SLOW_FACTOR = 3.0
+# 两次减半之间的最短间隔，避免同一批失败把限制一路降到最低
+BACKOFF_INTERVAL = 1.0
+# 指数加权平均的平滑系数
+EWMA_ALPHA = 0.2
+
+RETRYABLE_STATUS = (429, 500, 502, 503, 504)
+
+
+def host_of(url: str) -> str:
+    return urlsplit(url).netloc.lower()
+
+
+class HostLimiter:
+    """
+    单个主机的自适应并发限制
+
+    - 加性增：在当前限制下连续成功limit次（约一轮）后限制加1
+    - 乘性减：429/5xx/超时时限制减半，之后BACKOFF_INTERVAL内不重复减半
+    - 等待者按先后顺序唤醒，可在多个事件循环中使用
+    """
+
+    def __init__(self,
+                 host: str,
+                 initial: int = INITIAL_CONCURRENCY,
+                 minimum: int = MIN_CONCURRENCY,
+                 maximum: int = MAX_CONCURRENCY):
+        self.host = host
+        self.minimum = minimum
+        self.maximum = maximum
+        self.limit = max(minimum, min(maximum, initial))
+        self.in_flight = 0
+        self.latency: Optional[float] = None
+        self.best_latency: Optional[float] = None
+        self._successes = 0
+        self._last_backoff = 0.0
+        self._waiters = deque()
+        self._lock = threading.Lock()
+
+    async def acquire(self):
+        with self._lock:
+            if self.in_flight < self.limit and not self._waiters:
+                self.in_flight += 1
+                return
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            self._waiters.append((loop, future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            with self._lock:
+                if (loop, future) in self._waiters:
+                    self._waiters.remove((loop, future))
+                    raise
+            if not future.cancelled():
+                # 名额已分配后才取消，归还名额；future被取消时由_grant归还
+                self.release()
+            raise
+
+    def release(self):
+        with self._lock:
+            self.in_flight -= 1
+            self._wake_locked()
+
+    def _wake_locked(self):
+        while self._waiters and self.in_flight < self.limit:
+            loop, future = self._waiters.popleft()
+            if future.done() or loop.is_closed():
+                continue
+            self.in_flight += 1
+            loop.call_soon_threadsafe(self._grant, future)
+
+    def _grant(self, future):
+        if future.done():
+            # 等待者已取消，名额转给下一个
+            self.release()
+        else:
+            future.set_result(None)
+
+    def record_success(self, latency: float):
+        """
+        记录一次成功请求
+
+        Args:
+            latency: 收到响应头的耗时（秒）
+        """
+        with self._lock:
+            self.latency = latency if self.latency is None else (
+                EWMA_ALPHA * latency + (1 - EWMA_ALPHA) * self.latency
+            )
+            if self.best_latency is None or latency < self.best_latency:
+                self.best_latency = latency
+            if latency > max(self.best_latency * SLOW_FACTOR, 0.5):
+                # 延迟明显升高，维持当前限制
+                self._successes = 0
+                return
+            self._successes += 1
+            if self._successes >= self.limit and self.limit < self.maximum:
+                self.limit += 1
+                self._successes = 0
+                self._wake_locked()
+
+    def record_failure(self):
+        """记录一次限流/服务端错误/超时，限制减半"""
+        with self._lock:
+            self._successes = 0
+            now = time.monotonic()
+            if now - self._last_backoff < BACKOFF_INTERVAL:
+                return
+            self._last_backoff = now
+            self.limit = max(self.minimum, self.limit // 2)
+
+    def slot(self):
+        return _HostSlot(self)
+
+    def snapshot(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                "host": self.host,
+                "limit": self.limit,
+                "in_flight": self.in_flight,
+                "latency": self.latency,
+            }
+
+
+class _HostSlot:
+    """async with limiter.slot(): 占用一个并发名额"""
+
+    def __init__(self, limiter: HostLimiter):
+        self.limiter = limiter
+
+    async def __aenter__(self):
+        await self.limiter.acquire()
+        return self.limiter
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.limiter.release()
+        return False
+
+
+_limiters: Dict[str, HostLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_host_limiter(url_or_host: str) -> HostLimiter:
+    """获取主机的并发限制，同一主机在进程内共用一个实例"""
+    host = host_of(url_or_host) if "://" in url_or_host else url_or_host.lower()
+    with _limiters_lock:
+        limiter = _limiters.get(host)
+        if limiter is None:
+            limiter = HostLimiter(host)
+            _limiters[host] = limiter
+        return limiter
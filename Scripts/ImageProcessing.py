@@ -0,0 +1,176 @@
+"""
+图片处理模块
+格式转换（RGBA/P转RGB、重新编码JPEG）等CPU密集的图片处理在独立进程池中执行，
+不占用主进程的GIL，避免处理大量PNG幻灯片时WebSocket线程得不到调度；
+任务只传递文件路径，图片数据不经过进程间序列化
+"""
+
+import asyncio
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+
+from PIL import Image
+
+# 默认进程数，配置项image_process_workers为0时在调用线程中处理
+DEFAULT_WORKERS = 2
+
+
+def has_jpeg_end(path: str) -> bool:
+    """完整的JPEG以EOI标记（FFD9）结尾，用于廉价地发现截断的文件"""
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        if f.tell() < 4:
+            return False
+        f.seek(-2, os.SEEK_END)
+        return f.read(2) == b"\xff\xd9"
+
+
+def normalize_image(temp_path: str, final_path: str) -> bool:
+    """
+    把下载的图片规范为RGB JPEG并移动到final_path
+
+    只读取文件头检查格式和尺寸；已是RGB JPEG的图片直接改名，不再重新编码
+
+    Returns:
+        文件内容是否未经改动
+    """
+    with Image.open(temp_path) as img:
+        width, height = img.size
+        if width <= 0 or height <= 0:
+            raise ValueError(f"图片尺寸无效: {img.size}")
+        passthrough = img.format == "JPEG" and img.mode == "RGB"
+
+    if passthrough:
+        if not has_jpeg_end(temp_path):
+            raise ValueError("JPEG文件不完整")
+        os.replace(temp_path, final_path)
+        return True
+
+    # 其他格式解码后转换为JPEG
+    with Image.open(temp_path) as img:
+        img.load()
+        # 处理透明度
+        if img.mode in ("RGBA", "LA", "P"):
+            background = Image.new("RGB", img.size, (255, 255, 255))
+            if img.mode == "P":
+                img = img.convert("RGBA")
+            background.paste(img, mask=img.split()[-1] if img.mode == "RGBA" else None)
+            img = background
+        elif img.mode != "RGB":
+            img = img.convert("RGB")
+
+        # 保存为JPEG，先写临时文件再替换，不改写可能与存储共用的硬链接
+        part_path = final_path + ".part"
+        img.save(part_path, "JPEG", quality=95)
+    os.replace(part_path, final_path)
+    return False
+
+
+class ImagePool:
+    """
+    图片处理进程池
+
+    - 首次提交任务时才启动进程
+    - workers为0或进程池不可用时，在调用线程中直接处理
+    """
+
+    def __init__(self, workers: int = DEFAULT_WORKERS):
+        self.workers = max(0, int(workers))
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> Optional[ProcessPoolExecutor]:
+        if self.workers == 0:
+            return None
+        with self._lock:
+            if self._executor is None:
+                try:
+                    self._executor = ProcessPoolExecutor(max_workers=self.workers)
+                except (OSError, NotImplementedError, ValueError) as e:
+                    print(f"图片处理进程池不可用，改为在线程中处理: {e}")
+                    self.workers = 0
+            return self._executor
+
+    def _discard_executor(self, executor):
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False)
+
+    def _submit_to_pool(self, fn, *args) -> Optional[Future]:
+        """提交到进程池，进程池不可用时返回None"""
+        executor = self._get_executor()
+        if executor is None:
+            return None
+        try:
+            return executor.submit(fn, *args)
+        except (BrokenProcessPool, RuntimeError):
+            # 工作进程异常退出，下次重建进程池，本次由调用方改在线程中处理
+            self._discard_executor(executor)
+            return None
+
+    def submit(self, fn, *args) -> Future:
+        """提交任务，fn必须是模块级函数，参数只传文件路径等小对象"""
+        future = self._submit_to_pool(fn, *args)
+        if future is not None:
+            return future
+        future = Future()
+        try:
+            future.set_result(fn(*args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def run(self, fn, *args):
+        """提交任务并阻塞等待结果"""
+        return self.submit(fn, *args).result()
+
+    async def run_async(self, fn, *args):
+        """在事件循环中等待任务结果"""
+        future = self._submit_to_pool(fn, *args)
+        if future is None:
+            # 不使用进程池或进程池不可用时放到线程池执行，同样不阻塞事件循环
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(None, fn, *args)
+        return await asyncio.wrap_future(future)
+
+    def shutdown(self, wait: bool = True):
+        with self._lock:
+            executor = self._executor
+            self._executor = None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+
+_image_pool: Optional[ImagePool] = None
+_image_pool_lock = threading.Lock()
+
+
+def get_image_pool(workers: Optional[int] = None) -> ImagePool:
+    """
+    获取进程内共享的图片处理进程池
+
+    Args:
+        workers: 进程数，与当前进程池不同时重建；为None时沿用当前设置。
+                 重建会中断正在处理的任务，只在程序启动时按配置传入，其余调用不传
+    """
+    global _image_pool
+    with _image_pool_lock:
+        if _image_pool is None:
+            _image_pool = ImagePool(DEFAULT_WORKERS if workers is None else workers)
+        elif workers is not None and max(0, int(workers)) != _image_pool.workers:
+            _image_pool.shutdown(wait=False)
+            _image_pool = ImagePool(workers)
+        return _image_pool
+
+
+def shutdown_image_pool(wait: bool = True):
+    """关闭共享的图片处理进程池，之后再次使用时重新创建"""
+    global _image_pool
+    with _image_pool_lock:
+        pool, _image_pool = _image_pool, None
+    if pool is not None:
+        pool.shutdown(wait=wait)
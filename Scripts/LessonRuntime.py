@@ -0,0 +1,172 @@
+"""
+课程运行时模块
+在单个asyncio事件循环中复用所有课程的WebSocket连接，替代每个课程一个run_forever线程的实现
+"""
+
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+
+import aiohttp
+
+from .Logger import logger
+
+
+class WebSocketProxy:
+    """
+    WebSocket代理
+
+    接口与websocket.WebSocketApp的send/close保持一致，
+    可以在任意线程中调用，实际操作由事件循环执行
+    """
+
+    def __init__(self, runtime: "LessonRuntime", ws: aiohttp.ClientWebSocketResponse):
+        self._runtime = runtime
+        self._ws = ws
+
+    @property
+    def closed(self) -> bool:
+        return self._ws.closed
+
+    def send(self, data: str):
+        self._runtime.call_soon(self._ws.send_str(data))
+
+    def close(self):
+        if not self._ws.closed:
+            self._runtime.call_soon(self._ws.close())
+
+
+class LessonRuntime:
+    """
+    课程运行时
+
+    - 一个后台线程运行事件循环，所有课程的WebSocket都在其中收发
+    - 消息处理函数（on_open/on_message）在共享的小线程池中执行，
+      同一课程的消息按到达顺序串行处理，阻塞的HTTP请求不会影响心跳和其他课程
+    """
+
+    def __init__(self, handler_workers: int = 8):
+        self.handler_workers = handler_workers
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._handler_executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        """获取运行时事件循环，首次访问时启动后台线程"""
+        with self._lock:
+            if self._loop is None or self._loop.is_closed():
+                self._loop = asyncio.new_event_loop()
+                self._handler_executor = ThreadPoolExecutor(
+                    max_workers=self.handler_workers,
+                    thread_name_prefix="LessonHandler",
+                )
+                self._thread = threading.Thread(
+                    target=self._run_loop,
+                    args=(self._loop,),
+                    name="LessonRuntime",
+                    daemon=True,
+                )
+                self._thread.start()
+            return self._loop
+
+    def _run_loop(self, loop: asyncio.AbstractEventLoop):
+        asyncio.set_event_loop(loop)
+        loop.run_forever()
+
+    def submit(self, coro):
+        """线程安全地提交协程，返回concurrent.futures.Future"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def call_soon(self, coro):
+        """提交协程但不等待结果，供消息处理线程发送数据使用"""
+        future = self.submit(coro)
+        future.add_done_callback(self._log_future_exception)
+        return future
+
+    @staticmethod
+    def _log_future_exception(future):
+        if future.cancelled():
+            return
+        exc = future.exception()
+        if exc is not None:
+            logger.warning("WebSocket操作失败: {}", exc)
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession()
+        return self._session
+
+    async def run_handler(self, handler: Callable, *args):
+        """在消息处理线程池中执行同步处理函数"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._handler_executor, handler, *args)
+
+    async def run_websocket(
+        self,
+        url: str,
+        headers: Dict[str, str],
+        on_open: Callable,
+        on_message: Callable,
+        on_connect: Optional[Callable] = None,
+    ):
+        """
+        建立WebSocket连接并持续分发消息，直到连接关闭
+
+        Args:
+            url: WebSocket地址
+            headers: 请求头
+            on_open: 连接建立后的处理函数，参数为(wsapp)
+            on_message: 消息处理函数，参数为(wsapp, message)
+            on_connect: 连接建立后立即调用（在事件循环中），用于登记WebSocket代理
+        """
+        session = await self._get_session()
+        async with session.ws_connect(url, headers=headers, autoping=True) as ws:
+            proxy = WebSocketProxy(self, ws)
+            if on_connect:
+                on_connect(proxy)
+
+            queue: asyncio.Queue = asyncio.Queue()
+            consumer = asyncio.create_task(
+                self._dispatch_messages(queue, on_message, proxy)
+            )
+            try:
+                await self.run_handler(on_open, proxy)
+                async for msg in ws:
+                    if msg.type == aiohttp.WSMsgType.TEXT:
+                        queue.put_nowait(msg.data)
+                    elif msg.type == aiohttp.WSMsgType.BINARY:
+                        queue.put_nowait(msg.data.decode("utf-8", errors="ignore"))
+                    elif msg.type == aiohttp.WSMsgType.ERROR:
+                        logger.warning("WebSocket连接异常: {}", ws.exception())
+                        break
+            finally:
+                queue.put_nowait(None)
+                await consumer
+
+    async def _dispatch_messages(self, queue: asyncio.Queue, on_message: Callable, proxy: WebSocketProxy):
+        """按顺序处理同一连接的消息，单条消息异常不影响后续消息"""
+        while True:
+            message = await queue.get()
+            if message is None:
+                break
+            try:
+                await self.run_handler(on_message, proxy, message)
+            except Exception:
+                logger.exception("WebSocket消息处理失败")
+
+
+_runtime: Optional[LessonRuntime] = None
+_runtime_lock = threading.Lock()
+
+
+def get_lesson_runtime() -> LessonRuntime:
+    """获取进程内共享的课程运行时"""
+    global _runtime
+    with _runtime_lock:
+        if _runtime is None:
+            _runtime = LessonRuntime()
+        return _runtime
@@ -5,102 +5,149 @@ import traceback
 
 import requests
 
+from Scripts.AdaptivePoller import AdaptivePoller
+from Scripts.Cancellation import CancellationToken
 from Scripts.Classes import Lesson
-from Scripts.Utils import get_on_lesson, test_network
+from Scripts.EventSink import as_event_sink
+from Scripts.LessonRuntime import get_lesson_runtime
+from Scripts.Utils import get_on_lesson, get_user_info, test_network
 
 
-def monitor(main_ui):
-    # 监听器函数
+class LessonRegistry:
+    """已加入监听的课程登记表，以lessonId为键，同时缓存各sessionid的用户信息"""
 
-    def del_onclass(lesson_obj):
-        # 作为回调函数传入start_lesson
-        on_lesson_list.remove(lesson_obj)
+    def __init__(self, user_info_ttl=600):
+        self.user_info_ttl = user_info_ttl
+        self._lessons = {}
+        self._user_info_cache = {}
+        self._lock = threading.Lock()
+
+    def __contains__(self, lessonid):
+        with self._lock:
+            return lessonid in self._lessons
+
+    def __len__(self):
+        with self._lock:
+            return len(self._lessons)
+
+    def add(self, lesson):
+        with self._lock:
+            self._lessons[lesson.lessonid] = lesson
+
+    def remove(self, lesson):
+        # 作为回调函数传入run_lesson
+        with self._lock:
+            if self._lessons.get(lesson.lessonid) is lesson:
+                del self._lessons[lesson.lessonid]
+
+    def lessons(self):
+        # 由于登记表在多线程操作之下，此处返回副本，以保证遍历完整性
+        with self._lock:
+            return list(self._lessons.values())
+
+    def get_user_info(self, sessionid, region):
+        # 在有效期内复用用户信息，避免每个新课程都请求一次
+        key = (sessionid, str(region))
+        now = time.monotonic()
+        with self._lock:
+            cached = self._user_info_cache.get(key)
+            if cached and now - cached[0] < self.user_info_ttl:
+                return cached[1]
+        code, rtn = get_user_info(sessionid, region)
+        # 只缓存成功的结果，失败时下次轮询重新获取
+        if code == 0 and isinstance(rtn, dict):
+            with self._lock:
+                self._user_info_cache[key] = (now, (code, rtn))
+        return code, rtn
+
+
+def monitor(main_ui, stop_token=None):
+    # 监听器函数，stop_token取消后立即退出，并通过子令牌停止所有课程
+    # main_ui可以是MainWindow_Ui，也可以是任意EventSink（无界面运行）
+    if stop_token is None:
+        stop_token = CancellationToken()
+    sink = as_event_sink(main_ui)
 
     # 已经签到完成加入监听列表的课程
-    on_lesson_list = []
+    on_lesson_list = LessonRegistry()
+    # 所有课程的WebSocket共用一个事件循环
+    runtime = get_lesson_runtime()
+    # 根据历史上课时间决定轮询间隔
+    poller = AdaptivePoller()
     # 检测到的未加入监听列表的课程
     lesson_list = []
     network_status = True
-    sessionid = main_ui.config["sessionid"]
-    while True:
+    sessionid = sink.config["sessionid"]
+    while not stop_token.cancelled:
         # 获取课程列表
         try:
-            lesson_list = get_on_lesson(sessionid, main_ui.config["region"])
+            lesson_list = get_on_lesson(sessionid, sink.config["region"])
             # lesson_list_old = get_on_lesson_old()
         except requests.exceptions.ConnectionError:
             meg = "网络异常，监听中断"
-            main_ui.add_message_signal.emit(meg, 8)
+            sink.add_message(meg, 8)
             network_status = False
-            main_ui.add_message_signal.emit(traceback.format_exc(), 0)
+            sink.add_message(traceback.format_exc(), 0)
         except Exception:
-            main_ui.add_message_signal.emit(traceback.format_exc(), 0)
+            sink.add_message(traceback.format_exc(), 0)
         # 网络异常处理
         while not network_status:
             ret = test_network()
             if ret == True:
                 try:
-                    lesson_list = get_on_lesson(sessionid, main_ui.config["region"])
+                    lesson_list = get_on_lesson(sessionid, sink.config["region"])
                     # lesson_list_old = get_on_lesson_old()
                 except:
-                    main_ui.add_message_signal.emit(traceback.format_exc(), 0)
+                    sink.add_message(traceback.format_exc(), 0)
                 else:
                     network_status = True
                     meg = "网络已恢复，监听开始"
-                    main_ui.add_message_signal.emit(meg, 8)
+                    sink.add_message(meg, 8)
                     break
-            # 可结束线程的计时器
-            timer = 0
-            while timer <= 5:
-                time.sleep(1)
-                timer += 1
-                if not main_ui.is_active:
-                    # 由于on_lesson_list在多线程操作之下，此处必须使用列表复制，以保证列表完整性
-                    for lesson in on_lesson_list.copy():
-                        lesson.wsapp.close()
-                    return
+            # 等待期间收到停止信号立即退出
+            if stop_token.wait(5):
+                return
         # 课程列表
         for lesson in lesson_list:
             lessionid = lesson["lessonId"]
+            # 已在监听中的课程直接跳过，不再构造Lesson对象
+            if lessionid in on_lesson_list:
+                continue
             lessonname = lesson["courseName"]
             classroomid = lesson["classroomId"]
-            lesson_obj = Lesson(lessionid, lessonname, classroomid, main_ui)
-            if lesson_obj not in on_lesson_list:
-                if main_ui.config["sign_config"]["delay_time"]["type"] == 1:
-                    delay_time = random.randint(
+            user_info = on_lesson_list.get_user_info(sessionid, sink.config["region"])
+            lesson_obj = Lesson(
+                lessionid,
+                lessonname,
+                classroomid,
+                sink,
+                user_info=user_info,
+                stop_token=stop_token.child(),
+            )
+            if sink.config["sign_config"]["delay_time"]["type"] == 1:
+                delay_time = random.randint(
+                    10,
+                    max(
                         10,
-                        max(
-                            10,
-                            main_ui.config["sign_config"]["delay_time"]["custom"][
-                                "time"
-                            ],
-                        ),
-                    )
-                    delay_time = 0
-                else:
-                    delay_time = 0
-                thread = threading.Thread(
-                    target=lesson_obj.start_lesson,
-                    args=(
-                        delay_time,
-                        del_onclass,
+                        sink.config["sign_config"]["delay_time"]["custom"][
+                            "time"
+                        ],
                     ),
-                    daemon=True,
                 )
-                thread.start()
-                on_lesson_list.append(lesson_obj)
+                delay_time = 0
+            else:
+                delay_time = 0
+            # 先登记再提交到课程运行时，避免课程提前结束时回调找不到记录
+            on_lesson_list.add(lesson_obj)
+            runtime.submit(lesson_obj.run_lesson(delay_time, on_lesson_list.remove))
 
         # for lesson in lesson_list_old:
         #     lessionid = lesson["lesson_id"]
         #     lessonname = lesson["classroom"]["name"]
         #     classroomid = lesson["classroomId"]
 
-        # 可结束线程的计时器
-        timer = 0
-        while timer <= 30:
-            time.sleep(1)
-            timer += 1
-            if not main_ui.is_active:
-                # 由于on_lesson_list在多线程操作之下，此处必须使用列表复制，以保证列表完整性
-                for lesson in on_lesson_list.copy():
-                    lesson.wsapp.close()
-                return
+        poller.observe(lesson_list)
+
+        # 等待期间收到停止信号立即退出
+        if stop_token.wait(poller.next_interval(active=len(on_lesson_list) > 0)):
+            return
@@ -0,0 +1,184 @@
+"""
+PDF去重索引模块
+在下载根目录保存pdf_index.json，记录每个PDF的内容哈希（PDF关键字）和文件大小/修改时间，
+生成PDF前按哈希查找已有文件，只有新出现或被修改的PDF才需要用PyPDF2读取
+"""
+
+import json
+import os
+import threading
+from typing import Dict, Optional
+
+import PyPDF2
+
+INDEX_NAME = "pdf_index.json"
+
+
+def _in_folder(path: str, folder: str) -> bool:
+    return os.path.dirname(path) == os.path.dirname(os.path.join(folder, ""))
+
+
+def read_pdf_keywords(path: str) -> Optional[str]:
+    """读取PDF的关键字（生成时写入的内容哈希）"""
+    with open(path, "rb") as f:
+        metadata = PyPDF2.PdfReader(f).metadata
+        return metadata.get("/Keywords") if metadata else None
+
+
+class PDFIndex:
+    """
+    下载根目录下的PDF索引
+
+    条目以PDF路径为键：{"hash", "size", "mtime_ns"}，文件大小或修改时间变化时重新读取；
+    本程序写入的PDF还记录"layout"（对象编号和各页的内容键），用于增量更新；
+    "outputs"记录每个演示文稿最近一次写入的PDF，课上推送新幻灯片时在这个文件上追加
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+        self.index_path = os.path.join(root, INDEX_NAME)
+        self._entries: Dict[str, Dict] = {}
+        self._outputs: Dict[str, str] = {}
+        self._dirty = False
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if not isinstance(data, dict):
+            return
+        entries = data.get("pdfs")
+        if isinstance(entries, dict):
+            self._entries = entries
+        outputs = data.get("outputs")
+        if isinstance(outputs, dict):
+            self._outputs = outputs
+
+    def _refresh_folder(self, folder: str):
+        """同步目录中的PDF：新文件和被修改的文件读取关键字，已删除的文件移出索引"""
+        seen = set()
+        try:
+            scanned = [entry for entry in os.scandir(folder)
+                       if entry.is_file() and entry.name.endswith(".pdf")]
+        except OSError:
+            scanned = []
+        for entry in scanned:
+            seen.add(entry.path)
+            stat = entry.stat()
+            known = self._entries.get(entry.path)
+            if known and (known.get("size"), known.get("mtime_ns")) == (stat.st_size, stat.st_mtime_ns):
+                continue
+            try:
+                keywords = read_pdf_keywords(entry.path)
+            except Exception as e:
+                print(f"读取PDF信息失败: {entry.path}, 错误: {e}")
+                keywords = None
+            self._entries[entry.path] = {
+                "hash": keywords,
+                "size": stat.st_size,
+                "mtime_ns": stat.st_mtime_ns,
+            }
+            self._dirty = True
+
+        for path in [path for path in self._entries
+                     if _in_folder(path, folder) and path not in seen]:
+            del self._entries[path]
+            self._dirty = True
+
+    def find(self, content_hash: str, folder: str) -> Optional[str]:
+        """
+        在目录中查找内容哈希相同的PDF
+
+        Returns:
+            PDF文件名，没有时为None
+        """
+        with self._lock:
+            self._refresh_folder(folder)
+            match = None
+            for path, entry in self._entries.items():
+                if entry.get("hash") == content_hash and _in_folder(path, folder):
+                    match = os.path.basename(path)
+                    break
+        self.save()
+        return match
+
+    def get(self, folder: str, name: str) -> Optional[Dict]:
+        """获取PDF的索引条目，文件在记录之后被改动过时返回None"""
+        path = os.path.join(folder, name)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        with self._lock:
+            entry = self._entries.get(path)
+            if not entry or (entry.get("size"), entry.get("mtime_ns")) != (stat.st_size, stat.st_mtime_ns):
+                return None
+            return dict(entry)
+
+    def output(self, folder: str, deck: str) -> Optional[str]:
+        """
+        演示文稿在目录中最近一次写入的PDF
+
+        Returns:
+            PDF文件名，没有记录或文件已删除时为None
+        """
+        with self._lock:
+            path = self._outputs.get(os.path.join(folder, deck))
+        if path is None or not os.path.exists(path):
+            return None
+        return os.path.basename(path)
+
+    def record(self, content_hash: str, folder: str, name: str, layout: Optional[Dict] = None,
+               deck: Optional[str] = None):
+        """记录新写入的PDF，deck不为空时同时记为该演示文稿当前的PDF"""
+        path = os.path.join(folder, name)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return
+        entry = {
+            "hash": content_hash,
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+        }
+        if layout is not None:
+            entry["layout"] = layout
+        with self._lock:
+            self._entries[path] = entry
+            if deck is not None:
+                self._outputs[os.path.join(folder, deck)] = path
+            self._dirty = True
+        self.save()
+
+    def save(self):
+        """有变化时原子写入索引，写入期间持有锁，多个线程同时保存时不会互相覆盖临时文件"""
+        with self._lock:
+            if not self._dirty:
+                return
+            temp_path = self.index_path + ".tmp"
+            try:
+                with open(temp_path, "w", encoding="utf-8") as f:
+                    json.dump({"pdfs": self._entries, "outputs": self._outputs}, f, ensure_ascii=False)
+                os.replace(temp_path, self.index_path)
+                self._dirty = False
+            except OSError as e:
+                print(f"保存PDF索引失败: {e}")
+
+
+_indexes: Dict[str, PDFIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_pdf_index(root: str) -> PDFIndex:
+    """获取下载根目录的PDF索引，同一目录在进程内共用一个实例"""
+    key = os.path.normcase(os.path.abspath(root))
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None:
+            index = PDFIndex(root)
+            _indexes[key] = index
+        return index
@@ -0,0 +1,311 @@
+"""
+流式PDF写入模块
+幻灯片JPEG不解码，原样作为DCTDecode图像流写入；每页写完即落盘，文档不整体保存在内存中；
+先写入临时文件，完成后原子替换为目标文件，生成中断不会留下不完整的PDF；
+已有文档可以增量更新：只在文件末尾追加新页面、页面树和交叉引用表，未变化的页面直接沿用，
+追加同样在原文件的副本上进行
+"""
+
+import io
+import os
+import shutil
+import uuid
+from typing import Dict, List, Optional
+
+from PIL import Image
+
+# 答案文字使用阅读器自带的Adobe-GB1标准中文字体，不需要嵌入或加载字体文件
+ANSWER_FONT_RESOURCE = "F1"
+ANSWER_FONT_SIZE = 30
+ANSWER_COLOR = (1, 0, 0)
+
+COLOR_SPACES = {"RGB": "/DeviceRGB", "L": "/DeviceGray", "CMYK": "/DeviceCMYK"}
+COPY_CHUNK_SIZE = 64 * 1024
+
+
+def pdf_string(value: str) -> bytes:
+    """PDF文字字符串，非ASCII内容使用UTF-16BE"""
+    try:
+        raw = value.encode("ascii")
+    except UnicodeEncodeError:
+        return b"<FEFF" + value.encode("utf-16-be").hex().upper().encode() + b">"
+    raw = raw.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)")
+    return b"(" + raw + b")"
+
+
+def ucs2_hex(text: str) -> bytes:
+    """按UniGB-UCS2-H编码文字，BMP以外的字符替换为问号"""
+    return "".join(
+        "%04X" % (ord(char) if ord(char) <= 0xFFFF else ord("?")) for char in text
+    ).encode()
+
+
+class PDFWriter:
+    """
+    流式PDF写入器
+
+    用法：
+        with PDFWriter(path, keywords=hash) as pdf:
+            pdf.add_image_page(image_path, width, height, text=answer)
+    正常退出with时完成文档并替换目标文件，发生异常时删除临时文件
+
+    传入上次写入后得到的layout时以增量更新方式追加到原文件的副本，
+    沿用的页面用add_existing_page加入；目标文件被占用无法替换时close()抛出OSError，原文件保持不变
+    """
+
+    def __init__(self, path: str, keywords: Optional[str] = None, author: Optional[str] = None,
+                 layout: Optional[Dict] = None):
+        self.path = path
+        # 同一PDF可能同时生成两次（强制刷新与推送触发的生成），各自使用不同的临时文件
+        self.part_path = "%s.%s.part" % (path, uuid.uuid4().hex[:8])
+        self.keywords = keywords
+        self.author = author
+        self._offsets: Dict[int, int] = {}
+        self._page_ids: List[int] = []
+        self._broken = False
+        self._xref_offset: Optional[int] = None
+        self._base = layout
+        if layout is None:
+            self._next_id = 1
+            self._font_id: Optional[int] = None
+            self._file = open(self.part_path, "xb")
+            self._file.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+            # 页面树对象在最后写入，编号先保留
+            self._pages_id = self._new_id()
+            self._catalog_id = None
+        else:
+            self._next_id = layout["next_id"]
+            self._font_id = layout.get("font_id")
+            self._pages_id = layout["pages_id"]
+            self._catalog_id = layout["catalog_id"]
+            self._file = open(self.part_path, "xb+")
+            try:
+                with open(path, "rb") as source:
+                    shutil.copyfileobj(source, self._file, COPY_CHUNK_SIZE)
+            except OSError:
+                self.abort()
+                raise
+
+    @property
+    def incremental(self) -> bool:
+        return self._base is not None
+
+    @property
+    def layout(self) -> Dict:
+        """再次增量更新所需的对象编号信息，文档完成后可用"""
+        return {
+            "pages_id": self._pages_id,
+            "catalog_id": self._catalog_id,
+            "next_id": self._next_id,
+            "font_id": self._font_id,
+            "xref": self._xref_offset,
+            "page_ids": list(self._page_ids),
+        }
+
+    @property
+    def page_count(self) -> int:
+        return len(self._page_ids)
+
+    def _new_id(self) -> int:
+        object_id = self._next_id
+        self._next_id += 1
+        return object_id
+
+    def _begin_object(self, object_id: int):
+        self._offsets[object_id] = self._file.tell()
+        self._file.write(b"%d 0 obj\n" % object_id)
+
+    def _write_object(self, object_id: int, body: bytes):
+        self._begin_object(object_id)
+        self._file.write(body + b"\nendobj\n")
+
+    def _write_stream(self, object_id: int, dictionary: bytes, data: bytes):
+        self._begin_object(object_id)
+        self._file.write(b"<<" + dictionary + b" /Length %d>>\nstream\n" % len(data))
+        self._file.write(data)
+        self._file.write(b"\nendstream\nendobj\n")
+
+    @staticmethod
+    def _probe_image(image_path: str):
+        """
+        读取图片头信息，JPEG返回(宽, 高, 模式, None)，
+        其他格式转换为JPEG后返回(宽, 高, "RGB", JPEG数据)
+        """
+        with Image.open(image_path) as img:
+            width, height = img.size
+            if img.format == "JPEG" and img.mode in COLOR_SPACES:
+                return width, height, img.mode, None
+            img = img.convert("RGB")
+            buffer = io.BytesIO()
+            img.save(buffer, "JPEG", quality=95)
+            return width, height, "RGB", buffer.getvalue()
+
+    def _font(self) -> int:
+        """第一次写文字时写入字体对象"""
+        if self._font_id is None:
+            descriptor_id = self._new_id()
+            self._write_object(
+                descriptor_id,
+                b"<</Type /FontDescriptor /FontName /STSong-Light /Flags 6"
+                b" /FontBBox [-25 -254 1000 880] /ItalicAngle 0 /Ascent 880"
+                b" /Descent -120 /CapHeight 880 /StemV 93>>",
+            )
+            cid_font_id = self._new_id()
+            self._write_object(
+                cid_font_id,
+                b"<</Type /Font /Subtype /CIDFontType0 /BaseFont /STSong-Light"
+                b" /CIDSystemInfo <</Registry (Adobe) /Ordering (GB1) /Supplement 4>>"
+                b" /FontDescriptor %d 0 R /DW 1000 /W [1 95 500]>>" % descriptor_id,
+            )
+            self._font_id = self._new_id()
+            self._write_object(
+                self._font_id,
+                b"<</Type /Font /Subtype /Type0 /BaseFont /STSong-Light"
+                b" /Encoding /UniGB-UCS2-H /DescendantFonts [%d 0 R]>>" % cid_font_id,
+            )
+        return self._font_id
+
+    def add_existing_page(self, page_id: int):
+        """增量更新时沿用原文档中的页面"""
+        if not self.incremental:
+            raise ValueError("新文档没有可沿用的页面")
+        self._page_ids.append(page_id)
+
+    def add_image_page(self, image_path: str, width: float, height: float,
+                       text: Optional[str] = None) -> int:
+        """
+        添加一页，图片铺满页面，text不为空时在左上角标注红色文字
+
+        读取图片失败时抛出异常且不写入任何内容，可以跳过该页继续
+
+        Returns:
+            页面对象编号
+        """
+        if self._broken:
+            raise RuntimeError("PDF写入已中断")
+        pixel_width, pixel_height, mode, converted = self._probe_image(image_path)
+        size = len(converted) if converted is not None else os.path.getsize(image_path)
+        source = open(image_path, "rb") if converted is None else None
+        try:
+            image_id = self._new_id()
+            self._begin_object(image_id)
+            dictionary = (
+                b"<</Type /XObject /Subtype /Image /Width %d /Height %d"
+                b" /ColorSpace %s /BitsPerComponent 8 /Filter /DCTDecode"
+                % (pixel_width, pixel_height, COLOR_SPACES[mode].encode())
+            )
+            if mode == "CMYK":
+                # Adobe CMYK JPEG的通道是反相存储的
+                dictionary += b" /Decode [1 0 1 0 1 0 1 0]"
+            self._file.write(dictionary + b" /Length %d>>\nstream\n" % size)
+            if source is not None:
+                shutil.copyfileobj(source, self._file, COPY_CHUNK_SIZE)
+            else:
+                self._file.write(converted)
+            self._file.write(b"\nendstream\nendobj\n")
+
+            content = b"q %.2f 0 0 %.2f 0 0 cm /Im0 Do Q" % (width, height)
+            resources = b"/XObject <</Im0 %d 0 R>>" % image_id
+            if text:
+                font_id = self._font()
+                content += b"\nBT /%s %d Tf %g %g %g rg 50 %.2f Td <%s> Tj ET" % (
+                    ANSWER_FONT_RESOURCE.encode(), ANSWER_FONT_SIZE, *ANSWER_COLOR,
+                    height - 50 - ANSWER_FONT_SIZE, ucs2_hex(text),
+                )
+                resources += b" /Font <</%s %d 0 R>>" % (ANSWER_FONT_RESOURCE.encode(), font_id)
+            content_id = self._new_id()
+            self._write_stream(content_id, b"", content)
+
+            page_id = self._new_id()
+            self._write_object(
+                page_id,
+                b"<</Type /Page /Parent %d 0 R /MediaBox [0 0 %.2f %.2f]"
+                b" /Resources <<%s>> /Contents %d 0 R>>"
+                % (self._pages_id, width, height, resources, content_id),
+            )
+            self._page_ids.append(page_id)
+            return page_id
+        except Exception:
+            # 已写入部分对象，文档无法继续
+            self._broken = True
+            raise
+        finally:
+            if source is not None:
+                source.close()
+
+    def _write_xref(self, trailer: bytes):
+        """写入本次写入的对象的交叉引用表，连续编号合并为一段"""
+        self._xref_offset = self._file.tell()
+        ids = sorted(self._offsets)
+        sections = []
+        for object_id in ids:
+            if sections and sections[-1][-1] == object_id - 1:
+                sections[-1].append(object_id)
+            else:
+                sections.append([object_id])
+        self._file.write(b"xref\n")
+        if not self.incremental:
+            # 新文档从0号空闲对象开始，编号连续
+            sections = [[0] + ids]
+        for section in sections:
+            self._file.write(b"%d %d\n" % (section[0], len(section)))
+            for object_id in section:
+                if object_id == 0:
+                    self._file.write(b"0000000000 65535 f \n")
+                else:
+                    self._file.write(b"%010d 00000 n \n" % self._offsets[object_id])
+        self._file.write(b"trailer\n<<" + trailer + b">>\nstartxref\n%d\n%%%%EOF\n" % self._xref_offset)
+
+    def close(self):
+        """写入页面树、文档信息和交叉引用表，然后替换目标文件"""
+        if self._broken:
+            self.abort()
+            raise RuntimeError("PDF写入已中断")
+        kids = b" ".join(b"%d 0 R" % page_id for page_id in self._page_ids)
+        self._write_object(
+            self._pages_id,
+            b"<</Type /Pages /Kids [%s] /Count %d>>" % (kids, len(self._page_ids)),
+        )
+        if self._catalog_id is None:
+            self._catalog_id = self._new_id()
+            self._write_object(
+                self._catalog_id, b"<</Type /Catalog /Pages %d 0 R>>" % self._pages_id
+            )
+        info = b"/Producer (RainClassroomAssistant)"
+        if self.author:
+            info += b" /Author " + pdf_string(self.author)
+        if self.keywords:
+            info += b" /Keywords " + pdf_string(self.keywords)
+        info_id = self._new_id()
+        self._write_object(info_id, b"<<" + info + b">>")
+
+        trailer = b"/Size %d /Root %d 0 R /Info %d 0 R" % (self._next_id, self._catalog_id, info_id)
+        if self.incremental:
+            trailer += b" /Prev %d" % self._base["xref"]
+        self._write_xref(trailer)
+        self._file.close()
+        try:
+            os.replace(self.part_path, self.path)
+        except OSError:
+            # Windows上目标文件被阅读器打开时无法替换
+            self.abort()
+            raise
+
+    def abort(self):
+        """放弃本次写入，删除临时文件，目标文件保持不变"""
+        if not self._file.closed:
+            self._file.close()
+        try:
+            os.remove(self.part_path)
+        except FileNotFoundError:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
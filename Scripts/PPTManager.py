@@ -4,15 +4,27 @@ import re
 import threading
 import time
 import asyncio
-from concurrent.futures import ThreadPoolExecutor
 
-import PyPDF2
 import requests
-import aiohttp
-from fpdf import FPDF
-from PIL import Image, ImageDraw, ImageFont
+from PIL import Image
 
-from .AsyncDownloader import AsyncImageDownloader
+from .AsyncDownloader import AsyncImageDownloader, AsyncPPTDownloadManager
+from .BlobStore import get_blob_store
+from .DownloadLoop import download_session, get_download_loop, shutdown_download_loop
+from .ImageProcessing import shutdown_image_pool
+from .PDFIndex import get_pdf_index
+from .PDFWriter import PDFWriter
+from .SlideManifest import get_slide_manifest, slide_identifier, verify_image
+
+
+def shutdown_shared_resources():
+    """
+    程序退出时释放进程内共享的下载资源：
+    保存图片存储索引，关闭下载事件循环、后台任务线程池、AI分析线程池和图片处理进程池
+    """
+    get_blob_store().save()
+    shutdown_download_loop()
+    shutdown_image_pool(wait=False)
 
 
 class PPTManager:
@@ -42,7 +54,6 @@ class PPTManager:
         self.slides = data["slides"]
         self.width = data["width"]
         self.height = data["height"]
-        self.md5_list = []
         # 添加失败重试相关属性
         self.max_retry_attempts = 5
         self.failed_downloads = []
@@ -51,21 +62,37 @@ class PPTManager:
         self.presentation_id = None
         self.data_refresh_callback = None
         
-        # 初始化异步下载器
-        self.async_downloader = AsyncImageDownloader()
-        
-        # 初始化异步PPT下载管理器
-        from .AsyncDownloader import AsyncPPTDownloadManager
-        self.async_ppt_manager = AsyncPPTDownloadManager(
-            max_concurrent=8,
-            max_retries=self.max_retry_attempts,
-            skip_existing=True
-        )
-        
-        self._executor = ThreadPoolExecutor(max_workers=8)
-        
+        # 下载器在真正需要下载时才创建，只生成PDF或检查缓存时不创建
+        self._async_downloader = None
+        self._async_ppt_manager = None
+
         self.check_dir()
 
+    @property
+    def async_downloader(self):
+        """异步图片下载器，首次使用时创建"""
+        if getattr(self, "_async_downloader", None) is None:
+            self._async_downloader = AsyncImageDownloader()
+        return self._async_downloader
+
+    @async_downloader.setter
+    def async_downloader(self, downloader):
+        self._async_downloader = downloader
+
+    @property
+    def async_ppt_manager(self):
+        """异步PPT下载管理器，首次使用时创建"""
+        if getattr(self, "_async_ppt_manager", None) is None:
+            self._async_ppt_manager = AsyncPPTDownloadManager(
+                max_retries=self.max_retry_attempts,
+                skip_existing=True
+            )
+        return self._async_ppt_manager
+
+    @async_ppt_manager.setter
+    def async_ppt_manager(self, manager):
+        self._async_ppt_manager = manager
+
     def validateTitle(self, title):
         rstr = r"[\/\\\:\*\?\"\<\>\|]"  # '/ \ : * ? " < > |'
         new_title = re.sub(rstr, "_", title)  # 替换为下划线
@@ -90,20 +117,11 @@ class PPTManager:
 
     def download(self):
         """使用协程异步下载所有幻灯片图片"""
-        def run_async_download():
-            try:
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-                try:
-                    loop.run_until_complete(self._async_download_all())
-                finally:
-                    loop.close()
-            except Exception as e:
-                print(f"异步下载失败: {str(e)}")
-        
-        # 在线程池中执行异步下载
-        future = self._executor.submit(run_async_download)
-        future.result()  # 等待完成
+        try:
+            # 在共享的下载事件循环中执行并等待完成
+            get_download_loop().run(self._async_download_all())
+        except Exception as e:
+            print(f"异步下载失败: {str(e)}")
         
         # 下载完成后，检查并重试失败的图片
         self.retry_failed_downloads()
@@ -150,28 +168,16 @@ class PPTManager:
 
     def validate_image(self, image_path):
         """验证图片文件的有效性"""
-        try:
-            if not os.path.exists(image_path):
-                return False
-            
-            # 检查文件大小
-            if os.path.getsize(image_path) < 10:
-                return False
-            
-            # 使用PIL验证图片完整性
-            with Image.open(image_path) as img:
-                img.verify()
-                return True
-        except Exception:
-            return False
+        return verify_image(image_path)
 
     def get_missing_images(self):
-        """获取缺失或无效的图片列表"""
-        missing_images = []
-        for slide in self.slides:
-            image_path = self.imgpath + "\\" + str(slide["index"]) + ".jpg"
-            if not self.validate_image(image_path):
-                missing_images.append(slide)
+        """获取缺失或无效的图片列表，清单中未变化的图片只需stat"""
+        manifest = get_slide_manifest(self.imgpath)
+        missing_images = [
+            slide for slide in self.slides
+            if not manifest.is_valid(str(slide["index"]) + ".jpg")
+        ]
+        manifest.save()
         return missing_images
 
     def set_data_refresh_callback(self, presentation_id, callback):
@@ -211,20 +217,10 @@ class PPTManager:
 
     def retry_failed_downloads(self):
         """重试下载失败或缺失的图片，最多尝试5次"""
-        def run_async_retry():
-            try:
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-                try:
-                    loop.run_until_complete(self._async_retry_downloads())
-                finally:
-                    loop.close()
-            except Exception as e:
-                print(f"异步重试失败: {str(e)}")
-        
-        # 在线程池中执行异步重试
-        future = self._executor.submit(run_async_retry)
-        future.result()  # 等待完成
+        try:
+            get_download_loop().run(self._async_retry_downloads())
+        except Exception as e:
+            print(f"异步重试失败: {str(e)}")
     
     async def _async_retry_downloads(self):
         """异步重试下载失败的图片，包含数据刷新机制"""
@@ -250,8 +246,8 @@ class PPTManager:
                 else:
                     print("数据刷新失败，继续使用原有数据重试...")
             
-            # 创建aiohttp会话并异步重新下载缺失的图片
-            async with aiohttp.ClientSession() as session:
+            # 复用共享下载会话异步重新下载缺失的图片
+            async with download_session() as session:
                 tasks = []
                 for slide in missing_images:
                     # 跳过没有URL的幻灯片
@@ -297,80 +293,133 @@ class PPTManager:
                 print(f"  - 图片 {slide['index']}: {url_status}")
         else:
             print("所有图片下载并验证完成")
-    def add_hash(self, path):
-        for img in os.listdir(path):
-            self.hash_list.add(self.get_md5(path + "\\" + img))
-            print(path + "\\" + img)
+        get_blob_store().save()
 
-    def generate_ppt(self):
-        pdf_name = self.title + ".pdf"
+    def get_page_keys(self):
+        """
+        各页的内容键（页码、下载时记录在清单中的图片哈希和答案），清单有效时不读取图片文件
+
+        Returns:
+            与self.slides对应的列表，图片不存在的页为None
+        """
+        manifest = get_slide_manifest(self.imgpath)
+        keys = []
         for slide in self.slides:
-            image_name = self.imgpath + "\\" + str(slide["index"]) + ".jpg"
-            
-            # 检查图片文件是否存在
-            if not os.path.exists(image_name):
-                print(f"警告: 图片文件不存在，跳过: {image_name}")
-                continue
-                
-            try:
-                md5 = self.get_md5(image_name)
-                self.md5_list.append(md5)
-                if "problem" in slide.keys():
-                    problem = slide["problem"]
-                    # print(problem)
-                    img = Image.open(image_name)
-                    font = ImageFont.truetype("C:\\Windows\\Fonts\\msyh.ttc", 30)
-                    draw = ImageDraw.Draw(img)
-                    draw.text(
-                        (50, 50),
-                        str(problem["answers"]),
-                        fill=(255, 0, 0),
-                        font=font,
-                    )
-                    img.save(image_name)
-            except Exception as e:
-                print(f"处理图片时发生错误: {image_name}, 错误: {e}")
+            digest = manifest.digest(str(slide["index"]) + ".jpg")
+            if digest is None:
+                keys.append(None)
                 continue
-        with open(self.imgpath + "\\md5.txt", "w") as f:
-            for md5 in self.md5_list:
-                f.write(md5 + "\n")
-        hash = self.get_sha256(self.imgpath + "\\md5.txt")
+            answers = slide["problem"].get("answers") if "problem" in slide else None
+            keys.append(f"{slide['index']}:{digest}:{answers}")
+        manifest.save()
+        return keys
+
+    def get_deck_hash(self, page_keys=None):
+        """
+        由各页内容键计算整套课件的指纹；
+        题目页的答案也计入指纹，答案变化时重新生成PDF
+        """
+        if page_keys is None:
+            page_keys = self.get_page_keys()
+        sha256 = hashlib.sha256()
+        for key in page_keys:
+            if key is not None:
+                sha256.update(f"{key}\n".encode("utf-8"))
+        return sha256.hexdigest()
+
+    def generate_ppt(self):
+        pdf_name = self.title + ".pdf"
+        self.restore_problem_slides()
+        page_keys = self.get_page_keys()
+        hash = self.get_deck_hash(page_keys)
         print(self.title + ":" + hash)
         for pdf in os.scandir(self.downloadpath):
-            if pdf.path == self.downloadpath + "\\" + pdf_name:
-                os.replace(pdf.path, self.lessondownloadpath + "\\" + pdf_name)
-        for pdf in os.scandir(self.lessondownloadpath):
-            if pdf.name.endswith(".pdf"):
-                try:
-                    keywords = PyPDF2.PdfReader(open(pdf.path, "rb")).metadata.get(
-                        "/Keywords"
-                    )
-                    if hash == keywords:
-                        return pdf.name
-                except Exception as e:
-                    print(e)
-        ppt = FPDF("L", "pt", [self.height, self.width])
-        ppt.set_keywords(hash)
-        ppt.set_author("RainClassroom")
-        for slide in self.slides:
-            image_name = self.imgpath + "\\" + str(slide["index"]) + ".jpg"
-            
-            # 检查图片文件是否存在
-            if not os.path.exists(image_name):
-                print(f"警告: 生成PDF时图片文件不存在，跳过: {image_name}")
+            if pdf.path == os.path.join(self.downloadpath, pdf_name):
+                os.replace(pdf.path, os.path.join(self.lessondownloadpath, pdf_name))
+        # 按内容哈希在索引中查找已生成的PDF，只有新增或被修改的PDF才需要读取
+        pdf_index = get_pdf_index(self.downloadpath)
+        existing = pdf_index.find(hash, self.lessondownloadpath)
+        if existing:
+            return existing
+        layout = None
+        deck = self.deck_key
+        # 课上推送了新幻灯片时，在该演示文稿最近一次写入的PDF（没有时为同名PDF）上更新，
+        # 与当前课件有相同页面才沿用；都不能沿用且同名PDF已存在时另存为带时间的文件
+        candidates = [pdf_index.output(self.lessondownloadpath, deck), pdf_name]
+        base_name = None
+        for name in dict.fromkeys(name for name in candidates if name):
+            if not os.path.exists(os.path.join(self.lessondownloadpath, name)):
                 continue
-                
-            try:
-                ppt.add_page()
-                ppt.image(image_name, 0, 0, h=self.height, w=self.width)
-            except Exception as e:
-                print(f"添加图片到PDF时发生错误: {image_name}, 错误: {e}")
-                continue
-        if os.path.exists(self.lessondownloadpath + "\\" + pdf_name):
+            entry = pdf_index.get(self.lessondownloadpath, name)
+            previous = entry.get("layout") if entry else None
+            shared = set(previous["page_keys"]) & set(page_keys) if previous else set()
+            if shared:
+                base_name = name
+                if (previous.get("orphans", 0) + len(previous["page_keys"]) - len(shared)
+                        <= len(shared)):
+                    layout = previous
+                # 否则废弃的页面已经过多，在原文件名下完整重写
+                break
+        if base_name is not None:
+            pdf_name = base_name
+        elif os.path.exists(os.path.join(self.lessondownloadpath, pdf_name)):
             pdf_name = self.title + str(self.timeinfo) + ".pdf"
-        ppt.output(self.lessondownloadpath + "\\" + pdf_name)
+        try:
+            new_layout = self._write_pdf(pdf_name, hash, page_keys, layout)
+        except OSError as e:
+            # Windows上PDF被阅读器打开时无法替换，改为另存为带时间的文件
+            fallback_name = self.title + str(self.timeinfo) + ".pdf"
+            if pdf_name == fallback_name:
+                raise
+            print(f"写入PDF失败: {pdf_name}, 错误: {e}，改为保存为 {fallback_name}")
+            pdf_name = fallback_name
+            new_layout = self._write_pdf(pdf_name, hash, page_keys)
+        pdf_index.record(hash, self.lessondownloadpath, pdf_name, new_layout, deck=deck)
         return pdf_name
 
+    @property
+    def deck_key(self):
+        """演示文稿在PDF索引中的标识，没有演示文稿ID时使用标题"""
+        return str(getattr(self, "presentation_id", None) or self.title)
+
+    def _write_pdf(self, pdf_name, hash, page_keys, layout=None):
+        """
+        写入PDF，传入layout时在同名文件上增量更新
+
+        Returns:
+            再次增量更新所需的layout
+        """
+        reusable = dict(zip(layout["page_keys"], layout["page_ids"])) if layout else {}
+        kept_keys = []
+        # JPEG原样写入，逐页落盘；完成后替换为正式文件，增量更新只追加变化的页
+        with PDFWriter(os.path.join(self.lessondownloadpath, pdf_name),
+                       keywords=hash, author="RainClassroom", layout=layout) as ppt:
+            for slide, key in zip(self.slides, page_keys):
+                image_name = os.path.join(self.imgpath, str(slide["index"]) + ".jpg")
+
+                # 检查图片文件是否存在
+                if key is None:
+                    print(f"警告: 生成PDF时图片文件不存在，跳过: {image_name}")
+                    continue
+
+                if key in reusable:
+                    ppt.add_existing_page(reusable.pop(key))
+                    kept_keys.append(key)
+                    continue
+                answers = str(slide["problem"]["answers"]) if "problem" in slide.keys() else None
+                try:
+                    ppt.add_image_page(image_name, self.width, self.height, text=answers)
+                except (OSError, ValueError) as e:
+                    print(f"添加图片到PDF时发生错误: {image_name}, 错误: {e}")
+                    continue
+                kept_keys.append(key)
+        new_layout = ppt.layout
+        new_layout["page_keys"] = kept_keys
+        new_layout["orphans"] = layout.get("orphans", 0) + len(reusable) if layout else 0
+        if layout:
+            print(f"增量更新PDF: {pdf_name}, 沿用 {len(layout['page_keys']) - len(reusable)} 页")
+        return new_layout
+
     def delete_cache(self):
         # 删除图片缓存文件，但保留文件夹结构以便重用
         if os.path.exists(self.imgpath):
@@ -380,6 +429,48 @@ class PPTManager:
                     os.remove(file_path)
             # 不删除文件夹本身，以便下次相同PPT可以重用
 
+    def refresh_cache(self):
+        """
+        演示文稿更新后按幻灯片比较缓存，只删除新增/变化/已移除的页，未变化的页继续使用
+
+        Returns:
+            SlideManifest.diff的结果
+        """
+        manifest = get_slide_manifest(self.imgpath)
+        diff = manifest.diff(self.slides)
+        stale = [str(slide["index"]) + ".jpg" for slide in diff["changed"]]
+        manifest.prune(stale + diff["removed"])
+        self.restore_problem_slides(diff["unchanged"])
+        return diff
+
+    def restore_problem_slides(self, slides=None):
+        """
+        旧版本生成PDF时把答案直接画在题目页图片上，
+        清单中的哈希与内容存储中的原图不一致时用原图替换
+
+        Returns:
+            恢复的文件名列表
+        """
+        manifest = get_slide_manifest(self.imgpath)
+        blob_store = get_blob_store()
+        restored = []
+        for slide in self.slides if slides is None else slides:
+            if "problem" not in slide or not slide.get("cover"):
+                continue
+            name = str(slide["index"]) + ".jpg"
+            blob = blob_store.lookup(slide["cover"])
+            if blob is None:
+                continue
+            blob_digest = os.path.splitext(os.path.basename(blob))[0]
+            if manifest.digest(name) in (None, blob_digest):
+                continue
+            blob_digest = blob_store.materialize(slide["cover"], os.path.join(self.imgpath, name))
+            if blob_digest is not None:
+                manifest.record(name, slide["cover"], blob_digest, slide_id=slide_identifier(slide))
+                restored.append(name)
+        manifest.save()
+        return restored
+
     def start(self):
         if self.title_dict.get(self.title) is None:
             return None, None
@@ -0,0 +1,89 @@
+"""
+演示文稿缓存模块
+缓存/presentation/fetch的结果，并合并并发的相同请求
+"""
+
+import copy
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+
+class PresentationCache:
+    """
+    演示文稿数据缓存
+
+    - 按键缓存，超过ttl秒后重新获取
+    - 同一键的并发请求只会真正请求一次，其余调用方等待同一结果
+    - 每次返回深拷贝，调用方可以自由修改返回的数据
+    """
+
+    def __init__(self, ttl: float = 300):
+        self.ttl = ttl
+        self._entries: Dict[Hashable, Tuple[float, Any]] = {}
+        self._inflight: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """
+        获取缓存数据，未命中时调用loader获取
+
+        Args:
+            key: 缓存键
+            loader: 无参数的数据获取函数
+
+        Returns:
+            数据的深拷贝
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] < self.ttl:
+                return copy.deepcopy(entry[1])
+            future = self._inflight.get(key)
+            is_leader = future is None
+            if is_leader:
+                future = Future()
+                self._inflight[key] = future
+
+        if not is_leader:
+            return copy.deepcopy(future.result())
+
+        try:
+            data = loader()
+        except BaseException as e:
+            with self._lock:
+                self._inflight.pop(key, None)
+            future.set_exception(e)
+            raise
+        with self._lock:
+            # 请求期间被invalidate时不写入缓存，但仍把结果返回给等待者
+            if self._inflight.get(key) is future:
+                self._entries[key] = (time.monotonic(), data)
+                del self._inflight[key]
+        future.set_result(data)
+        return copy.deepcopy(data)
+
+    def invalidate(self, key: Hashable):
+        """使某个键失效，正在进行的请求结果也不会写入缓存"""
+        with self._lock:
+            self._entries.pop(key, None)
+            self._inflight.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._inflight.clear()
+
+
+_cache: Optional[PresentationCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_presentation_cache() -> PresentationCache:
+    """获取进程内共享的演示文稿缓存"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = PresentationCache()
+        return _cache
@@ -0,0 +1,72 @@
+"""
+题目索引模块
+按演示文稿分组保存题目，并按各类题目/幻灯片标识建立索引
+"""
+
+import threading
+from typing import Any, Dict, Iterable, List, Optional
+
+# 可用于定位题目的字段，unlockproblem/probleminfo中的id可能对应其中任意一个
+IDENTIFIER_FIELDS = ("problemId", "id", "sid", "slideId")
+
+
+def problem_identifiers(problem: Dict[str, Any]) -> List[str]:
+    """返回题目的全部标识（已转为字符串并去重）"""
+    identifiers = []
+    values = [problem.get(field) for field in IDENTIFIER_FIELDS]
+    values.extend(problem.get("slideIds", []) or [])
+    for value in values:
+        if value and str(value) not in identifiers:
+            identifiers.append(str(value))
+    return identifiers
+
+
+class ProblemStore:
+    """
+    题目索引
+
+    - 每个演示文稿的题目整体替换，重复推送同一演示文稿不会产生重复记录
+    - 按problemId/id/sid/slideId/slideIds建立索引，查找为O(1)
+    """
+
+    def __init__(self):
+        self._by_presentation: Dict[Any, List[Dict[str, Any]]] = {}
+        self._index: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.RLock()
+
+    def replace_presentation(self, presentationid, problems: Iterable[Dict[str, Any]]):
+        """用最新的题目列表替换某个演示文稿的全部题目"""
+        problems = list(problems)
+        with self._lock:
+            for old_problem in self._by_presentation.pop(presentationid, []):
+                for identifier in problem_identifiers(old_problem):
+                    # 其他演示文稿可能已经覆盖了同一标识，只删除属于自己的记录
+                    if self._index.get(identifier) is old_problem:
+                        del self._index[identifier]
+            self._by_presentation[presentationid] = problems
+            for problem in problems:
+                for identifier in problem_identifiers(problem):
+                    self._index[identifier] = problem
+
+    def find(self, identifier) -> Optional[Dict[str, Any]]:
+        """按任意标识查找题目"""
+        if not identifier:
+            return None
+        with self._lock:
+            return self._index.get(str(identifier))
+
+    def problems(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [
+                problem
+                for problems in self._by_presentation.values()
+                for problem in problems
+            ]
+
+    def presentations(self) -> List[Any]:
+        with self._lock:
+            return list(self._by_presentation)
+
+    def __len__(self):
+        with self._lock:
+            return sum(len(problems) for problems in self._by_presentation.values())
@@ -0,0 +1,59 @@
+"""
+共享任务模块
+多个账号参加同一节课时，同一演示文稿的下载只由一个课程执行，其余课程等待其结果
+"""
+
+import threading
+from concurrent.futures import Future
+from typing import Dict, Hashable, Optional, Tuple
+
+
+class SharedWork:
+    """
+    按键登记进行中的任务
+
+    - start()返回(future, 是否由调用方执行)，同一键同时只有一个执行者
+    - 执行者调用finish()后移除登记，已在等待的调用方通过future得到结果；
+      之后再调用start()重新执行，由本地缓存判断是否需要真正下载，缓存被删除后也能重新下载
+    - force=True时丢弃已有记录重新执行（演示文稿更新）
+    """
+
+    def __init__(self):
+        self._futures: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+
+    def start(self, key: Hashable, force: bool = False) -> Tuple[Future, bool]:
+        with self._lock:
+            future = self._futures.get(key)
+            if future is not None and not force:
+                return future, False
+            future = Future()
+            self._futures[key] = future
+            return future, True
+
+    def finish(self, key: Hashable, future: Future, success: bool):
+        with self._lock:
+            if self._futures.get(key) is future:
+                del self._futures[key]
+        future.set_result(success)
+
+    def forget(self, key: Hashable):
+        with self._lock:
+            self._futures.pop(key, None)
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._futures
+
+
+_downloads: Optional[SharedWork] = None
+_downloads_lock = threading.Lock()
+
+
+def get_shared_downloads() -> SharedWork:
+    """获取进程内共享的演示文稿下载登记表"""
+    global _downloads
+    with _downloads_lock:
+        if _downloads is None:
+            _downloads = SharedWork()
+        return _downloads
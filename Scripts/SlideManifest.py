@@ -0,0 +1,237 @@
+"""
+幻灯片缓存清单模块
+在图片目录中保存manifest.json，记录每张已校验图片的大小、修改时间和内容哈希，
+文件状态未变化时直接信任缓存，不再用PIL重复解码校验
+"""
+
+import hashlib
+import json
+import os
+import threading
+from typing import Any, Dict, List, Optional
+
+from PIL import Image
+
+MANIFEST_NAME = "manifest.json"
+
+
+def verify_image(image_path: str) -> bool:
+    """用PIL完整校验图片文件"""
+    try:
+        if not os.path.exists(image_path):
+            return False
+        if os.path.getsize(image_path) < 10:
+            return False
+        with Image.open(image_path) as img:
+            img.verify()
+            return True
+    except Exception:
+        return False
+
+
+def slide_identifier(slide: Dict[str, Any]) -> Optional[str]:
+    value = slide.get("id") or slide.get("slideId")
+    return str(value) if value else None
+
+
+def file_sha256(path: str) -> str:
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+class SlideManifest:
+    """
+    单个演示文稿图片目录的缓存清单
+
+    条目以文件名为键：{"index", "slide_id", "cover", "size", "mtime_ns", "sha256", "verified"}
+    """
+
+    def __init__(self, img_path: str):
+        self.img_path = img_path
+        self.manifest_path = os.path.join(img_path, MANIFEST_NAME)
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._dirty = False
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        entries = data.get("slides") if isinstance(data, dict) else None
+        if isinstance(entries, dict):
+            self._entries = entries
+
+    @staticmethod
+    def _stat(path: str):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return stat.st_size, stat.st_mtime_ns
+
+    def get(self, name: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(name)
+            return dict(entry) if entry else None
+
+    def is_valid(self, name: str) -> bool:
+        """
+        检查图片是否有效
+
+        文件大小和修改时间与清单一致时只需一次stat，否则用PIL校验并更新清单
+        """
+        path = os.path.join(self.img_path, name)
+        stat = self._stat(path)
+        if stat is None:
+            self.discard(name)
+            return False
+        with self._lock:
+            entry = self._entries.get(name)
+            if (entry and entry.get("verified")
+                    and (entry.get("size"), entry.get("mtime_ns")) == stat):
+                return True
+        if not verify_image(path):
+            self.discard(name)
+            return False
+        cover = entry.get("cover") if entry else None
+        slide_id = entry.get("slide_id") if entry else None
+        self.record(name, cover, slide_id=slide_id)
+        return True
+
+    def record(self, name: str, cover: Optional[str] = None, sha256: Optional[str] = None,
+               slide_id: Optional[str] = None):
+        """记录一张已校验通过的图片，sha256为空时重新计算"""
+        path = os.path.join(self.img_path, name)
+        stat = self._stat(path)
+        if stat is None:
+            return
+        try:
+            sha256 = sha256 or file_sha256(path)
+        except OSError:
+            return
+        entry = {
+            "index": os.path.splitext(name)[0],
+            "slide_id": slide_id,
+            "cover": cover,
+            "size": stat[0],
+            "mtime_ns": stat[1],
+            "sha256": sha256,
+            "verified": True,
+        }
+        with self._lock:
+            self._entries[name] = entry
+            self._dirty = True
+
+    def digest(self, name: str) -> Optional[str]:
+        """
+        获取图片的内容哈希
+
+        优先使用下载时记录的哈希，文件状态与清单不一致时才重新读取文件
+
+        Returns:
+            sha256，文件不存在时为None
+        """
+        stat = self._stat(os.path.join(self.img_path, name))
+        if stat is None:
+            return None
+        with self._lock:
+            entry = self._entries.get(name)
+            if (entry and entry.get("sha256")
+                    and (entry.get("size"), entry.get("mtime_ns")) == stat):
+                return entry["sha256"]
+        cover = entry.get("cover") if entry else None
+        slide_id = entry.get("slide_id") if entry else None
+        self.record(name, cover, slide_id=slide_id)
+        entry = self.get(name)
+        return entry["sha256"] if entry else None
+
+    def diff(self, slides: List[Dict[str, Any]]) -> Dict[str, list]:
+        """
+        将新的幻灯片列表与清单比较
+
+        同一页码的幻灯片ID和封面URL都与清单一致时视为未变化
+
+        Returns:
+            {"unchanged": [幻灯片], "changed": [幻灯片], "removed": [文件名]}
+        """
+        unchanged, changed = [], []
+        current_names = set()
+        with self._lock:
+            entries = dict(self._entries)
+        for slide in slides:
+            name = f"{slide['index']}.jpg"
+            current_names.add(name)
+            entry = entries.get(name)
+            slide_id = slide_identifier(slide)
+            if (entry and slide.get("cover") and entry.get("cover") == slide.get("cover")
+                    and entry.get("slide_id") in (None, slide_id)):
+                unchanged.append(slide)
+            else:
+                changed.append(slide)
+
+        removed = {name for name in entries if name not in current_names}
+        try:
+            removed.update(
+                name for name in os.listdir(self.img_path)
+                if name.endswith(".jpg") and name not in current_names
+            )
+        except OSError:
+            pass
+        return {"unchanged": unchanged, "changed": changed, "removed": sorted(removed)}
+
+    def prune(self, names):
+        """删除图片文件及其清单条目"""
+        for name in names:
+            try:
+                os.remove(os.path.join(self.img_path, name))
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                print(f"删除缓存图片失败: {name}, 错误: {e}")
+            self.discard(name)
+
+    def discard(self, name: str):
+        with self._lock:
+            if self._entries.pop(name, None) is not None:
+                self._dirty = True
+
+    def save(self):
+        """有变化时原子写入清单文件（先写临时文件再替换），写入期间持有锁，同时保存时不会互相覆盖"""
+        with self._lock:
+            if not self._dirty:
+                return
+            temp_path = self.manifest_path + ".tmp"
+            try:
+                with open(temp_path, "w", encoding="utf-8") as f:
+                    json.dump({"slides": self._entries}, f, ensure_ascii=False)
+                os.replace(temp_path, self.manifest_path)
+                self._dirty = False
+            except OSError as e:
+                print(f"保存图片清单失败: {e}")
+
+
+_manifests: Dict[str, SlideManifest] = {}
+_manifests_lock = threading.Lock()
+
+
+def get_slide_manifest(img_path: str) -> SlideManifest:
+    """获取图片目录的清单，同一目录在进程内共用一个实例"""
+    key = os.path.normcase(os.path.abspath(img_path))
+    with _manifests_lock:
+        manifest = _manifests.get(key)
+        if manifest is None:
+            manifest = SlideManifest(img_path)
+            _manifests[key] = manifest
+        return manifest
+
+
+def is_valid_slide_image(image_path: str) -> bool:
+    """按图片路径检查有效性，自动定位所在目录的清单"""
+    img_path, name = os.path.split(image_path)
+    return get_slide_manifest(img_path or ".").is_valid(name)
@@ -9,7 +9,6 @@ from email.message import EmailMessage
 from math import exp
 
 import pyttsx3
-import requests
 import urllib3
 from numpy import random
 
@@ -330,6 +329,8 @@ def get_initial_data(old_config=None):
         "sign_config": {
             "delay_time": {"type": 1, "custom": {"time": 120, "cutoff": 120}}
         },
+        # 图片格式转换、答案标注使用的进程数，0表示不启用进程池
+        "image_process_workers": 2,
         # AI分析配置默认值
         "enable_ai_analysis": False,
         "openai_api_key": "",
@@ -389,47 +390,23 @@ def get_appdata_config_dir():
 
 def get_user_info(sessionid, region):
     # 获取用户信息
-    headers = {
-        "Cookie": "sessionid=%s" % sessionid,
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:97.0) Gecko/20100101 Firefox/97.0",
-    }
-    r = requests.get(
-        url=f"https://{get_host(region)}/api/v3/user/basic-info",
-        headers=headers,
-        proxies={"http": None, "https": None},
-    )
-    rtn = dict_result(r.text)
-    return (rtn["code"], rtn["data"])
+    from .ApiClient import get_api_client
+
+    return get_api_client(region).get_user_info(sessionid)
 
 
 def get_on_lesson(sessionid, region):
     # 获取用户当前正在上课列表
-    headers = {
-        "Cookie": "sessionid=%s" % sessionid,
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:97.0) Gecko/20100101 Firefox/97.0",
-    }
-    r = requests.get(
-        f"https://{get_host(region)}/api/v3/classroom/on-lesson",
-        headers=headers,
-        proxies={"http": None, "https": None},
-    )
-    rtn = dict_result(r.text)
-    return rtn["data"]["onLessonClassrooms"]
+    from .ApiClient import get_api_client
+
+    return get_api_client(region).get_on_lesson(sessionid)
 
 
 def get_on_lesson_old(sessionid, region):
     # 获取用户当前正在上课的列表（旧版）
-    headers = {
-        "Cookie": "sessionid=%s" % sessionid,
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:97.0) Gecko/20100101 Firefox/97.0",
-    }
-    r = requests.get(
-        f"https://{get_host(region)}/v/course_meta/on_lesson_courses",
-        headers=headers,
-        proxies={"http": None, "https": None},
-    )
-    rtn = dict_result(r.text)
-    return rtn["on_lessons"]
+    from .ApiClient import get_api_client
+
+    return get_api_client(region).get_on_lesson_old(sessionid)
 
 
 def get_host(index):
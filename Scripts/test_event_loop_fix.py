@@ -16,20 +16,23 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from Scripts.AsyncDownloader import AsyncImageDownloader, AsyncPPTDownloadManager
 from Scripts.Classes import Lesson
+from Scripts.HostLimiter import get_host_limiter
 
+TEST_URL = "https://httpbin.org/image/jpeg"
 
-def test_semaphore_creation():
-    """测试Semaphore的延迟创建机制"""
-    print("=== 测试Semaphore延迟创建 ===")
+
+def test_slot_creation():
+    """测试在没有事件循环时创建的下载器可以在新事件循环中获取并发名额"""
+    print("=== 测试并发名额获取 ===")
     
     # 在没有事件循环的环境中创建下载器
     downloader = AsyncImageDownloader(max_concurrent=4)
-    print(f"✓ 下载器创建成功，_semaphore初始值: {downloader._semaphore}")
+    print(f"✓ 下载器创建成功: {type(downloader)}")
     
-    # 在新的事件循环中测试Semaphore创建
+    # 在新的事件循环中获取主机并发名额
     async def test_in_loop():
-        semaphore = downloader.semaphore
-        print(f"✓ 在事件循环中成功获取Semaphore: {type(semaphore)}")
+        async with get_host_limiter(TEST_URL).slot() as limiter:
+            print(f"✓ 在事件循环中成功获取并发名额: {limiter.host}")
         return True
     
     # 运行测试
@@ -37,7 +40,7 @@ def test_semaphore_creation():
     asyncio.set_event_loop(loop)
     try:
         result = loop.run_until_complete(test_in_loop())
-        print("✓ Semaphore延迟创建测试通过")
+        print("✓ 并发名额获取测试通过")
         return result
     finally:
         loop.close()
@@ -53,13 +56,10 @@ def test_multiple_event_loops():
         asyncio.set_event_loop(loop)
         
         try:
-            downloader = AsyncImageDownloader(max_concurrent=2)
-            
             async def test_download():
-                # 模拟下载任务
-                semaphore = downloader.semaphore
-                async with semaphore:
-                    print(f"✓ 线程 {thread_id}: 成功获取Semaphore锁")
+                # 模拟下载任务，各线程的事件循环共用同一主机的并发限制
+                async with get_host_limiter(TEST_URL).slot():
+                    print(f"✓ 线程 {thread_id}: 成功获取并发名额")
                     await asyncio.sleep(0.1)  # 模拟下载时间
                     return True
             
@@ -181,7 +181,7 @@ def test_classes_integration():
             manager = lesson.async_download_manager
             print(f"✓ 成功获取async_download_manager: {type(manager)}")
             
-            # 测试下载器的Semaphore创建
+            # 测试下载器在新事件循环中获取并发名额
             downloader = manager.downloader
             print(f"✓ 成功获取downloader: {type(downloader)}")
             
@@ -191,12 +191,12 @@ def test_classes_integration():
                 asyncio.set_event_loop(loop)
                 
                 try:
-                    async def test_semaphore():
-                        semaphore = downloader.semaphore
-                        print(f"✓ 在新事件循环中成功获取Semaphore: {type(semaphore)}")
+                    async def test_slot():
+                        async with get_host_limiter(TEST_URL).slot():
+                            print("✓ 在新事件循环中成功获取并发名额")
                         return True
                     
-                    return loop.run_until_complete(test_semaphore())
+                    return loop.run_until_complete(test_slot())
                 finally:
                     loop.close()
             
@@ -219,13 +219,13 @@ def test_classes_integration():
 if __name__ == "__main__":
     print("开始事件循环修复测试...\n")
     
-    test1_result = test_semaphore_creation()
+    test1_result = test_slot_creation()
     test2_result = test_multiple_event_loops()
     test3_result = test_async_ppt_download_manager()
     test4_result = test_classes_integration()
     
     print(f"\n=== 测试结果汇总 ===")
-    print(f"Semaphore延迟创建: {'✅ 通过' if test1_result else '❌ 失败'}")
+    print(f"并发名额获取: {'✅ 通过' if test1_result else '❌ 失败'}")
     print(f"多事件循环兼容性: {'✅ 通过' if test2_result else '❌ 失败'}")
     print(f"AsyncPPTDownloadManager: {'✅ 通过' if test3_result else '❌ 失败'}")
     print(f"Classes.py集成: {'✅ 通过' if test4_result else '❌ 失败'}")
@@ -234,7 +234,7 @@ if __name__ == "__main__":
     
     if all_passed:
         print("\n🎉 所有测试通过！事件循环修复成功！")
-        print("✓ Semaphore现在会在正确的事件循环中延迟创建")
+        print("✓ 主机并发限制可以在不同事件循环中使用")
         print("✓ 支持多线程环境下的不同事件循环")
         print("✓ 修复了'bound to a different event loop'错误")
     else:
@@ -2,7 +2,7 @@
 # -*- coding: utf-8 -*-
 """
 简化的事件循环修复测试
-专注于验证AsyncDownloader的Semaphore延迟创建修复
+专注于验证AsyncDownloader的并发限制在不同事件循环中可用
 """
 
 import asyncio
@@ -16,34 +16,37 @@ from concurrent.futures import ThreadPoolExecutor
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from Scripts.AsyncDownloader import AsyncImageDownloader, AsyncPPTDownloadManager
+from Scripts.HostLimiter import get_host_limiter
+
+TEST_URL = "https://httpbin.org/image/jpeg"
 
 
 def test_core_fix():
-    """测试核心修复：Semaphore延迟创建"""
-    print("=== 测试核心修复：Semaphore延迟创建 ===")
+    """测试核心修复：下载器不在创建时绑定事件循环"""
+    print("=== 测试核心修复：并发名额在事件循环中获取 ===")
     
     try:
         # 1. 创建下载器（不在事件循环中）
         downloader = AsyncImageDownloader(max_concurrent=2)
-        print(f"✓ 下载器创建成功，_semaphore初始值: {downloader._semaphore}")
+        print(f"✓ 下载器创建成功: {type(downloader)}")
         
-        # 2. 在事件循环中获取Semaphore
-        async def test_semaphore():
-            semaphore = downloader.semaphore
-            print(f"✓ 在事件循环中成功获取Semaphore: {type(semaphore)}")
+        # 2. 在事件循环中获取主机并发名额
+        async def test_slot():
+            async with get_host_limiter(TEST_URL).slot() as limiter:
+                print(f"✓ 在事件循环中成功获取并发名额: {limiter.host}")
             return True
         
         # 运行测试
         loop = asyncio.new_event_loop()
         asyncio.set_event_loop(loop)
-        result = loop.run_until_complete(test_semaphore())
+        result = loop.run_until_complete(test_slot())
         loop.close()
         
-        print("✓ Semaphore延迟创建测试通过")
+        print("✓ 并发名额获取测试通过")
         return True
         
     except Exception as e:
-        print(f"❌ Semaphore延迟创建测试失败: {e}")
+        print(f"❌ 并发名额获取测试失败: {e}")
         return False
 
 
@@ -61,10 +64,9 @@ def test_multiple_threads():
             asyncio.set_event_loop(loop)
             
             async def test_in_loop():
-                # 获取Semaphore并测试锁定
-                semaphore = downloader.semaphore
-                async with semaphore:
-                    print(f"✓ 线程 {thread_id}: 成功获取Semaphore锁")
+                # 各线程的事件循环共用同一主机的并发限制
+                async with get_host_limiter(TEST_URL).slot():
+                    print(f"✓ 线程 {thread_id}: 成功获取并发名额")
                     await asyncio.sleep(0.1)  # 模拟工作
                 return True
             
@@ -147,7 +149,7 @@ def main():
     
     # 汇总结果
     print(f"\n=== 测试结果汇总 ===")
-    print(f"Semaphore延迟创建: {'✅ 通过' if test1_result else '❌ 失败'}")
+    print(f"并发名额获取: {'✅ 通过' if test1_result else '❌ 失败'}")
     print(f"多线程事件循环兼容性: {'✅ 通过' if test2_result else '❌ 失败'}")
     print(f"AsyncPPTDownloadManager: {'✅ 通过' if test3_result else '❌ 失败'}")
     
@@ -156,7 +158,7 @@ def main():
     if all_passed:
         print("\n🎉 所有核心测试通过！事件循环修复成功！")
         print("✓ 修复了'<asyncio.locks.Semaphore object> is bound to a different event loop'错误")
-        print("✓ Semaphore现在会在正确的事件循环中延迟创建")
+        print("✓ 主机并发限制可以在不同事件循环中使用")
         print("✓ 支持多线程环境下的不同事件循环")
         print("✓ AsyncPPTDownloadManager可以在新事件循环中正常工作")
     else:
@@ -17,6 +17,7 @@ import traceback
 
 from PyQt5 import QtCore, QtGui, QtWidgets
 
+from Scripts.Cancellation import CancellationToken
 from Scripts.Monitor import monitor
 from Scripts.Logger import logger
 from Scripts.Update import Update, get_version
@@ -30,6 +31,7 @@ class MainWindow_Ui(QtCore.QObject):
     add_message_signal = QtCore.pyqtSignal(str, int)
     add_course_signal = QtCore.pyqtSignal(list, int)
     del_course_signal = QtCore.pyqtSignal(int)
+    monitor_stopped_signal = QtCore.pyqtSignal()
 
     def setupUi(self, MainWindow):
         # 对象变量初始化
@@ -179,6 +181,7 @@ class MainWindow_Ui(QtCore.QObject):
         self.add_message_signal.connect(self.add_message)
         self.add_course_signal.connect(self.add_course)
         self.del_course_signal.connect(self.del_course)
+        self.monitor_stopped_signal.connect(self.on_monitor_stopped)
 
         # 配置文件检查
         dir_route = get_config_dir()
@@ -408,20 +411,32 @@ class MainWindow_Ui(QtCore.QObject):
 
     def active(self):
         # 启动
-        self.monitor_t = threading.Thread(target=monitor, args=(self,), daemon=True)
+        self.stop_token = CancellationToken()
+        self.monitor_t = threading.Thread(
+            target=self._run_monitor, args=(self.stop_token,), daemon=True
+        )
         self.monitor_t.start()
         self.is_active = True
         self.active_btn.setText("停止监听")
         self.add_message_signal.emit("启动成功", 0)
 
+    def _run_monitor(self, stop_token):
+        # 监听线程退出后通过信号通知界面，界面线程不再join等待
+        try:
+            monitor(self, stop_token)
+        finally:
+            self.monitor_stopped_signal.emit()
+
     def deactive(self):
-        # 停止
+        # 停止：只发出停止信号，不阻塞界面线程
         self.active_btn.setText("停止中...")
         self.active_btn.setEnabled(False)
-        # 强制刷新UI
-        QtWidgets.qApp.processEvents()
         self.is_active = False
-        self.monitor_t.join()
+        self.stop_token.cancel()
+
+    def on_monitor_stopped(self):
+        # 监听线程异常退出时同样恢复为未启动状态
+        self.is_active = False
         self.active_btn.setEnabled(True)
         self.active_btn.setText("启动")
         self.add_message_signal.emit("停止成功", 0)
@@ -0,0 +1,127 @@
+import json
+import sys
+import threading
+import time
+import types
+
+sys.modules.setdefault("pyttsx3", types.ModuleType("pyttsx3"))
+fpdf_stub = types.ModuleType("fpdf")
+fpdf_stub.FPDF = object
+sys.modules.setdefault("fpdf", fpdf_stub)
+
+from Scripts import AccountSupervisor as supervisor_module
+from Scripts.AccountSupervisor import AccountSupervisor, load_accounts
+from Scripts.AIAnswerAnalyzer import get_ai_analyzer
+from Scripts.SharedWork import SharedWork
+
+
+def test_load_accounts_merges_per_account_overrides(tmp_path):
+    path = tmp_path / "accounts.json"
+    path.write_text(json.dumps([
+        {"name": "A", "sessionid": "sa", "region": 1},
+        {"sessionid": "sb", "config": {"auto_danmu": True, "danmu_config": {"danmu_limit": 9}}},
+    ]), encoding="utf-8")
+    base = {"sessionid": "", "region": "0", "auto_danmu": False, "danmu_config": {"danmu_limit": 5}}
+
+    accounts = load_accounts(str(path), base)
+
+    assert [account["name"] for account in accounts] == ["A", "账号2"]
+    assert accounts[0]["config"]["region"] == "1"
+    assert accounts[0]["config"]["auto_danmu"] is False
+    assert accounts[1]["config"]["sessionid"] == "sb"
+    assert accounts[1]["config"]["danmu_config"] == {"danmu_limit": 9}
+    assert base["sessionid"] == ""
+
+
+def test_supervisor_runs_one_monitor_per_account_and_stops_all(monkeypatch):
+    started = []
+
+    def fake_monitor(sink, stop_token):
+        started.append(sink.config["sessionid"])
+        stop_token.wait()
+
+    monkeypatch.setattr(supervisor_module, "monitor", fake_monitor)
+    accounts = [
+        {"name": "A", "config": {"sessionid": "sa", "region": "1"}},
+        {"name": "B", "config": {"sessionid": "sb", "region": "1"}},
+    ]
+    supervisor = AccountSupervisor(accounts)
+    supervisor.start()
+    deadline = time.monotonic() + 5
+    while len(started) < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    supervisor.stop()
+    supervisor.wait(5)
+
+    assert sorted(started) == ["sa", "sb"]
+    assert supervisor.alive() == []
+    assert supervisor.sinks["A"].prefix == "[A] "
+
+
+def test_shared_work_has_one_owner_until_finished():
+    work = SharedWork()
+    first, first_owner = work.start("key")
+    second, second_owner = work.start("key")
+
+    assert first_owner and not second_owner
+    assert first is second
+
+    work.finish("key", first, False)
+    assert second.result() is False
+    retry, retry_owner = work.start("key")
+    assert retry_owner
+
+    waiting, waiting_owner = work.start("key")
+    assert not waiting_owner
+    work.finish("key", retry, True)
+    assert waiting.result() is True
+    # 完成后不再保留登记，缓存被删除后可以重新下载
+    assert "key" not in work
+    again, again_owner = work.start("key")
+    assert again_owner and again is not retry
+    assert work.start("key", force=True)[1]
+
+
+def test_ai_analyzer_is_shared_for_same_ai_config_and_coalesces_analysis(tmp_path, monkeypatch):
+    config = {"enable_ai_analysis": False, "openai_model": "model-x"}
+    analyzer = get_ai_analyzer(config)
+    assert get_ai_analyzer(dict(config))._presentation_locks is analyzer._presentation_locks
+    other = get_ai_analyzer({"enable_ai_analysis": False, "openai_model": "model-y"})
+    assert other._presentation_locks is not analyzer._presentation_locks
+
+    monkeypatch.setattr(analyzer, "cache_dir", str(tmp_path))
+    running = []
+    overlaps = []
+
+    def slow_analyze(*args):
+        if running:
+            overlaps.append(True)
+        running.append(True)
+        time.sleep(0.05)
+        running.pop()
+
+    monkeypatch.setattr(analyzer, "_analyze_presentation", slow_analyze)
+    threads = [
+        threading.Thread(target=analyzer.analyze_presentation, args=("课程", "PPT", [], "img"))
+        for _ in range(3)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert overlaps == []
+
+
+def test_shared_ai_analyzer_logs_to_each_callers_callback():
+    config = {"enable_ai_analysis": False, "openai_model": "model-log"}
+    first, second = [], []
+    first_analyzer = get_ai_analyzer(config, lambda message, level: first.append(message))
+    second_analyzer = get_ai_analyzer(config, lambda message, level: second.append(message))
+
+    second_analyzer._log("第二个账号")
+    first_analyzer._log("第一个账号")
+
+    assert first == ["[AI分析器] 第一个账号"]
+    assert second == ["[AI分析器] 第二个账号"]
@@ -0,0 +1,63 @@
+import json
+import sys
+import types
+from datetime import datetime, timedelta
+
+sys.modules.setdefault("pyttsx3", types.ModuleType("pyttsx3"))
+
+from Scripts.AdaptivePoller import AdaptivePoller
+
+
+class FakeClock:
+    def __init__(self, moment):
+        self.moment = moment
+
+    def __call__(self):
+        return self.moment
+
+
+# 2024-01-01是星期一
+MONDAY_0800 = datetime(2024, 1, 1, 8, 0)
+
+
+def make_poller(tmp_path, clock):
+    return AdaptivePoller(history_path=str(tmp_path / "schedule.json"), clock=clock)
+
+
+def test_without_history_keeps_default_interval(tmp_path):
+    poller = make_poller(tmp_path, FakeClock(MONDAY_0800))
+
+    assert poller.next_interval() == poller.base_interval
+
+
+def test_learned_start_is_persisted_and_polled_densely_next_week(tmp_path):
+    clock = FakeClock(MONDAY_0800)
+    poller = make_poller(tmp_path, clock)
+
+    assert poller.observe([{"lessonId": "l1", "classroomId": "c1"}]) is True
+    assert poller.observe([{"lessonId": "l1", "classroomId": "c1"}]) is False
+    saved = json.loads((tmp_path / "schedule.json").read_text(encoding="utf-8"))
+    assert saved["classrooms"] == {"c1": [8 * 60]}
+
+    clock.moment = MONDAY_0800 + timedelta(days=7, minutes=-3)
+    reloaded = make_poller(tmp_path, clock)
+    assert 3 <= reloaded.next_interval() <= 5
+
+
+def test_backs_off_outside_windows_but_not_past_next_start(tmp_path):
+    clock = FakeClock(MONDAY_0800)
+    poller = make_poller(tmp_path, clock)
+    poller.observe([{"lessonId": "l1", "classroomId": "c1"}])
+
+    # 周六凌晨，间隔逐步增大直到上限
+    clock.moment = datetime(2024, 1, 6, 2, 0)
+    intervals = [poller.next_interval() for _ in range(8)]
+    assert intervals[0] < intervals[2] < intervals[4]
+    assert max(intervals) <= poller.max_interval * (1 + poller.jitter)
+
+    # 下一次上课窗口前两分钟，等待时间不会越过窗口
+    clock.moment = MONDAY_0800 + timedelta(days=7, minutes=-7)
+    assert poller.next_interval() <= 120
+
+    # 有课程在监听时保持默认间隔
+    assert poller.next_interval(active=True) == poller.base_interval
@@ -280,3 +280,38 @@ def test_analyze_presentation_reuses_cache_when_problem_signature_matches(monkey
     )
 
     assert answers == {"9": ["cached"]}
+
+
+def test_problem_slides_analyzed_one_by_one_are_not_requested_again(monkeypatch, tmp_path):
+    for index in (3, 7):
+        (tmp_path / f"{index}.jpg").write_bytes(b"image")
+    slides = [
+        {"index": 1, "id": "slide-1"},
+        {"index": 3, "id": "slide-3", "problem": {"problemId": "problem-3"}},
+        {"index": 7, "id": "slide-7", "problem": {"problemId": "problem-7"}},
+    ]
+
+    analyzer = AIAnswerAnalyzer({"enable_ai_analysis": False})
+    analyzer.cache_dir = str(tmp_path / "ai_cache")
+    analyzer.ensure_cache_dir()
+    requested = []
+
+    def fake_analyze(image_path, slide_index):
+        requested.append(slide_index)
+        return [f"answer-{slide_index}"]
+
+    monkeypatch.setattr(analyzer, "analyze_slide_with_openai", fake_analyze)
+    monkeypatch.setattr("Scripts.AIAnswerAnalyzer.time.sleep", lambda *_: None)
+
+    first = analyzer.analyze_problem_slide(
+        "lesson", "title", slides, slides[2], str(tmp_path / "7.jpg")
+    )
+    assert first == {"7": ["answer-7"]}
+    assert analyzer.analyze_problem_slide(
+        "lesson", "title", slides, slides[2], str(tmp_path / "7.jpg")
+    ) == {"7": ["answer-7"]}
+
+    answers = analyzer.analyze_presentation("lesson", "title", slides, str(tmp_path))
+
+    assert answers == {"7": ["answer-7"], "3": ["answer-3"]}
+    assert requested == [7, 3]
@@ -28,7 +28,10 @@ def test_answer_questions_handles_non_object_response(monkeypatch):
         return SimpleNamespace(text='["login expired"]')
 
     monkeypatch.setattr("Scripts.Classes.calculate_waittime", lambda *args: 0)
-    monkeypatch.setattr("Scripts.Classes.requests.post", fake_post)
+    monkeypatch.setattr(
+        "Scripts.ApiClient.requests.Session.post",
+        lambda session, url, **kwargs: fake_post(**kwargs),
+    )
 
     result = lesson.answer_questions("problem-1", 1, [2], 60)
 
@@ -61,7 +64,10 @@ def test_answer_questions_formats_problem_type_4_answer_as_object(monkeypatch):
         return SimpleNamespace(text='{"code":0,"msg":"success"}', status_code=200)
 
     monkeypatch.setattr("Scripts.Classes.calculate_waittime", lambda *args: 0)
-    monkeypatch.setattr("Scripts.Classes.requests.post", fake_post)
+    monkeypatch.setattr(
+        "Scripts.ApiClient.requests.Session.post",
+        lambda session, url, **kwargs: fake_post(**kwargs),
+    )
 
     result = lesson.answer_questions("problem-1", 4, ["0.4"], 60)
 
@@ -94,7 +100,10 @@ def test_answer_questions_formats_problem_type_5_answer_as_content_object(monkey
         return SimpleNamespace(text='{"code":0,"msg":"success"}', status_code=200)
 
     monkeypatch.setattr("Scripts.Classes.calculate_waittime", lambda *args: 0)
-    monkeypatch.setattr("Scripts.Classes.requests.post", fake_post)
+    monkeypatch.setattr(
+        "Scripts.ApiClient.requests.Session.post",
+        lambda session, url, **kwargs: fake_post(**kwargs),
+    )
 
     result = lesson.answer_questions(
         "problem-1",
@@ -0,0 +1,77 @@
+import sys
+import threading
+import time
+import types
+from concurrent.futures import CancelledError
+
+import pytest
+
+sys.modules.setdefault("pyttsx3", types.ModuleType("pyttsx3"))
+fpdf_stub = types.ModuleType("fpdf")
+fpdf_stub.FPDF = object
+sys.modules.setdefault("fpdf", fpdf_stub)
+
+from Scripts import Classes
+from Scripts.AnswerScheduler import AnswerScheduler
+
+
+def test_jobs_fire_in_deadline_order_with_subsecond_accuracy():
+    scheduler = AnswerScheduler(workers=2)
+    fired = []
+    start = time.monotonic()
+
+    jobs = [
+        scheduler.schedule(0.3, lambda name: fired.append((name, time.monotonic())) or name, "late"),
+        scheduler.schedule(0.1, lambda name: fired.append((name, time.monotonic())) or name, "early"),
+    ]
+
+    assert [job.result(5) for job in jobs] == ["late", "early"]
+    assert [name for name, _ in fired] == ["early", "late"]
+    assert 0.1 <= fired[0][1] - start < 0.25
+    assert 0.3 <= fired[1][1] - start < 0.45
+
+
+def test_cancel_owner_only_cancels_that_owners_pending_jobs():
+    scheduler = AnswerScheduler(workers=1)
+    lesson_a, lesson_b = object(), object()
+    fired = []
+
+    job_a = scheduler.schedule(0.2, fired.append, "a", owner=lesson_a)
+    job_b = scheduler.schedule(0.2, fired.append, "b", owner=lesson_b)
+
+    assert scheduler.cancel_owner(lesson_a) == 1
+    job_b.result(5)
+    with pytest.raises(CancelledError):
+        job_a.result(5)
+    assert fired == ["b"]
+    assert scheduler.pending() == 0
+
+
+def test_many_jobs_run_on_bounded_worker_pool():
+    scheduler = AnswerScheduler(workers=2)
+    names = set()
+
+    def record():
+        names.add(threading.current_thread().name)
+        time.sleep(0.01)
+
+    jobs = [scheduler.schedule(0, record) for _ in range(20)]
+    for job in jobs:
+        job.result(5)
+
+    assert 1 <= len(names) <= 2
+    assert all(name.startswith("AnswerWorker") for name in names)
+
+
+def test_lesson_stop_cancels_its_pending_answers(monkeypatch):
+    scheduler = AnswerScheduler(workers=1)
+    monkeypatch.setattr(Classes, "get_answer_scheduler", lambda: scheduler)
+    lesson = object.__new__(Classes.Lesson)
+    lesson.lessonname = "lesson"
+    lesson.add_message = lambda *args: None
+    job = scheduler.schedule(5, lambda: None, owner=lesson)
+
+    lesson.stop()
+
+    assert job.cancelled
+    assert lesson.stop_token.cancelled
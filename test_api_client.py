@@ -0,0 +1,58 @@
+import json
+import sys
+import types
+from types import SimpleNamespace
+
+sys.modules.setdefault("pyttsx3", types.ModuleType("pyttsx3"))
+
+from Scripts import ApiClient
+from Scripts.ApiClient import YuketangClient, get_api_client, session_headers
+
+
+def test_get_api_client_shares_one_client_per_host():
+    assert get_api_client("1") is get_api_client(1)
+    assert get_api_client("1") is not get_api_client("0")
+    assert get_api_client("1").host == "pro.yuketang.cn"
+
+
+def test_client_ignores_system_proxy_and_sets_timeout(monkeypatch):
+    client = YuketangClient("pro.yuketang.cn")
+    calls = []
+
+    def fake_get(url, **kwargs):
+        calls.append((url, kwargs))
+        return SimpleNamespace(text=json.dumps({"code": 0, "data": {"title": "ppt"}}))
+
+    monkeypatch.setattr(client.session, "get", fake_get)
+
+    data = client.fetch_presentation("pres-1", {"Cookie": "sessionid=abc"})
+
+    assert client.session.trust_env is False
+    assert data == {"title": "ppt"}
+    url, kwargs = calls[0]
+    assert url == "https://pro.yuketang.cn/api/v3/lesson/presentation/fetch?presentation_id=pres-1"
+    assert kwargs["timeout"] == client.timeout
+    assert kwargs["headers"] == {"Cookie": "sessionid=abc"}
+
+
+def test_post_requests_are_not_retried_after_being_sent():
+    client = YuketangClient("pro.yuketang.cn")
+    retry = client.session.get_adapter("https://pro.yuketang.cn").max_retries
+
+    assert retry.is_retry("GET", 503)
+    assert not retry.is_retry("POST", 503)
+
+
+def test_get_user_info_uses_session_headers(monkeypatch):
+    client = YuketangClient("pro.yuketang.cn")
+    seen = {}
+
+    def fake_get(url, **kwargs):
+        seen.update(kwargs)
+        return SimpleNamespace(text=json.dumps({"code": 0, "data": {"id": 1, "name": "n"}}))
+
+    monkeypatch.setattr(client.session, "get", fake_get)
+
+    assert client.get_user_info("abc") == (0, {"id": 1, "name": "n"})
+    assert seen["headers"] == session_headers("abc")
+    assert ApiClient.USER_AGENT in seen["headers"]["User-Agent"]
@@ -0,0 +1,147 @@
+import asyncio
+import io
+import json
+import os
+import threading
+
+import pytest
+from PIL import Image
+
+from Scripts.AsyncDownloader import AsyncImageDownloader
+from Scripts.BlobStore import BlobStore
+from Scripts import SlideManifest as manifest_module
+from Scripts.SlideManifest import get_slide_manifest
+
+
+def jpeg_bytes(color):
+    buffer = io.BytesIO()
+    Image.new("RGB", (8, 8), color).save(buffer, "JPEG")
+    return buffer.getvalue()
+
+
+class FakeContent:
+    def __init__(self, content):
+        self._content = content
+
+    async def iter_chunked(self, size):
+        for start in range(0, len(self._content), size):
+            yield self._content[start:start + size]
+
+
+class FakeResponse:
+    def __init__(self, content):
+        self.status = 200
+        self.headers = {"content-type": "image/jpeg"}
+        self.content = FakeContent(content)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class FakeSession:
+    def __init__(self, covers):
+        self.covers = covers
+        self.requested = []
+
+    def get(self, url, timeout=None):
+        self.requested.append(url)
+        return FakeResponse(self.covers[url])
+
+
+def download(downloader, session, slides, img_path):
+    async def run():
+        return await asyncio.gather(*[
+            downloader.download_image(session, slide, img_path) for slide in slides
+        ])
+
+    return asyncio.run(run())
+
+
+def test_reused_deck_is_linked_from_store_without_network(tmp_path, monkeypatch):
+    covers = {
+        "https://cdn.example.com/a.jpg": jpeg_bytes((255, 0, 0)),
+        "https://cdn.example.com/b.jpg": jpeg_bytes((0, 0, 255)),
+    }
+    slides = [
+        {"index": 1, "cover": "https://cdn.example.com/a.jpg"},
+        {"index": 2, "cover": "https://cdn.example.com/b.jpg"},
+    ]
+    store = BlobStore(str(tmp_path / "blobs"))
+    downloader = AsyncImageDownloader(max_concurrent=2, max_retries=1, blob_store=store)
+    session = FakeSession(covers)
+
+    first_dir = tmp_path / "一班" / "第一章"
+    second_dir = tmp_path / "二班" / "第一章（改名）"
+    first_dir.mkdir(parents=True)
+    second_dir.mkdir(parents=True)
+
+    first = download(downloader, session, slides, str(first_dir))
+    assert all(result["success"] for result in first)
+    assert len(session.requested) == 2
+    store.save()
+
+    reopened = BlobStore(str(tmp_path / "blobs"))
+    # 存储中的图片以内容哈希命名，链接后记录清单不需要重新计算哈希
+    monkeypatch.setattr(manifest_module, "file_sha256", lambda path: pytest.fail("不应重新计算哈希"))
+    second = download(
+        AsyncImageDownloader(max_concurrent=2, max_retries=1, blob_store=reopened),
+        session,
+        slides,
+        str(second_dir),
+    )
+    assert all(result.get("reused") for result in second)
+    assert len(session.requested) == 2
+    for index in (1, 2):
+        assert os.path.samefile(first_dir / f"{index}.jpg", second_dir / f"{index}.jpg")
+    assert get_slide_manifest(str(second_dir)).is_valid("1.jpg")
+
+
+def test_identical_content_under_new_url_shares_one_blob(tmp_path):
+    content = jpeg_bytes((0, 255, 0))
+    store = BlobStore(str(tmp_path / "blobs"))
+    first = tmp_path / "1.jpg"
+    second = tmp_path / "2.jpg"
+    first.write_bytes(content)
+    second.write_bytes(content)
+
+    digest = store.put(str(first), "https://cdn.example.com/old.jpg")
+    assert store.put(str(second), "https://cdn.example.com/new.jpg") == digest
+
+    assert os.path.samefile(first, second)
+    assert store.lookup("https://cdn.example.com/new.jpg") == store.blob_path(digest)
+
+
+def test_missing_blob_falls_back_to_download(tmp_path):
+    store = BlobStore(str(tmp_path / "blobs"))
+    image = tmp_path / "1.jpg"
+    image.write_bytes(jpeg_bytes((1, 2, 3)))
+    digest = store.put(str(image), "https://cdn.example.com/x.jpg")
+
+    os.remove(store.blob_path(digest))
+
+    assert store.lookup("https://cdn.example.com/x.jpg") is None
+    assert store.materialize("https://cdn.example.com/x.jpg", str(tmp_path / "2.jpg")) is None
+
+
+def test_concurrent_saves_keep_every_url(tmp_path, capsys):
+    store = BlobStore(str(tmp_path / "blobs"))
+
+    def put(start):
+        for i in range(start, start + 20):
+            path = tmp_path / f"{i}.jpg"
+            path.write_bytes(jpeg_bytes((i, 0, 0)))
+            store.put(str(path), f"https://cdn/{i}.jpg")
+            store.save()
+
+    threads = [threading.Thread(target=put, args=(n * 20,)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert "保存图片存储索引失败" not in capsys.readouterr().out
+    saved = json.loads((tmp_path / "blobs" / "url_index.json").read_text(encoding="utf-8"))
+    assert len(saved) == 80
@@ -0,0 +1,105 @@
+import asyncio
+import sys
+import threading
+import time
+import types
+
+sys.modules.setdefault("pyttsx3", types.ModuleType("pyttsx3"))
+fpdf_stub = types.ModuleType("fpdf")
+fpdf_stub.FPDF = object
+sys.modules.setdefault("fpdf", fpdf_stub)
+
+from Scripts import Monitor
+from Scripts.Cancellation import CancellationToken
+
+
+def test_cancel_wakes_waiters_and_runs_callbacks_once():
+    token = CancellationToken()
+    calls = []
+    token.add_callback(lambda: calls.append("stop"))
+
+    threading.Timer(0.05, token.cancel).start()
+    start = time.monotonic()
+    assert token.wait(5) is True
+    token.cancel()
+
+    assert time.monotonic() - start < 1
+    assert calls == ["stop"]
+
+
+def test_child_is_cancelled_with_parent_but_not_the_other_way():
+    parent = CancellationToken()
+    first, second = parent.child(), parent.child()
+
+    first.cancel()
+    assert not parent.cancelled
+    assert not second.cancelled
+
+    parent.cancel()
+    assert second.cancelled
+
+
+def test_sleep_and_run_return_as_soon_as_token_is_cancelled():
+    token = CancellationToken()
+
+    async def scenario():
+        threading.Timer(0.05, token.cancel).start()
+        start = time.monotonic()
+        assert await token.sleep(10) is True
+        try:
+            await token.run(asyncio.sleep(10))
+        except asyncio.CancelledError:
+            return time.monotonic() - start
+        raise AssertionError("run was not cancelled")
+
+    assert asyncio.run(scenario()) < 1
+
+
+def test_monitor_returns_immediately_when_stopped(monkeypatch):
+    main_ui = types.SimpleNamespace(
+        config={"sessionid": "s", "region": "1"},
+        add_message_signal=types.SimpleNamespace(emit=lambda *args: None),
+    )
+    monkeypatch.setattr(Monitor, "get_on_lesson", lambda *args: [])
+    token = CancellationToken()
+    thread = threading.Thread(target=Monitor.monitor, args=(main_ui, token))
+    thread.start()
+
+    time.sleep(0.05)
+    start = time.monotonic()
+    token.cancel()
+    thread.join(5)
+
+    assert not thread.is_alive()
+    assert time.monotonic() - start < 1
+
+
+def test_lesson_ending_normally_detaches_from_monitor_token(monkeypatch):
+    from Scripts import Classes
+
+    class FakeRuntime:
+        async def run_handler(self, handler, *args):
+            return handler(*args)
+
+        async def run_websocket(self, **kwargs):
+            return None
+
+    monkeypatch.setattr(Classes, "get_lesson_runtime", lambda: FakeRuntime())
+    parent = CancellationToken()
+    lesson = object.__new__(Classes.Lesson)
+    lesson.lessonid = "lesson-1"
+    lesson.lessonname = "课程"
+    lesson.headers = {}
+    lesson.config = {"region": "1", "sign_config": {"delay_time": {"custom": {"cutoff": 0}}}}
+    lesson.add_message = lambda *args: None
+    lesson.del_course = lambda index: None
+    lesson._prepare_lesson = lambda: (None, 0)
+    lesson._bind_stop_token(parent.child())
+    finished = []
+
+    asyncio.run(lesson.run_lesson(0, finished.append))
+
+    assert finished == [lesson]
+    assert lesson.stop_token.cancelled
+    assert not parent.cancelled
+    assert parent._callbacks == []
@@ -2,7 +2,6 @@ import asyncio
 import json
 import os
 import sys
-import threading
 import types
 
 import pytest
@@ -81,6 +80,9 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), "Scripts"))
 from Scripts import Classes
 from Scripts.AsyncDownloader import AsyncImageDownloader, AsyncPPTDownloadManager
 from Scripts.PPTManager import PPTManager
+from Scripts.BlobStore import BlobStore
+from Scripts.SharedWork import SharedWork
+from Scripts.SlideManifest import SlideManifest
 
 
 class DummyWebSocket:
@@ -110,7 +112,7 @@ class FakeAsyncDownloadManager:
         }
         self.refresh_callbacks = []
 
-    async def download_presentation(self, data, lessonname):
+    async def download_presentation(self, data, lessonname, on_slide_ready=None):
         return self.result
 
     def set_data_refresh_callback(self, presentation_id, callback):
@@ -122,8 +124,6 @@ def make_lesson():
     lesson.lessonname = "测试课程"
     lesson.config = {"enable_ai_analysis": False, "auto_danmu": False, "auto_answer": False}
     lesson.add_message = lambda *args, **kwargs: None
-    lesson.problems_ls = []
-    lesson.problems_dict = {}
     lesson.unlocked_problem = []
     lesson.downloaded_presentations = set()
     lesson.get_problems = lambda presentation_id: []
@@ -231,7 +231,7 @@ def test_download_ppt_registers_refresh_callback_for_async_downloader(monkeypatc
     assert lesson.async_download_manager.refresh_callbacks
     presentation_id, callback = lesson.async_download_manager.refresh_callbacks[0]
     assert presentation_id == "presentation-123"
-    assert callback == lesson._get_ppt
+    assert callback == lesson._refresh_ppt
 
 
 def test_download_with_retry_counts_preexisting_valid_images_as_success(monkeypatch, tmp_path):
@@ -255,45 +255,57 @@ def test_download_with_retry_counts_preexisting_valid_images_as_success(monkeypa
     assert result["failed"] == 0
 
 
-def test_download_slides_does_not_require_loguru(monkeypatch, tmp_path):
+def test_download_slides_fetches_unlocked_problem_first_and_hands_off_each_slide(tmp_path):
+    lesson = make_lesson()
+    lesson.unlocked_problem = ["problem-4"]
     downloader = AsyncImageDownloader(max_concurrent=1, max_retries=1)
-    monkeypatch.delitem(sys.modules, "loguru", raising=False)
-    monkeypatch.setattr(downloader, "_is_valid_image", lambda path: False)
+    downloader.priority_callback = lesson._slide_priority
+    downloaded = []
+    ready = []
 
     async def fake_download_image(session, slide, img_path):
-        return {"success": False, "slide": slide, "error": "simulated failure"}
+        downloaded.append(slide["index"])
+        return {"success": True, "slide": slide, "path": os.path.join(img_path, f"{slide['index']}.jpg")}
 
     downloader.download_image = fake_download_image
+    slides = [
+        {"index": 1, "cover": "https://example.com/1.jpg"},
+        {"index": 2, "cover": "https://example.com/2.jpg", "problem": {"problemId": "problem-2"}},
+        {"index": 3, "cover": "https://example.com/3.jpg"},
+        {"index": 4, "cover": "https://example.com/4.jpg", "problem": {"problemId": "problem-4"}},
+    ]
 
     result = asyncio.run(
         downloader.download_slides(
-            [{"index": 1, "cover": "https://example.com/1.jpg"}],
+            slides,
             str(tmp_path),
+            on_slide_ready=lambda slide, path: ready.append((slide["index"], os.path.basename(path))),
         )
     )
 
-    assert result["failed"] == 1
+    assert result["successful"] == 4
+    assert downloaded == [4, 2, 1, 3]
+    assert ready == [(4, "4.jpg"), (2, "2.jpg"), (1, "1.jpg"), (3, "3.jpg")]
 
 
-def test_async_image_downloader_uses_event_loop_local_semaphores():
-    downloader = AsyncImageDownloader(max_concurrent=2)
+def test_download_slides_does_not_require_loguru(monkeypatch, tmp_path):
+    downloader = AsyncImageDownloader(max_concurrent=1, max_retries=1)
+    monkeypatch.delitem(sys.modules, "loguru", raising=False)
+    monkeypatch.setattr(downloader, "_is_valid_image", lambda path: False)
 
-    async def get_semaphore():
-        return downloader.semaphore
+    async def fake_download_image(session, slide, img_path):
+        return {"success": False, "slide": slide, "error": "simulated failure"}
 
-    first_loop = asyncio.new_event_loop()
-    try:
-        first = first_loop.run_until_complete(get_semaphore())
-    finally:
-        first_loop.close()
+    downloader.download_image = fake_download_image
 
-    second_loop = asyncio.new_event_loop()
-    try:
-        second = second_loop.run_until_complete(get_semaphore())
-    finally:
-        second_loop.close()
+    result = asyncio.run(
+        downloader.download_slides(
+            [{"index": 1, "cover": "https://example.com/1.jpg"}],
+            str(tmp_path),
+        )
+    )
 
-    assert first is not second
+    assert result["failed"] == 1
 
 
 def test_ppt_manager_start_does_not_generate_pdf_when_images_are_missing(monkeypatch):
@@ -338,44 +350,55 @@ def test_presentationupdated_forces_redownload_even_if_already_downloaded():
     assert calls == [("pres-1", True)]
 
 
-def test_force_refresh_clears_cached_images_before_downloading(monkeypatch, tmp_path):
+def test_force_refresh_only_drops_changed_slides_before_downloading(monkeypatch, tmp_path):
     lesson = make_lesson()
     lesson._executor = ImmediateExecutor()
     lesson._async_download_manager = FakeAsyncDownloadManager(
         {
-            "total": 1,
-            "successful": 1,
+            "total": 2,
+            "successful": 2,
             "failed": 0,
-            "success_list": [{"slide": {"index": 1}}],
+            "success_list": [{"slide": {"index": 1}}, {"slide": {"index": 2}}],
             "failed_list": [],
         }
     )
     lesson._get_ppt = lambda presentation_id: {
         "title": "更新后的章节",
-        "slides": [{"index": 1, "cover": "https://example.com/1.jpg"}],
+        "slides": [
+            {"index": 1, "id": "s1", "cover": "https://example.com/1.jpg"},
+            {"index": 2, "id": "s2", "cover": "https://example.com/2-fixed.jpg"},
+        ],
         "width": 800,
         "height": 600,
     }
 
-    cache_root = tmp_path / "downloads"
-    cache_dir = cache_root / "rainclasscache" / "测试课程" / "更新后的章节"
+    cache_dir = tmp_path / "downloads" / "rainclasscache" / "测试课程" / "更新后的章节"
     cache_dir.mkdir(parents=True)
-    cached_file = cache_dir / "1.jpg"
-    cached_file.write_bytes(b"old image")
+    for index in (1, 2, 3):
+        (cache_dir / f"{index}.jpg").write_bytes(b"old image")
+    manifest = SlideManifest(str(cache_dir))
+    manifest.record("1.jpg", "https://example.com/1.jpg", slide_id="s1")
+    manifest.record("2.jpg", "https://example.com/2.jpg", slide_id="s2")
+    manifest.record("3.jpg", "https://example.com/3.jpg", slide_id="s3")
+    manifest.save()
 
-    deleted = []
+    refreshed = []
 
     class FakePPTManager:
         def __init__(self, data, lessonname):
-            self.data = data
-            self.lessonname = lessonname
+            self.slides = data["slides"]
             self.imgpath = str(cache_dir)
 
         def delete_cache(self):
-            deleted.append("delete_cache")
-            for entry in cache_dir.iterdir():
-                if entry.is_file():
-                    entry.unlink()
+            raise AssertionError("presentation updates must not wipe the whole cache")
+
+        def refresh_cache(self):
+            diff = PPTManager.refresh_cache(self)
+            refreshed.append(diff)
+            return diff
+
+        def restore_problem_slides(self, slides=None):
+            return PPTManager.restore_problem_slides(self, slides)
 
         def get_missing_images(self):
             return []
@@ -384,11 +407,90 @@ def test_force_refresh_clears_cached_images_before_downloading(monkeypatch, tmp_
             return "更新后的章节.pdf"
 
     monkeypatch.setattr(Classes, "PPTManager", FakePPTManager)
+    monkeypatch.setattr("Scripts.PPTManager.get_blob_store", lambda: BlobStore(str(tmp_path / "blobs")))
     monkeypatch.chdir(tmp_path)
     lesson.download_ppt("pres-1", force_refresh=True)
 
-    assert deleted == ["delete_cache"]
-    assert not cached_file.exists()
+    assert [slide["index"] for slide in refreshed[0]["unchanged"]] == [1]
+    assert [slide["index"] for slide in refreshed[0]["changed"]] == [2]
+    assert refreshed[0]["removed"] == ["3.jpg"]
+    assert (cache_dir / "1.jpg").exists()
+    assert not (cache_dir / "2.jpg").exists()
+    assert not (cache_dir / "3.jpg").exists()
+
+
+def test_ppt_manager_creates_downloaders_only_when_downloading(monkeypatch, tmp_path):
+    created = []
+    monkeypatch.setattr("Scripts.PPTManager.AsyncImageDownloader", lambda: created.append("image") or "image")
+    monkeypatch.setattr(
+        "Scripts.PPTManager.AsyncPPTDownloadManager",
+        lambda **kwargs: created.append("ppt") or "ppt",
+    )
+    monkeypatch.chdir(tmp_path)
+
+    manager = PPTManager({"title": "章节", "slides": [], "width": 1, "height": 1}, "课程")
+    assert created == []
+
+    assert manager.async_ppt_manager == "ppt"
+    assert manager.async_ppt_manager == "ppt"
+    assert created == ["ppt"]
+    assert manager.async_downloader == "image"
+    assert created == ["ppt", "image"]
+
+
+def test_deck_hash_uses_manifest_digests_and_answers(monkeypatch, tmp_path):
+    from Scripts import SlideManifest as manifest_module
+
+    manager = object.__new__(PPTManager)
+    manager.imgpath = str(tmp_path)
+    manager.slides = [
+        {"index": 1, "cover": "https://cdn/1.jpg"},
+        {"index": 2, "cover": "https://cdn/2.jpg", "problem": {"answers": ["A"]}},
+    ]
+    manifest = SlideManifest(str(tmp_path))
+    for index in (1, 2):
+        (tmp_path / f"{index}.jpg").write_bytes(b"jpeg-%d" % index)
+        manifest.record(f"{index}.jpg", f"https://cdn/{index}.jpg", sha256=str(index) * 64)
+    monkeypatch.setattr(manifest_module, "get_slide_manifest", lambda path: manifest)
+    monkeypatch.setattr("Scripts.PPTManager.get_slide_manifest", lambda path: manifest)
+    monkeypatch.setattr(manifest_module, "file_sha256", lambda path: pytest.fail("不应读取图片"))
+
+    first = PPTManager.get_deck_hash(manager)
+    assert PPTManager.get_deck_hash(manager) == first
+
+    manager.slides[1]["problem"]["answers"] = ["B"]
+    assert PPTManager.get_deck_hash(manager) != first
+
+
+def test_restore_problem_slides_replaces_only_annotated_images(monkeypatch, tmp_path):
+    from Scripts import SlideManifest as manifest_module
+
+    store = BlobStore(str(tmp_path / "blobs"))
+    img_dir = tmp_path / "deck"
+    img_dir.mkdir()
+    manifest = SlideManifest(str(img_dir))
+    monkeypatch.setattr("Scripts.PPTManager.get_slide_manifest", lambda path: manifest)
+    for index in (1, 2):
+        (img_dir / f"{index}.jpg").write_bytes(b"raw slide %d" % index)
+        digest = store.put(str(img_dir / f"{index}.jpg"), f"https://cdn/{index}.jpg")
+        manifest.record(f"{index}.jpg", f"https://cdn/{index}.jpg", digest)
+    # 旧版本把答案画进了第2页
+    os.remove(img_dir / "2.jpg")
+    (img_dir / "2.jpg").write_bytes(b"annotated slide 2")
+
+    manager = object.__new__(PPTManager)
+    manager.imgpath = str(img_dir)
+    monkeypatch.setattr("Scripts.PPTManager.get_blob_store", lambda: store)
+    manager.slides = [
+        {"index": 1, "cover": "https://cdn/1.jpg", "problem": {"answers": ["A"]}},
+        {"index": 2, "cover": "https://cdn/2.jpg", "problem": {"answers": ["B"]}},
+    ]
+
+    assert PPTManager.restore_problem_slides(manager) == ["2.jpg"]
+    assert (img_dir / "2.jpg").read_bytes() == b"raw slide 2"
+
+    monkeypatch.setattr(manifest_module, "file_sha256", lambda path: pytest.fail("不应读取图片"))
+    assert PPTManager.restore_problem_slides(manager) == []
 
 
 def test_ai_analysis_prefers_timeline_problem_page_over_fetch_index(monkeypatch, tmp_path):
@@ -435,6 +537,27 @@ def test_ai_analysis_prefers_timeline_problem_page_over_fetch_index(monkeypatch,
     assert analyzed == [(9, True)]
 
 
+def test_problem_slides_are_analyzed_one_after_another_by_one_ai_worker():
+    lesson = make_lesson()
+    lesson.config["enable_ai_analysis"] = True
+    submitted = []
+    lesson._ai_executor = types.SimpleNamespace(submit=submitted.append)
+    analyzed = []
+    lesson._analyze_problem_slide = lambda title, slides, slide, path: analyzed.append(slide["index"])
+    slides = [{"index": i, "problem": {"answers": []}} for i in (1, 2, 3)] + [{"index": 4}]
+    on_slide_ready = lesson._ai_slide_handler({"title": "测试章节", "slides": slides})
+
+    for slide in slides:
+        on_slide_ready(slide, f"{slide['index']}.jpg")
+    # 多个题目页只占用一个AI分析线程，不占用后台任务线程池
+    assert len(submitted) == 1
+    submitted.pop()()
+    assert analyzed == [1, 2, 3]
+
+    on_slide_ready(slides[0], "1.jpg")
+    assert len(submitted) == 1
+
+
 def test_get_problems_uses_timeline_problem_id_display_index():
     lesson = make_lesson()
     del lesson.get_problems
@@ -518,7 +641,7 @@ def test_async_download_uses_timeline_problem_page_for_pdf_generation(monkeypatc
             generated_slide_indexes.extend(slide["index"] for slide in self.slides)
             return "测试章节.pdf"
 
-    async def fake_download_presentation(data, lessonname):
+    async def fake_download_presentation(data, lessonname, on_slide_ready=None):
         downloaded_slide_indexes.extend(slide["index"] for slide in data["slides"])
         return {
             "total": len(data["slides"]),
@@ -562,28 +685,21 @@ def test_start_answer_matches_problem_by_slide_identifier(monkeypatch):
             "custom": {"percent": 50},
         }
     }
-    lesson.problems_ls = [
-        {
-            "problemId": "problem-1",
-            "slideId": "slide-1",
-            "problemType": 1,
-            "answers": [2],
-            "result": None,
-        }
-    ]
+    lesson.problem_store.replace_presentation(
+        "pres-1",
+        [
+            {
+                "problemId": "problem-1",
+                "slideId": "slide-1",
+                "problemType": 1,
+                "answers": [2],
+                "result": None,
+            }
+        ],
+    )
 
     calls = []
-    lesson.answer_questions = lambda *args: calls.append(args)
-
-    class ImmediateThread:
-        def __init__(self, target, args=()):
-            self.target = target
-            self.args = args
-
-        def start(self):
-            self.target(*self.args)
-
-    monkeypatch.setattr(threading, "Thread", ImmediateThread)
+    lesson.schedule_answer = lambda *args: calls.append(args)
 
     lesson.start_answer("slide-1", 60)
 
@@ -612,3 +728,94 @@ def test_get_problems_carries_slide_identifiers_for_unlockproblem_lookup():
 
     assert problems[0]["slideId"] == "slide-1"
     assert problems[0]["slideIds"] == ["slide-1", "slide-alt-1"]
+
+
+def test_answer_questions_uses_indexed_ai_answer_without_refetching(monkeypatch, tmp_path):
+    lesson = make_lesson()
+    lesson.config["enable_ai_analysis"] = True
+    cache_file = tmp_path / "answers.json"
+    cache_file.write_text("{}", encoding="utf-8")
+    reloads = []
+
+    class FakeAnalyzer:
+        def get_cache_file_path(self, lesson_name, presentation_title):
+            return str(cache_file)
+
+        def load_cached_answers(self, lesson_name, presentation_title):
+            reloads.append(presentation_title)
+            return {"9": ["B"]}
+
+    monkeypatch.setattr(Classes.Lesson, "ai_analyzer", FakeAnalyzer())
+    lesson.problem_store.replace_presentation(
+        "pres-1",
+        [{"problemId": "problem-1", "slideId": "slide-1", "index": 9}],
+    )
+    lesson._index_ai_answers(
+        "测试章节",
+        [{"index": 9, "id": "slide-1", "problem": {"problemId": "problem-1"}}],
+        {"9": ["A"]},
+    )
+
+    def fail_get_ppt(presentation_id):
+        raise AssertionError("should not refetch presentation")
+
+    lesson._get_ppt = fail_get_ppt
+    lesson.headers = {}
+    lesson.config["answer_config"] = {"answer_delay": {"type": 1, "custom": {"percent": 50}}}
+    monkeypatch.setattr(Classes, "calculate_waittime", lambda *args: 0)
+    submitted = []
+    monkeypatch.setattr(
+        Classes.Lesson,
+        "api",
+        types.SimpleNamespace(
+            answer_problem=lambda data, headers: submitted.append(data)
+            or types.SimpleNamespace(text=json.dumps({"code": 0}))
+        ),
+    )
+
+    assert lesson.answer_questions("slide-1", 1, [], 60) is True
+    assert submitted[0]["problemId"] == "slide-1"
+    assert reloads == []
+
+    # 人工修改缓存文件后重新读取
+    os.utime(cache_file, (0, 0))
+    assert lesson._lookup_ai_answer("problem-1")[0] == ["B"]
+    assert reloads == ["测试章节"]
+
+
+def test_second_account_reuses_download_of_same_lesson(monkeypatch):
+    shared = SharedWork()
+    monkeypatch.setattr(Classes, "get_shared_downloads", lambda: shared)
+    downloads = []
+    reused = []
+
+    def make_account_lesson():
+        lesson = make_lesson()
+        lesson.lessonid = "lesson-1"
+        lesson.config["region"] = "1"
+
+        async def fake_async_download(data, presentation_id=None, force_refresh=False):
+            downloads.append(presentation_id)
+            return True
+
+        lesson._async_download = fake_async_download
+        lesson._use_shared_download = lambda presentation_id, success: reused.append(
+            (presentation_id, success)
+        )
+        return lesson
+
+    # 第一个账号的下载放入队列，第二个账号在下载进行中加入
+    pending = []
+    first = make_account_lesson()
+    first._executor = types.SimpleNamespace(submit=pending.append)
+    first.download_ppt("pres-1")
+    make_account_lesson().download_ppt("pres-1")
+    assert downloads == []
+    pending.pop()()
+
+    assert downloads == ["pres-1"]
+    assert reused == [("pres-1", True)]
+
+    # 下载完成后不保留登记，之后加入的账号自行检查缓存
+    make_account_lesson().download_ppt("pres-1")
+    assert downloads == ["pres-1", "pres-1"]
@@ -0,0 +1,73 @@
+import asyncio
+import threading
+
+from Scripts.DownloadLoop import DownloadLoop, download_session
+
+
+def test_submissions_share_one_loop_thread_and_session():
+    download_loop = DownloadLoop()
+    try:
+        async def probe():
+            session = await download_loop.get_session()
+            return threading.current_thread().name, asyncio.get_running_loop(), session
+
+        first = download_loop.run(probe(), timeout=5)
+        second = download_loop.run(probe(), timeout=5)
+
+        assert first[0] == "DownloadLoop"
+        assert first[1] is second[1]
+        assert first[2] is second[2]
+        assert not first[2].closed
+    finally:
+        download_loop.close()
+
+    assert first[2].closed
+
+
+def test_run_refuses_to_block_inside_the_loop():
+    download_loop = DownloadLoop()
+    try:
+        async def nested():
+            async def inner():
+                return 1
+
+            try:
+                download_loop.run(inner())
+            except RuntimeError:
+                return "refused"
+            return "blocked"
+
+        assert download_loop.run(nested(), timeout=5) == "refused"
+    finally:
+        download_loop.close()
+
+
+def test_download_session_outside_shared_loop_is_temporary():
+    async def use_session():
+        async with download_session(limit=2, timeout=5) as session:
+            assert not session.closed
+        return session
+
+    session = asyncio.run(use_session())
+    assert session.closed
+
+
+def test_task_executor_is_shared_and_recreated_after_shutdown():
+    from Scripts import DownloadLoop as loop_module
+
+    executor = loop_module.get_task_executor()
+    assert loop_module.get_task_executor() is executor
+    assert executor.submit(lambda: threading.current_thread().name).result(5).startswith("DownloadTask")
+    ai_executor = loop_module.get_ai_executor()
+    assert ai_executor is not executor
+    assert ai_executor.submit(lambda: threading.current_thread().name).result(5).startswith("AIAnalysis")
+
+    shared_loop = loop_module.get_download_loop()
+    session = shared_loop.run(shared_loop.get_session(), timeout=5)
+    loop_module.shutdown_download_loop(wait=True)
+
+    assert session.closed
+    assert loop_module.get_download_loop() is not shared_loop
+    assert loop_module.get_task_executor() is not executor
+    assert loop_module.get_ai_executor() is not ai_executor
+    loop_module.shutdown_download_loop(wait=True)
@@ -0,0 +1,54 @@
+import sys
+import types
+from unittest.mock import Mock
+
+import pytest
+
+sys.modules.setdefault("pyttsx3", types.ModuleType("pyttsx3"))
+fpdf_stub = types.ModuleType("fpdf")
+fpdf_stub.FPDF = object
+sys.modules.setdefault("fpdf", fpdf_stub)
+
+from Scripts.Classes import Lesson
+from Scripts.EventSink import ConsoleEventSink, EventSink, QtEventSink, as_event_sink
+
+
+def make_config():
+    return {"sessionid": "s", "region": "1"}
+
+
+def test_lesson_runs_against_console_sink_without_qt():
+    sink = ConsoleEventSink(make_config())
+
+    lesson = Lesson("l1", "课程", "c1", sink, user_info=(0, {"id": 1, "name": "n"}))
+    index = sink.next_course_index()
+    lesson.add_course(["课程", "标题", "老师", "08:00"], index)
+    lesson.del_course(index)
+
+    assert lesson.event_sink is sink
+    assert lesson.config is sink.config
+    assert sink.next_course_index() == index + 1
+    assert sink.courses == {}
+
+
+def test_main_ui_is_wrapped_and_signals_are_forwarded():
+    main_ui = Mock()
+    main_ui.config = make_config()
+    main_ui.tableWidget.rowCount.return_value = 3
+
+    sink = as_event_sink(main_ui)
+    sink.add_message("hello", 4)
+
+    assert isinstance(sink, QtEventSink)
+    assert sink.next_course_index() == 3
+    main_ui.add_message_signal.emit.assert_called_once_with("hello", 4)
+    assert as_event_sink(sink) is sink
+
+
+def test_incomplete_sink_fails_at_construction():
+    class MessageOnlySink(EventSink):
+        def add_message(self, message, type=0):
+            pass
+
+    with pytest.raises(TypeError):
+        MessageOnlySink()
@@ -0,0 +1,75 @@
+import asyncio
+
+from Scripts import HostLimiter as host_limiter_module
+from Scripts.HostLimiter import HostLimiter, get_host_limiter
+
+
+def test_limit_grows_while_healthy_and_halves_on_throttling(monkeypatch):
+    limiter = HostLimiter("cdn.example.com", initial=4, maximum=6)
+
+    for _ in range(4):
+        limiter.record_success(0.05)
+    assert limiter.limit == 5
+    for _ in range(20):
+        limiter.record_success(0.05)
+    assert limiter.limit == 6
+
+    clock = [100.0]
+    monkeypatch.setattr(host_limiter_module.time, "monotonic", lambda: clock[0])
+    limiter.record_failure()
+    limiter.record_failure()
+    assert limiter.limit == 3
+    clock[0] += 2
+    limiter.record_failure()
+    assert limiter.limit == 1
+
+
+def test_slow_responses_do_not_raise_the_limit():
+    limiter = HostLimiter("cdn.example.com", initial=2)
+    limiter.record_success(0.1)
+    for _ in range(10):
+        limiter.record_success(2.0)
+
+    assert limiter.limit == 2
+
+
+def test_in_flight_requests_never_exceed_the_current_limit():
+    limiter = HostLimiter("cdn.example.com", initial=3)
+    peak = 0
+
+    async def request():
+        nonlocal peak
+        async with limiter.slot():
+            peak = max(peak, limiter.in_flight)
+            await asyncio.sleep(0.01)
+
+    async def run():
+        await asyncio.gather(*[request() for _ in range(12)])
+
+    asyncio.run(run())
+
+    assert peak == 3
+    assert limiter.in_flight == 0
+
+
+def test_cancelled_waiter_gives_its_slot_back():
+    limiter = HostLimiter("cdn.example.com", initial=1)
+
+    async def run():
+        await limiter.acquire()
+        waiter = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        limiter.release()
+        await asyncio.sleep(0)
+        await asyncio.wait_for(limiter.acquire(), 1)
+        limiter.release()
+
+    asyncio.run(run())
+    assert limiter.in_flight == 0
+
+
+def test_limiters_are_shared_per_host():
+    first = get_host_limiter("https://CDN.example.com/a.jpg")
+    assert get_host_limiter("https://cdn.example.com/b.jpg") is first
+    assert get_host_limiter("https://other.example.com/a.jpg") is not first
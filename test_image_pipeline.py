@@ -0,0 +1,124 @@
+import asyncio
+import hashlib
+import io
+import threading
+
+from PIL import Image
+
+from Scripts.AsyncDownloader import AsyncImageDownloader
+from Scripts.BlobStore import BlobStore
+from Scripts.SlideManifest import get_slide_manifest
+
+
+def image_bytes(mode, fmt, color):
+    buffer = io.BytesIO()
+    Image.new(mode, (16, 9), color).save(buffer, fmt)
+    return buffer.getvalue()
+
+
+class FakeContent:
+    def __init__(self, content):
+        self._content = content
+        self.chunk_sizes = []
+
+    async def iter_chunked(self, size):
+        for start in range(0, len(self._content), size):
+            chunk = self._content[start:start + size]
+            self.chunk_sizes.append(len(chunk))
+            yield chunk
+
+
+class FakeResponse:
+    def __init__(self, content, content_type="image/jpeg"):
+        self.status = 200
+        self.headers = {"content-type": content_type}
+        self.content = FakeContent(content)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class FakeSession:
+    def __init__(self, response):
+        self.response = response
+
+    def get(self, url, timeout=None):
+        return self.response
+
+
+def download(tmp_path, response):
+    downloader = AsyncImageDownloader(
+        max_retries=1, blob_store=BlobStore(str(tmp_path / "blobs"))
+    )
+    slide = {"index": 1, "cover": "https://cdn.example.com/1"}
+    return asyncio.run(downloader.download_image(FakeSession(response), slide, str(tmp_path)))
+
+
+def test_rgb_jpeg_is_streamed_and_kept_byte_for_byte(tmp_path, monkeypatch):
+    content = image_bytes("RGB", "JPEG", (10, 20, 30))
+    monkeypatch.setattr("Scripts.AsyncDownloader.CHUNK_SIZE", 64)
+    response = FakeResponse(content)
+
+    result = download(tmp_path, response)
+
+    assert result["success"] is True
+    assert max(response.content.chunk_sizes) == 64
+    assert (tmp_path / "1.jpg").read_bytes() == content
+    assert not (tmp_path / "1_temp").exists()
+    entry = get_slide_manifest(str(tmp_path)).get("1.jpg")
+    assert entry["sha256"] == hashlib.sha256(content).hexdigest()
+
+
+def test_image_header_split_across_small_chunks_is_recognized(tmp_path, monkeypatch):
+    content = image_bytes("RGB", "JPEG", (10, 20, 30))
+    monkeypatch.setattr("Scripts.AsyncDownloader.CHUNK_SIZE", 2)
+
+    result = download(tmp_path, FakeResponse(content))
+
+    assert result["success"] is True
+    assert (tmp_path / "1.jpg").read_bytes() == content
+    entry = get_slide_manifest(str(tmp_path)).get("1.jpg")
+    assert entry["sha256"] == hashlib.sha256(content).hexdigest()
+
+    webp = image_bytes("RGB", "WEBP", (10, 20, 30))
+    assert download(tmp_path, FakeResponse(webp, "image/webp"))["success"] is True
+
+
+def test_png_with_alpha_is_converted_to_jpeg(tmp_path):
+    content = image_bytes("RGBA", "PNG", (255, 0, 0, 128))
+
+    result = download(tmp_path, FakeResponse(content, "image/png"))
+
+    assert result["success"] is True
+    with Image.open(tmp_path / "1.jpg") as img:
+        assert (img.format, img.mode, img.size) == ("JPEG", "RGB", (16, 9))
+
+
+def test_non_image_or_truncated_body_is_rejected(tmp_path):
+    assert download(tmp_path, FakeResponse(b"<html>error page</html>"))["success"] is False
+
+    truncated = image_bytes("RGB", "JPEG", (1, 2, 3))[:-20]
+    assert download(tmp_path, FakeResponse(truncated))["success"] is False
+    assert not (tmp_path / "1.jpg").exists()
+    assert not (tmp_path / "1_temp").exists()
+
+
+def test_existing_images_are_checked_off_the_event_loop(tmp_path):
+    downloader = AsyncImageDownloader(blob_store=BlobStore(str(tmp_path / "blobs")))
+    checked = []
+
+    def is_valid(path):
+        checked.append(threading.current_thread())
+        return True
+
+    downloader._is_valid_image = is_valid
+    slides = [{"index": i, "cover": f"https://cdn.example.com/{i}"} for i in (1, 2)]
+
+    result = asyncio.run(downloader.download_slides(slides, str(tmp_path)))
+
+    assert result["skipped"] == 2
+    assert len(checked) == 2
+    assert threading.main_thread() not in checked
@@ -0,0 +1,59 @@
+import asyncio
+import os
+import threading
+
+from PIL import Image
+
+from Scripts import ImageProcessing
+from Scripts.ImageProcessing import ImagePool, get_image_pool, normalize_image
+
+
+def test_process_pool_normalizes_images_by_path_in_another_process(tmp_path):
+    source = tmp_path / "1_temp"
+    Image.new("P", (12, 6)).save(source, "PNG")
+    pool = ImagePool(workers=1)
+    try:
+        assert pool.run(os.getpid) != os.getpid()
+        unchanged = asyncio.run(
+            pool.run_async(normalize_image, str(source), str(tmp_path / "1.jpg"))
+        )
+    finally:
+        pool.shutdown()
+
+    assert unchanged is False
+    with Image.open(tmp_path / "1.jpg") as img:
+        assert (img.format, img.mode, img.size) == ("JPEG", "RGB", (12, 6))
+
+
+def test_zero_workers_process_inline_and_report_errors(tmp_path):
+    pool = ImagePool(workers=0)
+
+    assert pool.run(os.getpid) == os.getpid()
+    future = pool.submit(normalize_image, str(tmp_path / "missing"), str(tmp_path / "1.jpg"))
+    assert isinstance(future.exception(), FileNotFoundError)
+
+
+def test_unavailable_process_pool_falls_back_off_the_event_loop(monkeypatch):
+    pool = ImagePool(workers=2)
+
+    def broken_pool(max_workers):
+        raise OSError("不支持多进程")
+
+    monkeypatch.setattr(ImageProcessing, "ProcessPoolExecutor", broken_pool)
+
+    async def run():
+        return await pool.run_async(threading.get_ident), threading.get_ident()
+
+    worker, loop_thread = asyncio.run(run())
+    assert pool.workers == 0
+    assert worker != loop_thread
+
+
+def test_shared_pool_is_rebuilt_only_when_worker_count_changes(monkeypatch):
+    monkeypatch.setattr(ImageProcessing, "_image_pool", None)
+
+    first = get_image_pool(0)
+    assert get_image_pool() is first
+    assert get_image_pool(0) is first
+    assert get_image_pool(1).workers == 1
+    get_image_pool().shutdown()
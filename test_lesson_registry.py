@@ -0,0 +1,80 @@
+import sys
+import types
+
+sys.modules.setdefault("pyttsx3", types.ModuleType("pyttsx3"))
+fpdf_stub = types.ModuleType("fpdf")
+fpdf_stub.FPDF = object
+sys.modules.setdefault("fpdf", fpdf_stub)
+
+from Scripts import Monitor
+from Scripts.Monitor import LessonRegistry
+
+
+class FakeLesson:
+    def __init__(self, lessonid):
+        self.lessonid = lessonid
+
+
+def test_registry_caches_user_info_within_ttl(monkeypatch):
+    calls = []
+
+    def fake_get_user_info(sessionid, region):
+        calls.append((sessionid, region))
+        return 0, {"id": "uid", "name": "name"}
+
+    monkeypatch.setattr(Monitor, "get_user_info", fake_get_user_info)
+    registry = LessonRegistry(user_info_ttl=60)
+
+    first = registry.get_user_info("session", "1")
+    second = registry.get_user_info("session", "1")
+
+    assert first == second == (0, {"id": "uid", "name": "name"})
+    assert calls == [("session", "1")]
+
+
+def test_registry_does_not_cache_failed_user_info(monkeypatch):
+    calls = []
+
+    def fake_get_user_info(sessionid, region):
+        calls.append(sessionid)
+        return 50000, "登录已过期"
+
+    monkeypatch.setattr(Monitor, "get_user_info", fake_get_user_info)
+    registry = LessonRegistry()
+
+    registry.get_user_info("session", "1")
+    registry.get_user_info("session", "1")
+
+    assert len(calls) == 2
+
+
+def test_registry_expires_user_info_after_ttl(monkeypatch):
+    calls = []
+    now = [100.0]
+
+    def fake_get_user_info(sessionid, region):
+        calls.append(sessionid)
+        return 0, {"id": "uid", "name": "name"}
+
+    monkeypatch.setattr(Monitor, "get_user_info", fake_get_user_info)
+    monkeypatch.setattr(Monitor.time, "monotonic", lambda: now[0])
+    registry = LessonRegistry(user_info_ttl=10)
+
+    registry.get_user_info("session", "1")
+    now[0] += 11
+    registry.get_user_info("session", "1")
+
+    assert len(calls) == 2
+
+
+def test_registry_remove_only_drops_registered_instance():
+    registry = LessonRegistry()
+    lesson = FakeLesson("lesson-1")
+    registry.add(lesson)
+
+    registry.remove(FakeLesson("lesson-1"))
+    assert "lesson-1" in registry
+
+    registry.remove(lesson)
+    assert "lesson-1" not in registry
+    assert registry.lessons() == []
@@ -0,0 +1,106 @@
+import asyncio
+import json
+import threading
+import time
+
+from aiohttp import web
+
+from Scripts.LessonRuntime import LessonRuntime
+
+
+def start_echo_server(messages):
+    """启动一个本地WebSocket服务，收到hello后依次推送messages"""
+    loop = asyncio.new_event_loop()
+    ready = threading.Event()
+    state = {}
+
+    async def handler(request):
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        async for msg in ws:
+            data = json.loads(msg.data)
+            if data["op"] == "hello":
+                for message in messages:
+                    await ws.send_str(json.dumps(message))
+            elif data["op"] == "bye":
+                await ws.close()
+        return ws
+
+    async def start():
+        app = web.Application()
+        app.router.add_get("/wsapp/", handler)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        state["runner"] = runner
+        state["port"] = site._server.sockets[0].getsockname()[1]
+        ready.set()
+
+    def run():
+        asyncio.set_event_loop(loop)
+        loop.run_until_complete(start())
+        loop.run_forever()
+
+    threading.Thread(target=run, daemon=True).start()
+    ready.wait(5)
+
+    def stop():
+        asyncio.run_coroutine_threadsafe(state["runner"].cleanup(), loop).result(5)
+        loop.call_soon_threadsafe(loop.stop)
+
+    return f"http://127.0.0.1:{state['port']}/wsapp/", stop
+
+
+def test_runtime_dispatches_messages_in_order_and_closes():
+    url, stop = start_echo_server([{"op": "a"}, {"op": "b"}, {"op": "lessonfinished"}])
+    runtime = LessonRuntime(handler_workers=2)
+    received = []
+
+    def on_open(wsapp):
+        wsapp.send(json.dumps({"op": "hello"}))
+
+    def on_message(wsapp, message):
+        op = json.loads(message)["op"]
+        received.append(op)
+        if op == "lessonfinished":
+            wsapp.close()
+
+    try:
+        runtime.submit(runtime.run_websocket(url, {}, on_open, on_message)).result(10)
+    finally:
+        stop()
+
+    assert received == ["a", "b", "lessonfinished"]
+
+
+def test_blocking_handler_does_not_stall_other_connections():
+    url, stop = start_echo_server([{"op": "slow"}, {"op": "done"}])
+    runtime = LessonRuntime(handler_workers=4)
+    timings = {}
+
+    def make_handlers(name, delay):
+        def on_open(wsapp):
+            wsapp.send(json.dumps({"op": "hello"}))
+
+        def on_message(wsapp, message):
+            op = json.loads(message)["op"]
+            if op == "slow":
+                time.sleep(delay)
+            else:
+                timings[name] = time.monotonic()
+                wsapp.close()
+
+        return on_open, on_message
+
+    start = time.monotonic()
+    try:
+        slow = runtime.submit(runtime.run_websocket(url, {}, *make_handlers("slow", 1.5)))
+        fast = runtime.submit(runtime.run_websocket(url, {}, *make_handlers("fast", 0)))
+        fast.result(10)
+        slow.result(10)
+    finally:
+        stop()
+
+    assert timings["fast"] - start < 1.0
+    assert timings["slow"] - start >= 1.5
@@ -39,7 +39,10 @@ def test_checkin_class_logs_response_details_when_lesson_token_missing(
         text=json.dumps({"code": 50000, "data": None, "msg": "login expired"}),
     )
 
-    monkeypatch.setattr("Scripts.Classes.requests.post", lambda **kwargs: response)
+    monkeypatch.setattr(
+        "Scripts.ApiClient.requests.Session.post",
+        lambda session, url, **kwargs: response,
+    )
     monkeypatch.setattr("Scripts.Classes.time.sleep", lambda seconds: None)
 
     with pytest.raises(RuntimeError, match="课程签到失败"):
@@ -0,0 +1,106 @@
+import json
+import os
+import threading
+
+from Scripts import PDFIndex as index_module
+from Scripts.PDFIndex import PDFIndex, get_pdf_index
+
+
+def fake_pdfs(monkeypatch, folder, hashes):
+    """写入占位PDF，关键字由read_pdf_keywords的替身返回，并记录读取次数"""
+    for name, digest in hashes.items():
+        (folder / name).write_bytes(b"%PDF-" + digest.encode())
+    reads = []
+
+    def read_keywords(path):
+        reads.append(os.path.basename(path))
+        with open(path, "rb") as f:
+            return f.read()[5:].decode()
+
+    monkeypatch.setattr(index_module, "read_pdf_keywords", read_keywords)
+    return reads
+
+
+def test_existing_pdfs_are_parsed_once_and_then_served_from_index(tmp_path, monkeypatch):
+    lesson = tmp_path / "lesson"
+    lesson.mkdir()
+    reads = fake_pdfs(monkeypatch, lesson, {f"{i}.pdf": f"hash{i}" for i in range(60)})
+
+    index = PDFIndex(str(tmp_path))
+    assert index.find("hash42", str(lesson)) == "42.pdf"
+    assert len(reads) == 60
+
+    saved = json.loads((tmp_path / "pdf_index.json").read_text(encoding="utf-8"))["pdfs"]
+    assert saved[os.path.join(str(lesson), "7.pdf")]["hash"] == "hash7"
+
+    reads.clear()
+    reopened = PDFIndex(str(tmp_path))
+    assert reopened.find("hash7", str(lesson)) == "7.pdf"
+    assert reopened.find("missing", str(lesson)) is None
+    assert reads == []
+
+
+def test_recorded_pdf_is_found_without_parsing(tmp_path, monkeypatch):
+    lesson = tmp_path / "lesson"
+    lesson.mkdir()
+    reads = fake_pdfs(monkeypatch, lesson, {})
+
+    index = PDFIndex(str(tmp_path))
+    assert index.find("new", str(lesson)) is None
+    (lesson / "deck.pdf").write_bytes(b"%PDF-new")
+    index.record("new", str(lesson), "deck.pdf")
+
+    assert index.find("new", str(lesson)) == "deck.pdf"
+    assert reads == []
+
+
+def test_removed_and_modified_pdfs_are_reindexed(tmp_path, monkeypatch):
+    lesson = tmp_path / "lesson"
+    other = tmp_path / "other"
+    lesson.mkdir()
+    other.mkdir()
+    reads = fake_pdfs(monkeypatch, lesson, {"a.pdf": "one", "b.pdf": "two"})
+    (other / "c.pdf").write_bytes(b"%PDF-one")
+
+    index = PDFIndex(str(tmp_path))
+    assert index.find("one", str(lesson)) == "a.pdf"
+    assert index.find("one", str(other)) == "c.pdf"
+
+    os.remove(lesson / "a.pdf")
+    (lesson / "b.pdf").write_bytes(b"%PDF-one")
+    os.utime(lesson / "b.pdf", ns=(1, 1))
+    reads.clear()
+
+    assert index.find("one", str(lesson)) == "b.pdf"
+    assert reads == ["b.pdf"]
+    assert index.find("two", str(lesson)) is None
+    # 其他目录的条目不受影响
+    assert index.find("one", str(other)) == "c.pdf"
+
+
+def test_get_pdf_index_shares_instance_per_root(tmp_path):
+    assert get_pdf_index(str(tmp_path)) is get_pdf_index(str(tmp_path / "."))
+    assert get_pdf_index(str(tmp_path)) is not get_pdf_index(str(tmp_path / "other"))
+
+
+def test_concurrent_saves_keep_every_entry(tmp_path, monkeypatch, capsys):
+    lesson = tmp_path / "lesson"
+    lesson.mkdir()
+    fake_pdfs(monkeypatch, lesson, {})
+    index = PDFIndex(str(tmp_path))
+
+    def record(start):
+        for i in range(start, start + 20):
+            (lesson / f"{i}.pdf").write_bytes(b"%PDF-")
+            index.record(f"hash{i}", str(lesson), f"{i}.pdf")
+
+    threads = [threading.Thread(target=record, args=(n * 20,)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert "保存PDF索引失败" not in capsys.readouterr().out
+    saved = json.loads((tmp_path / "pdf_index.json").read_text(encoding="utf-8"))["pdfs"]
+    assert len(saved) == 80
+    assert not (tmp_path / "pdf_index.json.tmp").exists()
@@ -0,0 +1,272 @@
+import io
+import os
+
+import pytest
+from PIL import Image
+
+from Scripts.PDFWriter import PDFWriter
+
+PyPDF2 = pytest.importorskip("PyPDF2")
+if not hasattr(PyPDF2, "PdfReader"):
+    pytest.skip("PyPDF2被其他测试替换为桩模块", allow_module_level=True)
+
+
+def write_image(path, fmt="JPEG", color=(255, 0, 0), size=(32, 18)):
+    mode = "RGBA" if fmt == "PNG" else "RGB"
+    Image.new(mode, size, color).save(path, fmt)
+
+
+def test_jpeg_slides_are_embedded_without_reencoding(tmp_path):
+    for index in (1, 2):
+        write_image(tmp_path / f"{index}.jpg", color=(index * 100, 0, 0))
+    target = tmp_path / "deck.pdf"
+
+    with PDFWriter(str(target), keywords="abc123", author="RainClassroom") as pdf:
+        pdf.add_image_page(str(tmp_path / "1.jpg"), 1920, 1080)
+        pdf.add_image_page(str(tmp_path / "2.jpg"), 1920, 1080, text="['A', '填空']")
+        assert not target.exists()
+
+    data = target.read_bytes()
+    # 原始JPEG字节原样出现在PDF中
+    assert (tmp_path / "1.jpg").read_bytes() in data
+    assert (tmp_path / "2.jpg").read_bytes() in data
+    assert not list(tmp_path.glob("*.part"))
+
+    reader = PyPDF2.PdfReader(io.BytesIO(data))
+    assert len(reader.pages) == 2
+    assert reader.metadata.get("/Keywords") == "abc123"
+    assert reader.metadata.get("/Author") == "RainClassroom"
+    box = reader.pages[0].mediabox
+    assert (float(box.width), float(box.height)) == (1920, 1080)
+    image = reader.pages[0]["/Resources"]["/XObject"]["/Im0"]
+    assert image["/Filter"] == "/DCTDecode"
+    assert (image["/Width"], image["/Height"]) == (32, 18)
+    assert "/Font" not in reader.pages[0]["/Resources"]
+    font = reader.pages[1]["/Resources"]["/Font"]["/F1"]
+    assert font["/Encoding"] == "/UniGB-UCS2-H"
+    assert b"586B7A7A" in reader.pages[1].get_contents().get_data()
+
+
+def test_non_jpeg_images_are_converted(tmp_path):
+    write_image(tmp_path / "1.png", fmt="PNG")
+    target = tmp_path / "deck.pdf"
+
+    with PDFWriter(str(target)) as pdf:
+        pdf.add_image_page(str(tmp_path / "1.png"), 800, 600)
+
+    reader = PyPDF2.PdfReader(str(target))
+    image = reader.pages[0]["/Resources"]["/XObject"]["/Im0"]
+    assert image["/Filter"] == "/DCTDecode"
+    assert image["/ColorSpace"] == "/DeviceRGB"
+
+
+def test_unreadable_image_is_skipped_and_failure_discards_partial_file(tmp_path):
+    write_image(tmp_path / "1.jpg")
+    (tmp_path / "broken.jpg").write_bytes(b"not an image")
+    target = tmp_path / "deck.pdf"
+
+    with PDFWriter(str(target)) as pdf:
+        with pytest.raises(OSError):
+            pdf.add_image_page(str(tmp_path / "broken.jpg"), 800, 600)
+        pdf.add_image_page(str(tmp_path / "1.jpg"), 800, 600)
+    assert len(PyPDF2.PdfReader(str(target)).pages) == 1
+
+    with pytest.raises(RuntimeError):
+        with PDFWriter(str(tmp_path / "other.pdf")) as pdf:
+            pdf.add_image_page(str(tmp_path / "1.jpg"), 800, 600)
+            raise RuntimeError("中断")
+    assert not (tmp_path / "other.pdf").exists()
+    assert not list(tmp_path.glob("*.part"))
+
+
+def test_incremental_update_appends_only_new_pages(tmp_path):
+    for index in (1, 2, 3):
+        write_image(tmp_path / f"{index}.jpg", color=(index * 60, 0, 0))
+    target = tmp_path / "deck.pdf"
+    with PDFWriter(str(target), keywords="v1") as pdf:
+        first = pdf.add_image_page(str(tmp_path / "1.jpg"), 800, 600, text="A")
+        pdf.add_image_page(str(tmp_path / "2.jpg"), 800, 600)
+    layout = pdf.layout
+    original = target.read_bytes()
+
+    with PDFWriter(str(target), keywords="v2", layout=layout) as pdf:
+        pdf.add_existing_page(first)
+        pdf.add_image_page(str(tmp_path / "3.jpg"), 800, 600, text="B")
+        # 追加在副本上进行，完成前原文件不变
+        assert target.read_bytes() == original
+
+    data = target.read_bytes()
+    assert not list(tmp_path.glob("*.part"))
+    assert data.startswith(original)
+    # 追加部分只包含新页面的图片
+    assert (tmp_path / "3.jpg").read_bytes() in data[len(original):]
+    assert (tmp_path / "1.jpg").read_bytes() not in data[len(original):]
+    reader = PyPDF2.PdfReader(str(target))
+    assert len(reader.pages) == 2
+    assert reader.metadata.get("/Keywords") == "v2"
+    assert reader.pages[0]["/Resources"]["/Font"]["/F1"] == reader.pages[1]["/Resources"]["/Font"]["/F1"]
+
+
+def test_failed_incremental_update_restores_original_file(tmp_path):
+    write_image(tmp_path / "1.jpg")
+    target = tmp_path / "deck.pdf"
+    with PDFWriter(str(target), keywords="v1") as pdf:
+        page = pdf.add_image_page(str(tmp_path / "1.jpg"), 800, 600)
+    original = target.read_bytes()
+    mtime = target.stat().st_mtime_ns
+
+    with pytest.raises(RuntimeError):
+        with PDFWriter(str(target), keywords="v2", layout=pdf.layout) as update:
+            update.add_existing_page(page)
+            update.add_image_page(str(tmp_path / "1.jpg"), 800, 600)
+            raise RuntimeError("中断")
+
+    assert target.read_bytes() == original
+    assert target.stat().st_mtime_ns == mtime
+    assert not list(tmp_path.glob("*.part"))
+
+
+def test_locked_target_keeps_original_and_removes_partial_file(monkeypatch, tmp_path):
+    write_image(tmp_path / "1.jpg")
+    target = tmp_path / "deck.pdf"
+    with PDFWriter(str(target), keywords="v1") as pdf:
+        page = pdf.add_image_page(str(tmp_path / "1.jpg"), 800, 600)
+    original = target.read_bytes()
+
+    def locked_replace(src, dst):
+        raise PermissionError("文件被占用")
+
+    monkeypatch.setattr("Scripts.PDFWriter.os.replace", locked_replace)
+    for layout in (pdf.layout, None):
+        with pytest.raises(PermissionError):
+            with PDFWriter(str(target), keywords="v2", layout=layout) as update:
+                if layout:
+                    update.add_existing_page(page)
+                update.add_image_page(str(tmp_path / "1.jpg"), 800, 600)
+        assert target.read_bytes() == original
+        assert not list(tmp_path.glob("*.part"))
+
+
+def make_pdf_manager(monkeypatch, tmp_path):
+    """不下载图片的PPTManager，push()写入一张幻灯片图片并加入课件"""
+    from Scripts.BlobStore import BlobStore
+    from Scripts.PPTManager import PPTManager
+    from Scripts.SlideManifest import get_slide_manifest
+
+    img_dir = tmp_path / "img"
+    lesson_dir = tmp_path / "downloads" / "lesson"
+    img_dir.mkdir()
+    lesson_dir.mkdir(parents=True)
+    manager = object.__new__(PPTManager)
+    manager.title = "deck"
+    manager.timeinfo = "20240101-000000"
+    manager.downloadpath = str(tmp_path / "downloads")
+    manager.lessondownloadpath = str(lesson_dir)
+    manager.imgpath = str(img_dir)
+    manager.width, manager.height = 800, 600
+    manager.presentation_id = "pres-1"
+    monkeypatch.setattr("Scripts.PPTManager.get_blob_store", lambda: BlobStore(str(tmp_path / "blobs")))
+    # 只生成PDF时不应创建下载器
+    monkeypatch.setattr("Scripts.PPTManager.AsyncImageDownloader", lambda: pytest.fail("不应创建下载器"))
+    manager.slides = []
+
+    def push(index, problem=False):
+        write_image(img_dir / f"{index}.jpg", color=(index * 40, 0, 0))
+        get_slide_manifest(str(img_dir)).record(f"{index}.jpg", f"https://cdn/{index}.jpg")
+        slide = {"index": index, "cover": f"https://cdn/{index}.jpg"}
+        if problem:
+            slide["problem"] = {"answers": ["A"]}
+        manager.slides.append(slide)
+
+    return manager, push, img_dir, lesson_dir
+
+
+def test_generate_ppt_updates_stable_pdf_when_slides_are_pushed(monkeypatch, tmp_path):
+    from Scripts.PDFIndex import get_pdf_index
+
+    manager, push, img_dir, lesson_dir = make_pdf_manager(monkeypatch, tmp_path)
+    push(1)
+    push(2, problem=True)
+    assert manager.generate_ppt() == "deck.pdf"
+    original = (lesson_dir / "deck.pdf").read_bytes()
+
+    push(3)
+    assert manager.generate_ppt() == "deck.pdf"
+    data = (lesson_dir / "deck.pdf").read_bytes()
+    assert data.startswith(original)
+    assert (img_dir / "1.jpg").read_bytes() not in data[len(original):]
+    reader = PyPDF2.PdfReader(str(lesson_dir / "deck.pdf"))
+    assert len(reader.pages) == 3
+    assert reader.metadata.get("/Keywords") == manager.get_deck_hash()
+    entry = get_pdf_index(manager.downloadpath).get(str(lesson_dir), "deck.pdf")
+    assert entry["layout"]["orphans"] == 0
+
+    assert manager.generate_ppt() == "deck.pdf"
+    assert (lesson_dir / "deck.pdf").read_bytes() == data
+
+    # 阅读器占用deck.pdf无法替换时另存为带时间的文件
+    replace = os.replace
+
+    def locked_replace(src, dst):
+        if os.path.basename(dst) == "deck.pdf":
+            raise PermissionError("文件被占用")
+        replace(src, dst)
+
+    monkeypatch.setattr("Scripts.PDFWriter.os.replace", locked_replace)
+    push(4)
+    assert manager.generate_ppt() == "deck20240101-000000.pdf"
+    assert (lesson_dir / "deck.pdf").read_bytes() == data
+    assert len(PyPDF2.PdfReader(str(lesson_dir / "deck20240101-000000.pdf")).pages) == 4
+    assert not list(lesson_dir.glob("*.part"))
+    monkeypatch.setattr("Scripts.PDFWriter.os.replace", replace)
+    (lesson_dir / "deck20240101-000000.pdf").unlink()
+
+    # 同名但内容完全不同的课件另存为新文件
+    manager.slides = []
+    for index in (1, 2, 3):
+        (img_dir / f"{index}.jpg").unlink()
+    push(7)
+    assert manager.generate_ppt() == "deck20240101-000000.pdf"
+    assert (lesson_dir / "deck.pdf").read_bytes() == data
+
+
+def test_pushes_append_to_the_last_pdf_written_for_the_deck(monkeypatch, tmp_path):
+    manager, push, _, lesson_dir = make_pdf_manager(monkeypatch, tmp_path)
+    # 旧版本生成的同名PDF，没有增量更新所需的信息
+    legacy = b"%PDF-1.4 legacy"
+    (lesson_dir / "deck.pdf").write_bytes(legacy)
+
+    push(1)
+    assert manager.generate_ppt() == "deck20240101-000000.pdf"
+    original = (lesson_dir / "deck20240101-000000.pdf").read_bytes()
+
+    # 之后推送的幻灯片追加到同一个文件，不再每次另存一份
+    manager.timeinfo = "20240101-000100"
+    push(2)
+    assert manager.generate_ppt() == "deck20240101-000000.pdf"
+    data = (lesson_dir / "deck20240101-000000.pdf").read_bytes()
+    assert data.startswith(original)
+    assert len(PyPDF2.PdfReader(str(lesson_dir / "deck20240101-000000.pdf")).pages) == 2
+    assert (lesson_dir / "deck.pdf").read_bytes() == legacy
+    assert sorted(path.name for path in lesson_dir.iterdir()) == ["deck.pdf", "deck20240101-000000.pdf"]
+
+
+def test_concurrent_generations_of_one_pdf_use_separate_temp_files(tmp_path):
+    write_image(tmp_path / "1.jpg", color=(10, 0, 0))
+    write_image(tmp_path / "2.jpg", color=(20, 0, 0))
+    target = tmp_path / "deck.pdf"
+
+    first = PDFWriter(str(target), keywords="first")
+    second = PDFWriter(str(target), keywords="second")
+    assert first.part_path != second.part_path
+    first.add_image_page(str(tmp_path / "1.jpg"), 800, 600)
+    second.add_image_page(str(tmp_path / "2.jpg"), 800, 600)
+    second.add_image_page(str(tmp_path / "1.jpg"), 800, 600)
+    first.close()
+    assert len(PyPDF2.PdfReader(str(target)).pages) == 1
+    second.close()
+
+    reader = PyPDF2.PdfReader(str(target))
+    assert len(reader.pages) == 2
+    assert reader.metadata.get("/Keywords") == "second"
+    assert not list(tmp_path.glob("*.part"))
@@ -0,0 +1,74 @@
+import threading
+import time
+
+import pytest
+
+from Scripts import PresentationCache as presentation_cache_module
+from Scripts.PresentationCache import PresentationCache
+
+
+def test_concurrent_callers_share_one_request():
+    cache = PresentationCache(ttl=60)
+    calls = []
+    release = threading.Event()
+
+    def loader():
+        calls.append(True)
+        release.wait(5)
+        return {"title": "ppt", "slides": []}
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(cache.get("pres-1", loader)))
+        for _ in range(5)
+    ]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.2)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(calls) == 1
+    assert len(results) == 5
+    assert all(result == {"title": "ppt", "slides": []} for result in results)
+
+
+def test_returned_data_is_a_private_copy():
+    cache = PresentationCache(ttl=60)
+    first = cache.get("pres-1", lambda: {"slides": [{"index": 1}]})
+    first["slides"][0]["index"] = 9
+
+    second = cache.get("pres-1", lambda: pytest.fail("should be cached"))
+
+    assert second["slides"][0]["index"] == 1
+
+
+def test_entries_expire_and_can_be_invalidated(monkeypatch):
+    now = [0.0]
+    monkeypatch.setattr(presentation_cache_module.time, "monotonic", lambda: now[0])
+    cache = PresentationCache(ttl=10)
+    calls = []
+
+    def loader():
+        calls.append(True)
+        return {"version": len(calls)}
+
+    assert cache.get("pres-1", loader) == {"version": 1}
+    assert cache.get("pres-1", loader) == {"version": 1}
+    now[0] = 11
+    assert cache.get("pres-1", loader) == {"version": 2}
+    cache.invalidate("pres-1")
+    assert cache.get("pres-1", loader) == {"version": 3}
+
+
+def test_loader_errors_are_propagated_and_not_cached():
+    cache = PresentationCache(ttl=60)
+
+    def failing_loader():
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        cache.get("pres-1", failing_loader)
+
+    assert cache.get("pres-1", lambda: {"ok": True}) == {"ok": True}
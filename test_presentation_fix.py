@@ -57,8 +57,6 @@ def test_presentation_missing():
             lesson.lessonname = "测试课程"
             lesson.add_message = lambda msg, level: print(f"[{level}] {msg}")
             lesson.config = mock_ui.config
-            lesson.problems_ls = []
-            lesson.problems_dict = {}
             lesson.unlocked_problem = []
             lesson.get_problems = lambda x: []
             lesson.download_ppt = lambda x: None
@@ -0,0 +1,52 @@
+from Scripts.ProblemStore import ProblemStore, problem_identifiers
+
+
+def make_problem(problem_id, slide_id, index, answers=None):
+    return {
+        "problemId": problem_id,
+        "slideId": slide_id,
+        "slideIds": [slide_id, f"{slide_id}-alt"],
+        "index": index,
+        "answers": answers or ["A"],
+        "result": None,
+    }
+
+
+def test_replace_presentation_does_not_duplicate_problems():
+    store = ProblemStore()
+    store.replace_presentation("pres-1", [make_problem("p1", "s1", 1)])
+    store.replace_presentation("pres-1", [make_problem("p1", "s1", 1, ["B"])])
+
+    assert len(store) == 1
+    assert store.find("p1")["answers"] == ["B"]
+
+
+def test_find_matches_any_identifier():
+    store = ProblemStore()
+    problem = make_problem("p1", "s1", 1)
+    store.replace_presentation("pres-1", [problem])
+
+    assert store.find("p1") is problem
+    assert store.find("s1") is problem
+    assert store.find("s1-alt") is problem
+    assert store.find("missing") is None
+    assert store.find(None) is None
+
+
+def test_replace_drops_removed_problems_but_keeps_other_presentations():
+    store = ProblemStore()
+    store.replace_presentation("pres-1", [make_problem("p1", "s1", 1), make_problem("p2", "s2", 2)])
+    store.replace_presentation("pres-2", [make_problem("p3", "s3", 1)])
+
+    store.replace_presentation("pres-1", [make_problem("p2", "s2", 2)])
+
+    assert store.find("p1") is None
+    assert store.find("p2") is not None
+    assert store.find("p3") is not None
+    assert len(store) == 2
+
+
+def test_problem_identifiers_are_strings_without_duplicates():
+    problem = {"problemId": 12, "id": 12, "slideId": "s", "slideIds": ["s", "t"]}
+
+    assert problem_identifiers(problem) == ["12", "s", "t"]
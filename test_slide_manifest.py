@@ -0,0 +1,120 @@
+import json
+import os
+import threading
+
+import pytest
+from PIL import Image
+
+from Scripts import SlideManifest as manifest_module
+from Scripts.SlideManifest import SlideManifest, get_slide_manifest, is_valid_slide_image
+
+
+def write_image(path, color=(255, 0, 0)):
+    Image.new("RGB", (8, 8), color).save(path, "JPEG")
+
+
+def test_unchanged_files_are_trusted_without_decoding(tmp_path, monkeypatch):
+    for index in range(1, 4):
+        write_image(tmp_path / f"{index}.jpg")
+
+    manifest = SlideManifest(str(tmp_path))
+    assert all(manifest.is_valid(f"{index}.jpg") for index in range(1, 4))
+    manifest.save()
+
+    saved = json.loads((tmp_path / "manifest.json").read_text(encoding="utf-8"))["slides"]
+    assert saved["2.jpg"]["verified"] is True
+    assert saved["2.jpg"]["size"] == os.path.getsize(tmp_path / "2.jpg")
+    assert len(saved["2.jpg"]["sha256"]) == 64
+
+    decoded = []
+    monkeypatch.setattr(manifest_module, "verify_image", lambda path: decoded.append(path) or True)
+    reopened = SlideManifest(str(tmp_path))
+    assert all(reopened.is_valid(f"{index}.jpg") for index in range(1, 4))
+    assert decoded == []
+
+
+def test_changed_or_removed_files_are_verified_again(tmp_path):
+    write_image(tmp_path / "1.jpg")
+    write_image(tmp_path / "2.jpg")
+    manifest = SlideManifest(str(tmp_path))
+    manifest.record("1.jpg", "https://example.com/1.jpg")
+    manifest.record("2.jpg")
+
+    (tmp_path / "1.jpg").write_bytes(b"not an image at all")
+    os.remove(tmp_path / "2.jpg")
+
+    assert manifest.is_valid("1.jpg") is False
+    assert manifest.is_valid("2.jpg") is False
+    assert manifest.get("1.jpg") is None
+    assert manifest.get("2.jpg") is None
+
+
+def test_path_helper_shares_one_manifest_per_directory(tmp_path):
+    write_image(tmp_path / "5.jpg")
+
+    assert is_valid_slide_image(str(tmp_path / "5.jpg")) is True
+    assert get_slide_manifest(str(tmp_path)) is get_slide_manifest(str(tmp_path) + os.sep)
+    assert get_slide_manifest(str(tmp_path)).get("5.jpg")["index"] == "5"
+
+
+def test_diff_compares_slide_id_cover_and_index(tmp_path):
+    for index in range(1, 5):
+        write_image(tmp_path / f"{index}.jpg")
+    manifest = SlideManifest(str(tmp_path))
+    manifest.record("1.jpg", "https://cdn/1.jpg", slide_id="a")
+    manifest.record("2.jpg", "https://cdn/2.jpg", slide_id="b")
+    manifest.record("3.jpg", "https://cdn/3.jpg", slide_id="c")
+    manifest.record("4.jpg", "https://cdn/4.jpg", slide_id="d")
+
+    diff = manifest.diff([
+        {"index": 1, "id": "a", "cover": "https://cdn/1.jpg"},
+        {"index": 2, "id": "b2", "cover": "https://cdn/2.jpg"},
+        {"index": 3, "id": "c", "cover": "https://cdn/3-new.jpg"},
+        {"index": 5, "id": "e", "cover": "https://cdn/5.jpg"},
+    ])
+
+    assert [slide["index"] for slide in diff["unchanged"]] == [1]
+    assert [slide["index"] for slide in diff["changed"]] == [2, 3, 5]
+    assert diff["removed"] == ["4.jpg"]
+
+    manifest.prune(diff["removed"])
+    assert not (tmp_path / "4.jpg").exists()
+    assert manifest.get("4.jpg") is None
+
+
+def test_digest_reuses_recorded_hash_until_file_changes(tmp_path, monkeypatch):
+    write_image(tmp_path / "1.jpg")
+    manifest = SlideManifest(str(tmp_path))
+    manifest.record("1.jpg", "https://cdn/1.jpg", sha256="a" * 64, slide_id="s1")
+
+    monkeypatch.setattr(manifest_module, "file_sha256", lambda path: pytest.fail("不应读取图片"))
+    assert manifest.digest("1.jpg") == "a" * 64
+    assert manifest.digest("2.jpg") is None
+
+    monkeypatch.undo()
+    write_image(tmp_path / "1.jpg", color=(0, 0, 255))
+    os.utime(tmp_path / "1.jpg", ns=(1, 1))
+    digest = manifest.digest("1.jpg")
+    assert digest == manifest_module.file_sha256(str(tmp_path / "1.jpg"))
+    assert manifest.get("1.jpg")["cover"] == "https://cdn/1.jpg"
+    assert manifest.get("1.jpg")["slide_id"] == "s1"
+
+
+def test_concurrent_saves_keep_every_entry(tmp_path, capsys):
+    manifest = SlideManifest(str(tmp_path))
+
+    def record(start):
+        for i in range(start, start + 20):
+            write_image(tmp_path / f"{i}.jpg")
+            manifest.record(f"{i}.jpg", f"https://cdn/{i}.jpg")
+            manifest.save()
+
+    threads = [threading.Thread(target=record, args=(n * 20,)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert "保存图片清单失败" not in capsys.readouterr().out
+    saved = json.loads((tmp_path / "manifest.json").read_text(encoding="utf-8"))["slides"]
+    assert len(saved) == 80